@@ -1,14 +1,15 @@
 from pathlib import Path
 from re import match
-from subprocess import check_call
 from urllib.parse import urlparse
 from urllib.request import urlretrieve
 
+from clones import clone as git_clone, open_clone
 from pclass.dircache import Meta
 from pclass.field import field, directfield
-from git import Repo
+import lockfile
 import opts
 
+from node import tree_manifest
 from rgxs import maybe, one
 
 file_chars = '[A-Za-z0-9_\-\.]+'
@@ -69,7 +70,7 @@ class File:
     def read_text(self): return self.data_stream.read().decode()
 
 
-class Commit(metaclass=Meta):
+class Commit(metaclass=Meta, instances=256):
     def __init__(self, gist):
         self.gist = gist
 
@@ -85,6 +86,12 @@ class Commit(metaclass=Meta):
     @property
     def commit(self): return self.gist.clone.commit(self.id)
 
+    @property
+    def source(self): return self.gist
+
+    @property
+    def repo(self): return self.gist.clone
+
     @property
     def tree(self): return self.commit.tree
 
@@ -143,8 +150,15 @@ class Commit(metaclass=Meta):
 
         return fragments
 
+    @field
+    def manifest(self):
+        '''Flat {path: {type, sha, size}} index of this commit's tree; lets `GitNode`s resolve paths without walking
+        GitPython `Tree`s'''
+        lockfile.uncached(f'Tree manifest of {self.www_url}')
+        return tree_manifest(self.repo, self.id)
+
 
-class Gist(metaclass=Meta):
+class Gist(metaclass=Meta, instances=256):
 
     WWW_URL_PATH_REGEX = f'^{maybe(user_re)}/{id_re}{commit_re}{fragment_re}$'
     RAW_URL_PATH_REGEX = f'^{user_re}/{id_re}/{raw_re}{commit_re}{file_re}$'
@@ -284,23 +298,15 @@ class Gist(metaclass=Meta):
     @property
     def xml(self): return self.commit.xml
 
-    @directfield(parse=Repo)
-    def clone(self, path):
-        url = self.git_url
-        if path.exists():
-            print(f'{path} exists; attempting to pull')
-            from git import Repo
-            repo = Repo(path)
-            repo.remotes.origin.pull()
-        else:
-            print(f'Cloning {url} into {path}')
-            check_call([ 'git', 'clone', url, str(path) ])
+    # Stale clones are pulled, in the background (unless a lockfile pins them)
+    @directfield(parse=open_clone, ttl=lambda: None if lockfile.locked() else opts.clone_ttl)
+    def clone(self, path): git_clone(self.git_url, path)
 
     @property
-    def commit(self): return Commit(self.clone.commit().hexsha, self)
+    def commit(self): return Commit(lockfile.commit(self, 'gist'), self)
 
     @property
-    def clone_dir(self): return Path(self.clone.git_dir).parent
+    def clone_dir(self): return Path(self.clone.working_tree_dir or self.clone.git_dir)
 
 
 from gists import importer
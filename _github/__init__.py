@@ -1,14 +1,15 @@
 import pathlib
 from re import match
-from subprocess import check_call
 from urllib.parse import urlparse
 from urllib.request import urlretrieve
 
+from clones import clone as git_clone, open_clone
 from pclass.dircache import Meta
 from pclass.field import field, directfield
-from git import Repo
+import lockfile
 import opts
 
+from node import tree_manifest
 from rgxs import maybe, one
 
 file_chars = '[A-Za-z0-9_\-\./]+'
@@ -24,7 +25,7 @@ commit_re = maybe(f'/tree/{commit_id_re}')
 path_re = f'(?P<path>/{file_chars})'
 
 
-class Commit(metaclass=Meta):
+class Commit(metaclass=Meta, instances=256):
     def __init__(self, github):
         self.github = github
 
@@ -37,6 +38,12 @@ class Commit(metaclass=Meta):
     @property
     def commit(self): return self.github.clone.commit(self.id)
 
+    @property
+    def source(self): return self.github
+
+    @property
+    def repo(self): return self.github.clone
+
     @property
     def tree(self): return self.commit.tree
 
@@ -55,8 +62,17 @@ class Commit(metaclass=Meta):
     @property
     def clone_dir(self): return self.github.clone_dir
 
+    ### Cached fields ###
 
-class Github(metaclass=Meta):
+    @field
+    def manifest(self):
+        '''Flat {path: {type, sha, size}} index of this commit's tree; lets `GitNode`s resolve paths without walking
+        GitPython `Tree`s'''
+        lockfile.uncached(f'Tree manifest of {self.www_url}')
+        return tree_manifest(self.repo, self.id)
+
+
+class Github(metaclass=Meta, instances=256):
 
     WWW_URL_PATH_TREE_REGEX = f'^/{org_re}/{repo_re}{maybe(f"/tree/{commit_id_re}")}{maybe(path_re)}$'
     WWW_URL_PATH_BLOB_REGEX = f'^/{org_re}/{repo_re}{maybe(f"/blob/{commit_id_re}")}{path_re}$'
@@ -166,23 +182,15 @@ class Github(metaclass=Meta):
 
         return f'github.{org}.{repo}'
 
-    @directfield(parse=Repo)
-    def clone(self, path):
-        url = self.git_url
-        if path.exists():
-            print(f'{path} exists; attempting to pull')
-            from git import Repo
-            repo = Repo(path)
-            repo.remotes.origin.pull()
-        else:
-            print(f'Cloning {url} into {path}')
-            check_call([ 'git', 'clone', url, str(path) ])
+    # Stale clones are pulled, in the background (unless a lockfile pins them)
+    @directfield(parse=open_clone, ttl=lambda: None if lockfile.locked() else opts.clone_ttl)
+    def clone(self, path): git_clone(self.git_url, path)
 
     @property
-    def commit(self): return Commit(self.clone.commit().hexsha, self)
+    def commit(self): return Commit(lockfile.commit(self, 'github'), self)
 
     @property
-    def clone_dir(self): return pathlib.Path(self.clone.git_dir).parent
+    def clone_dir(self): return pathlib.Path(self.clone.working_tree_dir or self.clone.git_dir)
 
 
 from gists import importer
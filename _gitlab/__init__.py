@@ -1,12 +1,12 @@
 import pathlib
 from re import match
-from subprocess import check_call
-from urllib.parse import urlparse
+from urllib.parse import quote_plus, urlparse
 from urllib.request import urlretrieve
 
+from clones import clone as git_clone, open_clone
 from pclass.dircache import Meta
 from pclass.field import field, directfield
-from git import Repo
+import lockfile
 import opts
 
 from rgxs import maybe, one
@@ -27,7 +27,7 @@ path_re = f'(?P<path>/{file_chars})'
 import _github
 
 # TODO: dedupe with _github module
-class Commit(_github.Commit, metaclass=Meta):
+class Commit(_github.Commit, metaclass=Meta, instances=256):
     def __init__(self, github):
         self.github = github
 
@@ -59,7 +59,45 @@ class Commit(_github.Commit, metaclass=Meta):
     # def clone_dir(self): return self.gitlab.clone_dir
 
 
-class Gitlab(metaclass=Meta):
+_session = None
+def session():
+    '''Shared `requests.Session`, so that GitLab API calls reuse pooled connections'''
+    global _session
+    if _session is None:
+        from requests import Session
+        _session = Session()
+    return _session
+
+
+class GitlabPath(metaclass=Meta):
+    '''Whether a GitLab path (e.g. `runsascoded/dotfiles`) is a group or a project, as reported by the GitLab API
+
+    Resolutions are cached for `opts.gitlab_ttl` seconds, so that warm imports of nested subgroups make no requests;
+    expired ones are re-resolved before use. With a lockfile active, paths are resolved from it instead (see
+    `lockfile.Lockfile.gitlab_kind`).
+    '''
+
+    @classmethod
+    def resolve(cls, path):
+        '''Return "group", "project", or `None` (neither)'''
+        lock = lockfile.locked()
+        if lock: return lock.gitlab_kind(path)
+        return cls(path, _skip_cache=opts.skip_cache).resolution['kind']
+
+    @field(ttl=lambda: opts.gitlab_ttl, strict=True)
+    def resolution(self):
+        path = quote_plus(self.id)
+        for kind in ['group', 'project']:
+            resp = session().head(f'{opts.gitlab_api_url}/{kind}s/{path}')
+            if resp.ok:
+                return dict(kind=kind)
+            if resp.status_code != 404:
+                # Only cache a definitive "neither"; raising (on e.g. 401, 429, 5xx) persists nothing
+                resp.raise_for_status()
+        return dict(kind=None)
+
+
+class Gitlab(metaclass=Meta, instances=256):
 
     # WWW_URL_PATH_REPO_REGEX = f'^/{org_re}/{repo_re}$'
     # WWW_URL_PATH_TREE_REGEX = f'^/{org_re}/{repo_re}/-/tree/{commit_id_re}{maybe(path_re)}$'
@@ -192,23 +230,15 @@ class Gitlab(metaclass=Meta):
             ]
         )
 
-    @directfield(parse=Repo)
-    def clone(self, path):
-        url = self.git_url
-        if path.exists():
-            print(f'{path} exists; attempting to pull')
-            from git import Repo
-            repo = Repo(path)
-            repo.remotes.origin.pull()
-        else:
-            print(f'Cloning {url} into {path}')
-            check_call([ 'git', 'clone', url, str(path) ])
+    # Stale clones are pulled, in the background (unless a lockfile pins them)
+    @directfield(parse=open_clone, ttl=lambda: None if lockfile.locked() else opts.clone_ttl)
+    def clone(self, path): git_clone(self.git_url, path)
 
     @property
-    def commit(self): return Commit(self.clone.commit().hexsha, self)
+    def commit(self): return Commit(lockfile.commit(self, 'gitlab'), self)
 
     @property
-    def clone_dir(self): return pathlib.Path(self.clone.git_dir).parent
+    def clone_dir(self): return pathlib.Path(self.clone.working_tree_dir or self.clone.git_dir)
 
 
 from gists import importer
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+'''Compare the cost of reading a materialized `@field` against a plain instance attribute and a `@property`
+
+Usage: python benchmarks/access.py [-n <accesses per timing>] [-r <repetitions>]
+
+"field" is a memory hit on a `@field` (a plain instance-attribute lookup, after the first access); "field (counted)" is
+the same with memory-hit counting turned on (`pclass.stats.track()`), and "field (ttl)" a field with a `ttl` (both go
+through a data-descriptor, on every access).
+'''
+
+from argparse import ArgumentParser
+from os.path import dirname
+import sys
+from tempfile import TemporaryDirectory
+from timeit import repeat
+
+sys.path.insert(0, dirname(dirname(__file__)))
+
+from pclass import stats
+from pclass.dircache import Meta
+from pclass.field import field
+
+
+parser = ArgumentParser()
+parser.add_argument('-n', '--number', type=int, default=1_000_000, help='Accesses per timing')
+parser.add_argument('-r', '--repeat', type=int, default=5, help='Time each access this many times, report the best')
+args = parser.parse_args()
+
+
+class Plain:
+    def __init__(self):
+        self.value = 1
+
+    @property
+    def prop(self): return self.value
+
+
+with TemporaryDirectory() as cache_root:
+
+    class Obj(metaclass=Meta, cache_root=cache_root):
+        @field
+        def value(self): return 1
+
+        @field(ttl=3600)
+        def ttl(self): return 1
+
+    class Counted(metaclass=Meta, cache_root=cache_root):
+        @field
+        def value(self): return 1
+
+    Counted.track()
+
+    plain, obj, counted = Plain(), Obj(1), Counted(1)
+    # Materialize the fields
+    obj.value, obj.ttl, counted.value
+
+    cases = {
+        'attribute': 'plain.value',
+        'property': 'plain.prop',
+        'field': 'obj.value',
+        'field (counted)': 'counted.value',
+        'field (ttl)': 'obj.ttl',
+    }
+
+    base = None
+    print(f'{"access":<16} {"ns":>7} {"x attr":>7}')
+    for name, stmt in cases.items():
+        ns = min(repeat(stmt, globals=globals(), number=args.number, repeat=args.repeat)) / args.number * 1e9
+        if base is None: base = ns
+        print(f'{name:<16} {ns:>7.1f} {ns / base:>7.2f}')
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+'''Microbenchmarks of `pclass.dircache.Meta`: class creation, instance construction, and `@field` accesses
+
+Usage: python benchmarks/fields.py [-c <instance counts>] [-s <value sizes>] [-l <loaders>] [-S <storages>]
+                                  [-r <repetitions>] [-o <results.json>] [-b <baseline.json>]
+
+For each storage backend, loader, value size (approximate serialized bytes), and instance count (ids per class):
+- construct: constructing an instance
+- compute+save: first access of a `@field` (computing a precomputed value, and saving it)
+- memory hit: accessing an already-materialized field
+- disk hit: first access of the field on a fresh instance (of a new class sharing the same cache), i.e. a load
+
+Times are per operation (the best of `-r` repetitions, each in a fresh cache directory); combinations whose values
+would total more than `--max-bytes` are skipped. Larger counts are slow to set up (each instance's value is computed
+and saved first); time them separately, e.g. `-c 1e5 -l json,pickle -s 16`.
+
+Results are written as JSON (to stdout, or `-o`), keyed on "<storage>/<loader>/<size>/<count>/<op>"; with `-b`, a
+table comparing them to a previous run's goes to stderr. The "stored" column is the serialized size of each value.
+'''
+
+from argparse import ArgumentParser
+import json
+from os.path import dirname
+from pathlib import Path
+import platform
+import sys
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+sys.path.insert(0, dirname(dirname(__file__)))
+
+from pclass.dircache import Meta
+from pclass.field import field
+from pclass.loader import JSON, MSGPACK, NPY, PICKLE
+from pclass.storage import DirStorage, SQLiteStorage
+
+
+LOADERS = { 'json': JSON, 'msgpack': MSGPACK, 'pickle': PICKLE, 'npy': NPY, }
+STORAGES = { 'dir': DirStorage, 'sqlite': SQLiteStorage, }
+OPS = [ 'construct', 'compute+save', 'memory hit', 'disk hit', ]
+
+
+def ints(s): return [ int(float(v)) for v in s.split(',') ]
+def names(s): return s.split(',')
+
+
+parser = ArgumentParser()
+parser.add_argument('-c', '--counts', type=ints, default='1,100,10000', help='Instances (ids) per class')
+parser.add_argument('-s', '--sizes', type=ints, default='16,1024,65536', help='Approximate value sizes (bytes)')
+parser.add_argument('-l', '--loaders', type=names, default=','.join(LOADERS), help='Loaders to use')
+parser.add_argument('-S', '--storages', type=names, default=','.join(STORAGES), help='Storage backends to use')
+parser.add_argument('-f', '--fields', type=int, default=5, help='Fields per class, in the class-creation benchmark')
+parser.add_argument('-r', '--repeat', type=int, default=3, help='Time each case this many times, report the best')
+parser.add_argument('-m', '--max-bytes', type=int, default=1 << 28, help='Skip cases whose values total more than this')
+parser.add_argument('-o', '--out', help='Write JSON results here (default: stdout)')
+parser.add_argument('-b', '--baseline', help='Print a comparison with these (JSON) results, from a previous run')
+args = parser.parse_args()
+
+
+def value(loader, size):
+    '''A list (or, for `npy`, an array) of floats, serializing to roughly `size` bytes'''
+    n = max(1, size // 8)
+    if loader == 'npy':
+        import numpy as np
+        return np.full(n, .5)
+    return [ .5 ] * n
+
+
+def define(cache_root, name, fields=1, **kwargs):
+    '''Create a `Meta` class with `fields` `@field`s ("f0", …), each returning `kwargs['value']`'''
+    val = kwargs.pop('value', None)
+    loader = kwargs.pop('loader', None)
+    dct = { f'f{i}': field(lambda self: val, loader=loader) for i in range(fields) }
+    return Meta(name, (), dct, cache_root=cache_root, cache_type_name='bench', **kwargs)
+
+
+def class_creation(n=200):
+    best = None
+    for _ in range(args.repeat):
+        with TemporaryDirectory() as cache_root:
+            start = perf_counter()
+            for i in range(n):
+                define(cache_root, f'Cls{i}', args.fields)
+            elapsed = (perf_counter() - start) / n
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def fields_case(storage, loader, size, count):
+    '''Per-op seconds for each of `OPS`, for `count` instances of a class with one field'''
+    val = value(loader, size)
+    # Enough memory-hit passes to time ~10^5 accesses
+    passes = max(1, 100_000 // count)
+    best = {}
+    for _ in range(args.repeat):
+        with TemporaryDirectory() as cache_root:
+            kwargs = dict(storage=STORAGES[storage], loader=LOADERS[loader], value=val)
+            cls = define(cache_root, 'Bench', **kwargs)
+            ids = range(count)
+
+            start = perf_counter()
+            objs = [ cls(id) for id in ids ]
+            construct = perf_counter() - start
+
+            start = perf_counter()
+            for obj in objs: obj.f0
+            compute = perf_counter() - start
+
+            start = perf_counter()
+            for _ in range(passes):
+                for obj in objs: obj.f0
+            memory = (perf_counter() - start) / passes
+
+            # A new class over the same cache directory (and storage) has no materialized instances
+            cls = define(cache_root, 'Bench', **kwargs)
+            objs = [ cls(id) for id in ids ]
+            start = perf_counter()
+            for obj in objs: obj.f0
+            disk = perf_counter() - start
+
+            times = dict(zip(OPS, [ construct, compute, memory, disk ]))
+            for op, seconds in times.items():
+                seconds /= count
+                best[op] = min(best.get(op, seconds), seconds)
+            stored = cls.stats()['f0']['bytes_read'] // count
+    return best, stored
+
+
+def run():
+    results = { 'class creation': class_creation() }
+    sys.stderr.write(f'class creation ({args.fields} fields): {results["class creation"] * 1e6:.1f}µs\n')
+    sys.stderr.write(f'{"storage":<7} {"loader":<8} {"size":>7} {"count":>7} {"stored":>7}' +
+                     ''.join( f' {op:>12}' for op in OPS ) + '\n')
+    for storage in args.storages:
+        for loader in args.loaders:
+            for size in args.sizes:
+                for count in args.counts:
+                    if size * count > args.max_bytes: continue
+                    times, stored = fields_case(storage, loader, size, count)
+                    for op, seconds in times.items():
+                        results[f'{storage}/{loader}/{size}/{count}/{op}'] = seconds
+                    sys.stderr.write(
+                        f'{storage:<7} {loader:<8} {size:>7} {count:>7} {stored:>7}' +
+                        ''.join( f' {times[op] * 1e6:>10.2f}µs' for op in OPS ) + '\n'
+                    )
+    return results
+
+
+def compare(results, baseline):
+    '''Print each result's ratio to `baseline`'s (<1: faster now)'''
+    sys.stderr.write(f'{"case":<40} {"baseline":>10} {"now":>10} {"ratio":>6}\n')
+    for key, seconds in results.items():
+        prev = baseline.get(key)
+        if prev is None: continue
+        sys.stderr.write(f'{key:<40} {prev * 1e6:>8.2f}µs {seconds * 1e6:>8.2f}µs {seconds / prev:>6.2f}\n')
+
+
+results = run()
+data = dict(
+    params=dict(
+        counts=args.counts, sizes=args.sizes, loaders=args.loaders, storages=args.storages, fields=args.fields,
+        repeat=args.repeat, max_bytes=args.max_bytes,
+    ),
+    env=dict(python=platform.python_version(), platform=platform.platform()),
+    results=results,
+)
+if args.baseline:
+    compare(results, json.loads(Path(args.baseline).read_text())['results'])
+out = json.dumps(data, indent=2)
+if args.out:
+    Path(args.out).write_text(out + '\n')
+else:
+    print(out)
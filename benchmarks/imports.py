@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+'''Offline import-latency benchmarks, against synthetic local git repos, Gists, and URLs
+
+Usage: python benchmarks/imports.py [-n <notebooks>] [-p <.py files>] [-d <depth>] [-l <lines>] [-r <repetitions>]
+                                   [-o <results.json>]
+
+Generates a repo (a package nested `depth` levels deep, with the notebooks and `.py` files spread across its levels) and
+a Gist (the same files, flat), as bare repos that `https://github.com/…` / `https://gist.github.com/…` clone URLs are
+redirected to (as `file://` URLs, via git's `url.<base>.insteadOf`; requires git ≥2.31), and serves a `.py` file from a
+local HTTP server. Each measurement runs in a fresh interpreter:
+
+- github / gist / url: `import github.bench.repo`, `import gist.<id>`, and `ur(<url>)`, "cold" (empty `cache_root`:
+  clone/download, then compile) and "warm" (reusing the first cold run's cache)
+- find_spec: per-call cost of the `Importer` rejecting (unrelated) stdlib module names, which it sees on every import
+
+Results (seconds for each repetition, and peak RSS) are written as JSON (to stdout, or `-o`); a summary table goes to
+stderr.
+'''
+
+from argparse import ArgumentParser
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import json
+from os import environ
+from os.path import abspath, dirname
+from pathlib import Path
+import platform
+from statistics import median
+from subprocess import check_call, check_output, DEVNULL, PIPE, run
+import sys
+from tempfile import TemporaryDirectory
+from threading import Thread
+
+
+REPO_ROOT = dirname(dirname(abspath(__file__)))
+GIST_ID = 'b0a1c2d3e4f5a6b7c8d9e0f1a2b3c4d5'
+STDLIB = [ 'json', 'csv', 'decimal', 'fractions', 'statistics', 'xml.dom.minidom', 'email.mime.text', 'sqlite3', ]
+
+
+def py_source(i, lines):
+    '''`lines` lines of Python: mostly small functions, plus a top-level statement'''
+    src = [ f'X_{i} = {i!r}' ]
+    for j in range(max(0, lines - 1) // 2):
+        src += [ f'def f_{i}_{j}(x):', f'    return x + {j}' ]
+    return '\n'.join(src) + '\n'
+
+
+def notebook(i, lines, cells=4):
+    '''Notebook JSON with `cells` code cells (of roughly `lines` lines, total); each cell ends with a top-level
+    expression, which `only_defs` strips'''
+    per_cell = max(2, lines // cells)
+    return json.dumps({
+        'cells': [
+            {
+                'cell_type': 'code',
+                'execution_count': None,
+                'metadata': {},
+                'outputs': [],
+                'source': py_source(f'{i}_{c}', per_cell - 1) + f'f_{i}_{c}_0(1) if {per_cell} > 2 else None\n',
+            }
+            for c in range(cells)
+        ],
+        'metadata': { 'kernelspec': { 'display_name': 'Python 3', 'language': 'python', 'name': 'python3' } },
+        'nbformat': 4,
+        'nbformat_minor': 4,
+    })
+
+
+def git(*args, cwd):
+    check_call([ 'git', '-c', 'user.name=ur', '-c', 'user.email=ur@example.com', *args ], cwd=cwd, stdout=DEVNULL)
+
+
+def make_repo(path, notebooks, pys, depth, lines):
+    '''Write a package nested `depth` levels deep under `path`, with `notebooks` notebooks and `pys` `.py` files spread
+    (round-robin) across its levels, and commit it'''
+    levels = [ path ]
+    for d in range(1, depth):
+        levels.append(levels[-1] / f'sub{d}')
+    for level in levels:
+        level.mkdir(parents=True)
+        (level / '__init__.py').write_text('')
+    for i in range(pys):
+        (levels[i % depth] / f'm{i}.py').write_text(py_source(i, lines))
+    for i in range(notebooks):
+        (levels[i % depth] / f'nb{i}.ipynb').write_text(notebook(i, lines))
+    git('init', '-q', cwd=path)
+    git('add', '.', cwd=path)
+    git('commit', '-qm', 'synthetic', cwd=path)
+
+
+def make_gist(path, notebooks, pys, lines):
+    path.mkdir(parents=True)
+    for i in range(pys):
+        (path / f'm{i}.py').write_text(py_source(i, lines))
+    for i in range(notebooks):
+        (path / f'nb{i}.ipynb').write_text(notebook(i, lines))
+    git('init', '-q', cwd=path)
+    git('add', '.', cwd=path)
+    git('commit', '-qm', 'synthetic', cwd=path)
+
+
+def bare(src, dst):
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    check_call([ 'git', 'clone', '-q', '--bare', str(src), str(dst) ])
+
+
+def serve(directory):
+    '''Serve `directory` over HTTP from a background thread; return the server'''
+    class Handler(SimpleHTTPRequestHandler):
+        def log_message(self, *args): pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(Handler, directory=str(directory)))
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def child(spec):
+    '''Run one measurement (in a fresh interpreter); write `dict(seconds, ur_seconds, rss_kb, modules)` to
+    `spec["out"]`'''
+    from time import perf_counter
+    sys.path.insert(0, REPO_ROOT)
+    import opts
+    opts.cache_root = spec['cache_root']
+
+    start = perf_counter()
+    import ur
+    ur_seconds = perf_counter() - start
+
+    kind = spec['kind']
+    start = perf_counter()
+    if kind == 'github':
+        import github.bench.repo
+        prefix = 'github.bench.repo'
+    elif kind == 'gist':
+        __import__(f'gist.{GIST_ID}')
+        prefix = f'gist.{GIST_ID}'
+    elif kind == 'url':
+        ur(spec['url'])
+        prefix = None
+    elif kind == 'find_spec':
+        from timeit import repeat
+        from importer import Importer
+        [ importer ] = [ finder for finder in sys.meta_path if isinstance(finder, Importer) ]
+        number = 1000
+        per_call = {
+            name: min(repeat(lambda: importer.find_spec(name), number=number, repeat=5)) / number
+            for name in STDLIB
+        }
+        prefix = None
+    else:
+        raise ValueError(kind)
+    seconds = perf_counter() - start
+
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result = dict(
+        seconds=seconds,
+        ur_seconds=ur_seconds,
+        # Linux reports KB, macOS bytes
+        rss_kb=rss // 1024 if sys.platform == 'darwin' else rss,
+        modules=len([ name for name in sys.modules if prefix and name.startswith(prefix) ]),
+    )
+    if kind == 'find_spec':
+        result['per_call'] = per_call
+    Path(spec['out']).write_text(json.dumps(result))
+
+
+def measure(spec, env, cwd, tmp):
+    out = tmp / 'result.json'
+    proc = run(
+        [ sys.executable, __file__, '--child', json.dumps({ **spec, 'out': str(out) }) ],
+        env=env, cwd=cwd, stdout=DEVNULL, stderr=PIPE,
+    )
+    if proc.returncode:
+        raise RuntimeError(f'Benchmark child failed ({proc.returncode}): {spec}\n{proc.stderr.decode()}')
+    return json.loads(out.read_text())
+
+
+def summarize(name, cache, runs):
+    seconds = [ r['seconds'] for r in runs ]
+    return dict(
+        name=name,
+        cache=cache,
+        seconds=seconds,
+        min=min(seconds),
+        median=median(seconds),
+        ur_seconds=median([ r['ur_seconds'] for r in runs ]),
+        rss_kb=max( r['rss_kb'] for r in runs ),
+        modules=runs[0]['modules'],
+    )
+
+
+def main(args):
+    with TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        remote = tmp / 'remote'
+        src = tmp / 'src'
+        make_repo(src / 'repo', args.notebooks, args.pys, args.depth, args.lines)
+        bare(src / 'repo', remote / 'github' / 'bench' / 'repo.git')
+        make_gist(src / 'gist', args.notebooks, args.pys, args.lines)
+        bare(src / 'gist', remote / 'gist' / f'{GIST_ID}.git')
+
+        www = tmp / 'www'
+        www.mkdir()
+        # URL imports execute downloads as `.py` files (they're cached under a `content` file name, without the URL's
+        # extension)
+        (www / 'mod.py').write_text(py_source(0, args.lines))
+        server = serve(www)
+        url = f'http://127.0.0.1:{server.server_port}/mod.py'
+
+        env = {
+            **environ,
+            'GIT_CONFIG_COUNT': '2',
+            'GIT_CONFIG_KEY_0': f'url.file://{remote}/github/.insteadOf',
+            'GIT_CONFIG_VALUE_0': 'https://github.com/',
+            'GIT_CONFIG_KEY_1': f'url.file://{remote}/gist/.insteadOf',
+            'GIT_CONFIG_VALUE_1': 'https://gist.github.com/',
+        }
+        # Not inside a git repo (which the `Importer` would search, too)
+        cwd = tmp / 'work'
+        cwd.mkdir()
+
+        cases = []
+        try:
+            for kind in [ 'github', 'gist', 'url' ]:
+                cold = []
+                warm_root = None
+                for i in range(args.repeat):
+                    cache_root = tmp / 'cache' / f'{kind}-{i}'
+                    cold.append(measure(dict(kind=kind, cache_root=str(cache_root), url=url), env, cwd, tmp))
+                    warm_root = warm_root or cache_root
+                warm = [
+                    measure(dict(kind=kind, cache_root=str(warm_root), url=url), env, cwd, tmp)
+                    for _ in range(args.repeat)
+                ]
+                cases.append(summarize(kind, 'cold', cold))
+                cases.append(summarize(kind, 'warm', warm))
+
+            find_spec = measure(dict(kind='find_spec', cache_root=str(tmp / 'cache' / 'find_spec')), env, cwd, tmp)
+        finally:
+            server.shutdown()
+
+    return dict(
+        params=dict(notebooks=args.notebooks, pys=args.pys, depth=args.depth, lines=args.lines, repeat=args.repeat),
+        env=dict(
+            python=platform.python_version(),
+            platform=platform.platform(),
+            git=check_output([ 'git', '--version' ]).decode().strip(),
+        ),
+        cases=cases,
+        find_spec=find_spec['per_call'],
+    )
+
+
+def report(results):
+    err = sys.stderr
+    err.write(f'{"case":<8} {"cache":<5} {"min":>8} {"median":>8} {"import ur":>9} {"modules":>7} {"peak RSS":>9}\n')
+    for case in results['cases']:
+        err.write(
+            f'{case["name"]:<8} {case["cache"]:<5} {case["min"]:>7.3f}s {case["median"]:>7.3f}s '
+            f'{case["ur_seconds"]:>8.3f}s {case["modules"]:>7} {case["rss_kb"] / 1024:>7.1f}MB\n'
+        )
+    err.write('find_spec rejection, per call: %s\n' % ', '.join(
+        f'{name} {seconds * 1e6:.1f}µs' for name, seconds in results['find_spec'].items()
+    ))
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--notebooks', type=int, default=10, help='Notebooks per repo/Gist')
+    parser.add_argument('-p', '--pys', type=int, default=20, help='.py files per repo/Gist')
+    parser.add_argument('-d', '--depth', type=int, default=3, help='Levels of (nested) packages in the repo')
+    parser.add_argument('-l', '--lines', type=int, default=50, help='Lines per file')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='Measurements per case (each in a new process)')
+    parser.add_argument('-o', '--out', help='Write JSON results here (default: stdout)')
+    parser.add_argument('--child', help='(internal) run one measurement, described by a JSON object')
+    args = parser.parse_args()
+
+    if args.child:
+        child(json.loads(args.child))
+    else:
+        results = main(args)
+        report(results)
+        data = json.dumps(results, indent=2)
+        if args.out:
+            Path(args.out).write_text(data + '\n')
+        else:
+            print(data)
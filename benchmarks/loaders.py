@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+'''Compare save/load times of `pclass.loader` serializers, for a numeric array and a list of records
+
+Usage: python benchmarks/loaders.py [-n <array length>] [-r <repetitions>]
+
+"load" times loading a cached field value; "load+sum" additionally touches every element (a memory-mapped `.npy`
+defers reading until then). JSON and msgpack store the array as a list of floats.
+'''
+
+from argparse import ArgumentParser
+from os.path import dirname
+from pathlib import Path
+import sys
+from tempfile import TemporaryDirectory
+from timeit import repeat
+
+sys.path.insert(0, dirname(dirname(__file__)))
+
+from pclass.loader import JSON, MSGPACK, NPY, PICKLE
+
+
+parser = ArgumentParser()
+parser.add_argument('-n', '--num', type=int, default=1_000_000, help='Length of the benchmarked array')
+parser.add_argument('-r', '--repeat', type=int, default=5, help='Time each operation this many times, report the best')
+args = parser.parse_args()
+
+import numpy as np
+
+n = args.num
+arr = np.random.default_rng(0).random(n)
+values = {
+    'array': {
+        'json': arr.tolist(),
+        'msgpack': arr.tolist(),
+        'pickle': arr,
+        'npy': arr,
+    },
+    'records': {
+        name: [ { 'id': i, 'name': f'row-{i}', 'value': float(v) } for i, v in enumerate(arr[:n // 10]) ]
+        for name in [ 'json', 'msgpack', 'pickle' ]
+    },
+}
+loaders = { 'json': JSON, 'msgpack': MSGPACK, 'pickle': PICKLE, 'npy': NPY, }
+
+
+def total(val):
+    if isinstance(val, np.ndarray): return float(val.sum())
+    if val and isinstance(val[0], dict): return sum( r['value'] for r in val )
+    return sum(val)
+
+
+def best(fn):
+    return min(repeat(fn, number=1, repeat=args.repeat))
+
+
+print(f'{"value":<8} {"loader":<8} {"size":>10} {"save":>9} {"load":>9} {"load+sum":>9}')
+with TemporaryDirectory() as tmp:
+    for kind, vals in values.items():
+        for name, val in vals.items():
+            loader = loaders[name]
+            path = Path(tmp) / f'{kind}-{name}'
+            save = best(lambda: loader.save(path, val))
+            load = best(lambda: loader.load(path))
+            load_sum = best(lambda: total(loader.load(path)))
+            size = path.stat().st_size
+            print(f'{kind:<8} {name:<8} {size:>10,} {save * 1e3:>7.1f}ms {load * 1e3:>7.2f}ms {load_sum * 1e3:>7.1f}ms')
@@ -0,0 +1,63 @@
+'''`ur` command-line entry point
+
+Warm the on-disk caches ahead of time (e.g. in a Dockerfile or deploy hook), so that the first import in a fresh
+process doesn't pay cold-import costs:
+
+```bash
+ur warm github.org.repo gist._1288bff2f9e05394a94312010da267bb https://example.com/mod.py
+ur warm -f sources.txt  # one module name or URL per line
+```
+'''
+from argparse import ArgumentParser
+import sys
+
+import opts
+
+
+def read_sources(path):
+    '''Module names / URLs listed in the file at `path` (`-` for stdin), one per line; blank lines and lines starting
+    with `#` are ignored'''
+    if path == '-':
+        lines = sys.stdin.read().split('\n')
+    else:
+        with open(path, 'r') as f:
+            lines = f.read().split('\n')
+    lines = [ line.strip() for line in lines ]
+    return [ line for line in lines if line and not line.startswith('#') ]
+
+
+def warm(args):
+    from prefetch import warm
+    sources = list(args.sources)
+    for path in args.file:
+        sources += read_sources(path)
+    if not sources:
+        raise SystemExit('ur warm: no sources given; pass module names / URLs, or -f <file>')
+    results = warm(sources, workers=args.workers, compile=not args.no_compile)
+    return 1 if any( result['errors'] for result in results['sources'] ) else 0
+
+
+def main(args=None):
+    parser = ArgumentParser(prog='ur', description='Import Python modules and notebooks from Gists, git repos, and URLs')
+    parser.add_argument('-c', '--cache-root', help='Cache directory (default: `opts.cache_root`, or .objs/)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    cmd = commands.add_parser(
+        'warm',
+        help='Fetch sources, and build their tree indexes and compiled-code caches (without executing them)',
+    )
+    cmd.add_argument('-f', '--file', action='append', default=[], help='File listing module names / URLs to warm, one '
+                                                                          'per line ("-" for stdin); may be repeated')
+    cmd.add_argument('-j', '--workers', type=int, help='Maximum number of concurrent fetches')
+    cmd.add_argument('-C', '--no-compile', action='store_true', help='Only fetch sources; skip building code caches')
+    cmd.add_argument('sources', nargs='*', help='Module names (e.g. github.org.repo) or URLs')
+    cmd.set_defaults(run=warm)
+
+    args = parser.parse_args(args)
+    if args.cache_root:
+        opts.cache_root = args.cache_root
+    return args.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
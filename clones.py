@@ -0,0 +1,103 @@
+from subprocess import check_call
+from threading import current_thread, local, main_thread
+
+from lockfile import locked
+import opts
+
+
+# `git clone` flags for each `opts.clone_strategy`
+STRATEGIES = {
+    'full': [],
+    'shallow': ['--depth=1'],  # only the latest commit
+    'blobless': ['--filter=blob:none'],  # partial clone; blobs are fetched on demand (e.g. when a `GitNode` is read)
+    'no-checkout': ['--no-checkout'],  # skip writing a working tree (`GitNode`s only read from the object database)
+    'bare': ['--bare'],  # no working tree at all
+}
+
+
+def strategies(strategy=None):
+    '''Normalize a clone strategy (a name from `STRATEGIES`, a comma-delimited string of them, or a list) to a list of
+    names'''
+    if strategy is None: strategy = opts.clone_strategy
+    if not strategy: return ['full']
+    if isinstance(strategy, str): strategy = strategy.split(',')
+    strategy = [ s.strip() for s in strategy ]
+    unknown = [ s for s in strategy if s not in STRATEGIES ]
+    if unknown:
+        raise ValueError(f'Unrecognized clone strategies {unknown}; expected one of {list(STRATEGIES.keys())}')
+    return strategy
+
+
+def clone_args(strategy=None):
+    return [ arg for s in strategies(strategy) for arg in STRATEGIES[s] ]
+
+
+def is_partial(repo):
+    '''Whether `repo` is a partial ("blobless") clone, i.e. may be missing objects that git will fetch on demand'''
+    return repo.config_reader().get_value('remote "origin"', 'promisor', False) is True
+
+
+def open_clone(path):
+    '''`git.Repo` for the clone at `path`
+
+    GitPython is imported lazily: importing it runs `git version`, which imports resolved from a lockfile avoid.
+    '''
+    from git import Repo
+    return Repo(path)
+
+
+# Per-thread object databases (see `objects`)
+_local = local()
+
+
+def objects(source):
+    '''Object database to read blobs from `source`'s (a `Gist`, `Github`, or `Gitlab`'s) clone
+
+    Normally the clone's `odb` (which runs `git cat-file` subprocesses); with a lockfile active (see `lockfile`), a
+    pure-Python `gitdb` reader over its `objects/` dir, so that imports spawn no `git` processes (the latter doesn't
+    fetch objects missing from partial clones).
+
+    A `git cat-file --batch` process serves one reader at a time, so threads other than the main one (e.g.
+    `Importer.prefetch` workers) each get their own, and read concurrently.
+    '''
+    cache = getattr(_local, 'objects', None)
+    if cache is None: cache = _local.objects = {}
+    if not locked():
+        repo = source.clone
+        if current_thread() is main_thread(): return repo.odb
+        # Keyed on the `Repo` itself (held alongside), so that a re-cloned source gets a new reader
+        entry = cache.get(id(repo))
+        if entry is None:
+            cache[id(repo)] = entry = (repo, open_clone(repo.git_dir).odb)
+        return entry[1]
+    path = source._dir / 'clone'
+    git_dir = path / '.git'
+    if not git_dir.is_dir():
+        # Bare clone
+        git_dir = path
+    if git_dir not in cache:
+        from gitdb import GitDB
+        cache[git_dir] = GitDB(str(git_dir / 'objects'))
+    return cache[git_dir]
+
+
+def clone(url, path, strategy=None):
+    '''Clone `url` into `path` (or update an existing clone there), using the given (or configured) strategy'''
+    strategy = strategies(strategy)
+    if path.exists():
+        print(f'{path} exists; attempting to pull')
+        repo = open_clone(path)
+        depth = ['--depth=1'] if 'shallow' in strategy else []
+        if repo.bare:
+            repo.git.fetch('origin', '+refs/heads/*:refs/heads/*', *depth)
+        elif depth or 'no-checkout' in strategy:
+            # Shallow histories can't be merged (and clones are only caches anyway): move the current branch to its
+            # upstream, without populating the index / working tree in the "no-checkout" case
+            repo.git.fetch('origin', *depth)
+            repo.git.reset('--soft' if 'no-checkout' in strategy else '--hard', '@{upstream}')
+        else:
+            repo.remotes.origin.pull()
+    else:
+        args = clone_args(strategy)
+        print(f'Cloning {url} into {path}%s' % (f' ({" ".join(args)})' if args else ''))
+        check_call([ 'git', 'clone', *args, url, str(path) ])
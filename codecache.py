@@ -0,0 +1,80 @@
+from _imp import _fix_co_filename
+from hashlib import sha256
+from importlib.util import MAGIC_NUMBER
+from sys import implementation
+
+import IPython
+
+from pclass.dircache import Meta
+from pclass.field import field
+from pclass.loader import MARSHAL
+from tracer import span
+
+
+# Bump when `Importer.compile_nb` (or `CellDeleter`) changes in a way that affects the code objects it produces
+TRANSFORMER_VERSION = 1
+
+
+def fix_filename(code, filename):
+    '''Point a cached code object (and any nested ones) at the file it is being loaded from, a la `importlib`'s
+    handling of `.pyc`s'''
+    if filename and code.co_filename != filename:
+        _fix_co_filename(code, filename)
+    return code
+
+
+class NotebookCode(metaclass=Meta):
+    '''Compiled code objects for a notebook's code cells, persisted like a `__pycache__` entry
+
+    The `id` hashes the notebook's contents along with everything else that affects compilation: the `only_defs`
+    setting, the Python and IPython versions, and `TRANSFORMER_VERSION`.
+    '''
+    def __init__(self, text, importer, only_defs, filename=None):
+        self.text = text
+        self.importer = importer
+        self.only_defs = only_defs
+        self.filename = filename
+
+    @staticmethod
+    def key(text, only_defs):
+        h = sha256()
+        for piece in [ MAGIC_NUMBER.hex(), IPython.__version__, TRANSFORMER_VERSION, bool(only_defs) ]:
+            h.update(f'{piece}\n'.encode())
+        h.update(text.encode())
+        return h.hexdigest()
+
+    @classmethod
+    def get(cls, text, importer, only_defs, filename=None):
+        '''Return a list of code objects (one per code cell), or `None` for non-Python notebooks'''
+        code = cls(cls.key(text, only_defs), text, importer, only_defs, filename)
+        cells = code.cells
+        if cells is None: return None
+        return [ fix_filename(cell, filename) for cell in cells ]
+
+    @field(loader=MARSHAL)
+    def cells(self):
+        return self.importer.compile_source(self.text, self.filename, notebook=True, only_defs=self.only_defs)
+
+
+class BlobCode(metaclass=Meta):
+    '''Compiled code object for a `.py` file in a git tree
+
+    Blob SHAs already hash their contents, so the `id` is just the blob's SHA plus the interpreter's cache tag (e.g.
+    `cpython-38`); warm imports skip reading the blob as well as compiling it.
+    '''
+    def __init__(self, node, importer, filename):
+        self.node = node
+        self.importer = importer
+        self.filename = filename
+
+    @classmethod
+    def get(cls, node, importer, filename):
+        code = cls(f'{node.hexsha}.{implementation.cache_tag}', node, importer, filename).code
+        return fix_filename(code, filename)
+
+    @field(loader=MARSHAL)
+    def code(self):
+        with span('read', self.filename):
+            text = self.node.read_text()
+        [ code ] = self.importer.compile_source(text, self.filename, notebook=False)
+        return code
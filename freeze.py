@@ -0,0 +1,218 @@
+'''Freeze modules imported via `ur` into a single zip archive, importable by Python's stock `zipimport`
+
+Putting the archive on `sys.path` serves the same `gist.*`, `github.*`, `gitlab.*` (and local notebook) module names
+without `ur`, IPython, GitPython, or the network: notebooks are converted to `.py` (with the same input transforms and
+`only_defs` filtering that `Importer` applies), and every module is precompiled to an unchecked hash-based `.pyc`
+(PEP 552), so that nothing is re-parsed or re-validated at import time.
+
+Usage:
+
+```bash
+python -m freeze -o deps.zip github.org.repo gist._1288bff2f9e05394a94312010da267bb
+PYTHONPATH=deps.zip python -c 'import github.org.repo'
+```
+'''
+import ast
+from importlib import import_module
+from importlib.util import MAGIC_NUMBER, source_hash
+import marshal
+from pathlib import Path
+import sys
+from sys import stderr
+from types import ModuleType
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED, ZIP_STORED
+
+import opts
+
+
+# Fixed timestamp for archive entries, so that freezing the same sources always produces the same archive
+DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+# Appended to a package's `__init__.py`: `Importer` executes a package's (selected) children along with it
+SUBMODULES = '''
+
+import importlib as _importlib
+for _name in %r:
+    _importlib.import_module(f'{__name__}.{_name}')
+del _importlib, _name
+'''
+
+# Wraps frozen notebooks that call `get_ipython` (e.g. transformed magics): like `Importer.exec_cells`, point the shell's
+# `user_ns` at the module's namespace while it executes (the `try` body is replaced with the notebook's code)
+SHELL_NS = '''
+from IPython import get_ipython
+from IPython.core.interactiveshell import InteractiveShell as _InteractiveShell
+_shell = _InteractiveShell.instance()
+_user_ns, _shell.user_ns = _shell.user_ns, globals()
+try:
+    pass
+finally:
+    _shell.user_ns = _user_ns
+    del _InteractiveShell, _shell, _user_ns
+'''
+
+# Appended to frozen notebooks when `opts.run_nbinit` is set (see `Importer.exec_cells`)
+NBINIT = '''
+
+if '__nbinit__' in globals():
+    __nbinit__()
+    __nbinit_done__ = True
+'''
+
+
+def loaded():
+    '''`{name: module}` for every module in `sys.modules` that was loaded by an `Importer`, in import order'''
+    from importer import Importer
+    return {
+        name: mod
+        for name, mod in list(sys.modules.items())
+        if isinstance(getattr(mod, '__loader__', None), Importer)
+    }
+
+
+def closure(names, mods):
+    '''The modules in `mods` (`{name: module}`, as returned by `loaded`) that importing `names` pulls in, in import order
+
+    That's the named modules, their parent packages, and (transitively) the submodules of non-synthetic packages (which
+    `Importer` executes along with them) and the modules that any of them refer to (modules, or e.g. functions and
+    classes imported from them, in their globals).
+    '''
+    keep = set()
+    todo = list(names)
+    while todo:
+        name = todo.pop()
+        if not isinstance(name, str) or name in keep or name not in mods: continue
+        keep.add(name)
+        parent = name.rpartition('.')[0]
+        if parent: todo.append(parent)
+        mod = mods[name]
+        if mod.__spec__._node is None:
+            # Synthetic package (e.g. `github`, `github.<org>`): its attributes are whichever of its children were loaded
+            continue
+        todo += [ child for child in mods if child.startswith(f'{name}.') ]
+        for val in list(vars(mod).values()):
+            todo.append(val.__name__ if isinstance(val, ModuleType) else getattr(val, '__module__', None))
+    return { name: mod for name, mod in mods.items() if name in keep }
+
+
+def uses_get_ipython(tree):
+    return any( isinstance(node, ast.Name) and node.id == 'get_ipython' for node in ast.walk(tree) )
+
+
+def notebook_source(importer, text, filename, only_defs=None):
+    '''Convert notebook JSON to `.py` source equivalent to what `Importer` executes for it ('' for non-Python
+    notebooks)
+
+    Requires Python ≥3.9 (for `ast.unparse`).
+    '''
+    if not hasattr(ast, 'unparse'):
+        raise RuntimeError(f'Freezing notebooks ({filename}) requires Python ≥3.9 (for `ast.unparse`)')
+    from nb import reads_nb
+    nb = reads_nb(text)
+    if not importer.is_python(nb):
+        return ''
+    body = [ stmt for tree in importer.transform_nb(nb, filename, only_defs=only_defs) for stmt in tree.body ]
+    tree = ast.Module(body=body, type_ignores=[])
+    if body and uses_get_ipython(tree):
+        tree = ast.parse(SHELL_NS)
+        tree.body[-1].body = body
+    source = ast.unparse(tree)
+    if opts.run_nbinit:
+        source += NBINIT
+    return source + '\n'
+
+
+def module_source(importer, mod, children, only_defs=None):
+    '''`.py` source for module `mod`; `children` are the basenames of its loaded submodules'''
+    node = mod.__spec__._node
+    if node is None:
+        # Synthetic package (e.g. `github`, `github.<org>`)
+        return ''
+    if node.is_dir:
+        nodes = node.children
+        source = nodes['__init__.py'].read_text() if '__init__.py' in nodes else ''
+        if children:
+            source += SUBMODULES % children
+        return source
+    if node.name.endswith('.ipynb'):
+        return notebook_source(importer, node.read_text(), mod.__file__, only_defs=only_defs)
+    return node.read_text()
+
+
+def pyc(code, source):
+    '''Unchecked hash-based `.pyc` (PEP 552) bytes for `code`, compiled from `source`'''
+    flags = 0b01  # hash-based, unchecked
+    return MAGIC_NUMBER + flags.to_bytes(4, 'little') + source_hash(source) + marshal.dumps(code)
+
+
+def archive_path(mod):
+    path = mod.__name__.replace('.', '/')
+    return f'{path}/__init__.py' if mod.__spec__.submodule_search_locations is not None else f'{path}.py'
+
+
+def freeze(modules, path, only_defs=None, compress=False):
+    '''Import `modules` (module names, e.g. `github.org.repo`), then write them, and the modules `ur` loaded for them
+    (see `closure`), to a zip archive at `path`
+
+    Submodules are imported eagerly (regardless of `opts.lazy`), so that the archive contains everything their packages
+    would load. Modules imported from URLs (via `ur(url)`) have no importable name, and aren't included. Returns the
+    names of the frozen modules.
+    '''
+    from gists import importer
+    from pclass.atomic import atomic_path
+
+    if isinstance(modules, str): modules = [modules]
+    lazy = opts.lazy
+    opts.lazy = False
+    try:
+        for name in modules:
+            import_module(name)
+    finally:
+        opts.lazy = lazy
+
+    mods = closure(modules, loaded())
+    entries = {}
+
+    def add(arcname, source):
+        code = compile(source, arcname, 'exec', dont_inherit=True)
+        entries[arcname] = source
+        entries[f'{arcname}c'] = pyc(code, source)
+
+    for name, mod in mods.items():
+        children = [
+            child.rsplit('.', 1)[1]
+            for child in mods
+            if child.rsplit('.', 1)[0] == name and '.' in child
+        ]
+        add(archive_path(mod), module_source(importer, mod, children, only_defs=only_defs).encode())
+
+    # Parent packages that weren't loaded by an `Importer` (e.g. this repo's own `github` package, which installs it, if
+    # imported first) are frozen empty, like other synthetic packages
+    parents = { name.rsplit('.', i)[0] for name in mods for i in range(1, name.count('.') + 1) } - set(mods)
+    for name in parents:
+        add(f'{name.replace(".", "/")}/__init__.py', b'')
+
+    with atomic_path(Path(path)) as tmp:
+        with ZipFile(tmp, 'w') as zf:
+            for arcname, data in sorted(entries.items()):
+                info = ZipInfo(arcname, DATE_TIME)
+                info.compress_type = ZIP_DEFLATED if compress else ZIP_STORED
+                info.external_attr = 0o644 << 16
+                zf.writestr(info, data)
+
+    return sorted([ *mods, *parents ])
+
+
+def main(args=None):
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description='Freeze modules imported via `ur` into a zip archive, importable via zipimport')
+    parser.add_argument('-o', '--output', required=True, help='Path to write the zip archive to')
+    parser.add_argument('-z', '--compress', action='store_true', help='Deflate archive entries (default: store them)')
+    parser.add_argument('modules', nargs='+', help='Module names to import and freeze (e.g. github.org.repo)')
+    args = parser.parse_args(args)
+    names = freeze(args.modules, args.output, compress=args.compress)
+    stderr.write(f'Froze {len(names)} modules into {args.output}\n')
+
+
+if __name__ == '__main__':
+    main()
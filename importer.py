@@ -1,4 +1,5 @@
 import ast
+import atexit
 from collections.abc import Iterable
 from contextlib import contextmanager, nullcontext
 from importlib._bootstrap import spec_from_loader
@@ -6,33 +7,60 @@ from importlib.machinery import ModuleSpec
 from IPython.core.interactiveshell import InteractiveShell
 from IPython import get_ipython
 import nbformat
-from os import environ as env
+from os import environ as env, getcwd, listdir, stat
+from os.path import join
 from pathlib import Path
 from re import match
-from requests import head as HEAD
 import sys
 from sys import stderr
+from threading import RLock
+from time import monotonic
 from types import ModuleType
-from urllib.parse import quote_plus
 
 from cells import CellDeleter
-from nb import read_nb
+from nb import reads_nb
 from node import Node, GitNode, PathNode
 import opts
+from tracer import span, PROFILES_ENV_VAR, TRACE_ENV_VAR
 from urignore import UrIgnore
 
 
+# Globals set in every module the `Importer` creates (not part of the modules' own namespaces, e.g. their `__all__`)
+INJECTED = dict(get_ipython=get_ipython)
+
+
+def enclosing_repo(path):
+    '''Working directory of the git repo enclosing `path` (the nearest ancestor containing a `.git`), or `None`
+
+    Equivalent to `git.Repo(path, search_parent_directories=True).working_dir` (for non-bare repos), without importing
+    GitPython, which runs `git version`.
+    '''
+    for dir in [ path, *path.parents ]:
+        if (dir / '.git').exists():
+            return str(dir)
+    return None
+
+
 class Importer:
     '''Importer providing a synthetic "gists" top-level package that allows importing `.py` and `.ipynb` files from
     GitHub Gists.'''
 
     DEBUG_ENV_VAR = 'UR_DEBUG'
+    # Time each phase of each import (and optionally cProfile each import root); see `tracer`
+    TRACE_ENV_VAR = TRACE_ENV_VAR
+    PROFILES_ENV_VAR = PROFILES_ENV_VAR
 
     def __init__(self, **kw):
         self.shell = InteractiveShell.instance()
         self._print = print
         self.path = []
         self.node_spec_map = {}
+        self.prefetched = {}
+        self.pools = {}
+        self.worker = kw.get('worker', False)
+        # Guards the lookup caches below (`find_spec` may be called from several threads, e.g. by `prefetch`)
+        self.lock = RLock()
+        self.invalidate_caches()
 
         default_urignore = Path.cwd() / '.urignore'
         if default_urignore.exists():
@@ -45,30 +73,115 @@ class Importer:
             self._print(*args, **kwargs)
 
     def exec_path(self, node, mod):
-        nb = read_nb(node)
+        cells = self.load_code(node, mod.__file__)
 
         # Only do something if it's a python notebook
-        if nb.metadata.kernelspec.language != 'python':
-            self.print("Ignoring '%s': not a python notebook." % file)
+        if cells is None:
+            self.print("Ignoring '%s': not a python notebook." % node)
             return
 
-        self.exec_nb(nb, mod)
+        self.exec_cells(cells, mod)
 
         return mod
 
-    def exec_nb(self, nb, mod, only_defs=None):
+    @staticmethod
+    def is_python(nb): return nb.metadata.kernelspec.language == 'python'
+
+    def load_code(self, node, filename):
+        '''Read and compile a `.py` or `.ipynb` node, via the persistent bytecode caches when `opts.bytecode_cache` is set
+
+        Returns a list of code objects (one per notebook code cell), or `None` for non-Python notebooks. If the node was
+        passed to `prefetch`, this just waits for the worker pool's result.
+        '''
+        future = self.prefetched.pop(node, None)
+        if future:
+            from codecache import fix_filename
+            self.print(f'Using prefetched code for {node}')
+            cells = future.result()
+            return None if cells is None else [ fix_filename(cell, filename) for cell in cells ]
+
+        return self.compile_node(node, filename)
+
+    def compile_node(self, node, filename):
+        notebook = node.name.endswith('.ipynb')
+        if opts.bytecode_cache and (notebook or isinstance(node, GitNode)):
+            from codecache import BlobCode, NotebookCode
+            if notebook:
+                with span('read', filename):
+                    text = node.read_text()
+                with span('compile', filename):
+                    return NotebookCode.get(text, self, only_defs=opts.only_defs, filename=filename)
+            elif isinstance(node, GitNode):
+                with span('compile', filename):
+                    return [ BlobCode.get(node, self, filename) ]
+
+        with span('read', filename):
+            text = node.read_text()
+        return self.compile_source(text, filename, notebook)
+
+    def compile_source(self, text, filename, notebook, only_defs=None):
+        '''Compile `.py` source or notebook JSON to a list of code objects (`None` for non-Python notebooks)
+
+        When `opts.pipeline == 'process'`, compilation happens in a worker process.
+        '''
+        if only_defs is None: only_defs = opts.only_defs
+        if opts.pipeline == 'process' and not self.worker:
+            from marshal import loads
+            with span('compile', filename):
+                future = self.pool('process').submit(compile_source, text, filename, notebook, only_defs)
+                return loads(future.result())
+
+        if notebook:
+            with span('parse', filename):
+                nb = reads_nb(text)
+            if not self.is_python(nb):
+                return None
+            return self.compile_nb(nb, filename, only_defs=only_defs)
+        else:
+            with span('compile', filename):
+                return [ compile(text, filename, 'exec') ]
+
+    def pool(self, kind):
+        '''Lazily-created `concurrent.futures` executor of the given kind ("thread" or "process")'''
+        if kind not in self.pools:
+            if kind == 'process':
+                from concurrent.futures import ProcessPoolExecutor as Executor
+            else:
+                from concurrent.futures import ThreadPoolExecutor as Executor
+            if not self.pools:
+                atexit.register(self.close)
+            self.pools[kind] = Executor(max_workers=opts.pipeline_workers)
+        return self.pools[kind]
+
+    def close(self):
+        '''Shut down any worker pools created by `pool` (also run at interpreter exit)'''
+        pools, self.pools = self.pools, {}
+        for pool in pools.values():
+            pool.shutdown()
+
+    def prefetch(self, nodes):
+        '''Start reading and compiling the `.py`/`.ipynb` files among `nodes` in a worker pool
+
+        The main thread still `exec`s modules one at a time, in the usual order; `load_code` picks up the results.
+        '''
+        pool = self.pool('thread')
+        if opts.pipeline == 'process':
+            # Create the process pool here, rather than racily from the thread-pool workers
+            self.pool('process')
+        for node in nodes:
+            if node.is_dir or node in self.prefetched: continue
+            if not (node.name.endswith('.py') or node.name.endswith('.ipynb')): continue
+            self.print(f'Prefetching {node}')
+            self.prefetched[node] = pool.submit(self.compile_node, node, str(node.url))
+
+    def transform_nb(self, nb, filename, only_defs=None):
+        '''Yield an AST for each code cell in `nb`, with IPython input transforms (magics etc.) applied, and (with
+        `only_defs`) anything that isn't a def, class, or import removed'''
         if only_defs is None: only_defs = opts.only_defs
 
-        dct = mod.__dict__
-
-        # extra work to ensure that magics that would affect the user_ns
-        # actually affect the notebook module's ns
-        save_user_ns = self.shell.user_ns
-        self.shell.user_ns = dct
-
-        try:
-            deleter = CellDeleter()
-            for cell in filter(lambda c: c.cell_type == 'code', nb.cells):
+        deleter = CellDeleter()
+        for cell in filter(lambda c: c.cell_type == 'code', nb.cells):
+            with span('transform', filename):
                 # transform the input into executable Python
                 code = self.shell.input_transformer_manager.transform_cell(cell.source)
                 if only_defs:
@@ -78,9 +191,32 @@ class Importer:
                 else:
                     self.print(f'all symbols!')
                     tree = ast.parse(code)
-                # run the code in the module
-                codeobj = compile(tree, filename=mod.__file__, mode='exec')
-                exec(codeobj, dct)
+            yield tree
+
+    def compile_nb(self, nb, filename, only_defs=None):
+        '''Compile each code cell in `nb` to a code object'''
+        cells = []
+        for tree in self.transform_nb(nb, filename, only_defs):
+            with span('compile', filename):
+                cells.append(compile(tree, filename=filename, mode='exec'))
+        return cells
+
+    def exec_nb(self, nb, mod, only_defs=None):
+        self.exec_cells(self.compile_nb(nb, mod.__file__, only_defs=only_defs), mod)
+
+    def exec_cells(self, cells, mod):
+        dct = mod.__dict__
+
+        # extra work to ensure that magics that would affect the user_ns
+        # actually affect the notebook module's ns
+        save_user_ns = self.shell.user_ns
+        self.shell.user_ns = dct
+
+        try:
+            with span('exec', mod.__name__):
+                for codeobj in cells:
+                    # run the code in the module
+                    exec(codeobj, dct)
         finally:
             self.shell.user_ns = save_user_ns
 
@@ -106,7 +242,8 @@ class Importer:
             self.print(f'Gist {id} (specified commit {commit}): skip_cache={opts.skip_cache}')
         else:
             gist = Gist(id, _skip_cache=opts.skip_cache)
-            commit = gist.commit
+            with span('clone', fullname):
+                commit = gist.commit
             self.print(f'Gist {id} (default commit {commit}): skip_cache={opts.skip_cache}')
 
         node = GitNode(commit)
@@ -141,7 +278,8 @@ class Importer:
         id = f'{org}/{repo}'
         self.print(f'GitHub repo {id}: skip_cache={opts.skip_cache}')
         github = Github(id, _skip_cache=opts.skip_cache)
-        commit = github.commit
+        with span('clone', fullname):
+            commit = github.commit
         node = GitNode(commit)
 
         if not mod_path:
@@ -156,21 +294,19 @@ class Importer:
             self.print(f'Creating top-level "{top}" package')
             return self.spec(fullname, None)
 
-        from sys import modules
-        mod = modules[top]
+        from _gitlab import GitlabPath
         groups = []
         project = None
         while mod_path:
             [ group, *mod_path ] = mod_path
-            if group.startswith('_'): org = org[1:]
+            if group.startswith('_'): group = group[1:]
             groups.append(group)
-            groups_str = quote_plus('/'.join(groups))
-            url = f'https://gitlab.com/api/v4/groups/{groups_str}'
-            resp = HEAD(url)
-            if not resp.ok:
-                url = f'https://gitlab.com/api/v4/projects/{groups_str}'
-                resp = HEAD(url)
-                if not resp.ok:
+            groups_str = '/'.join(groups)
+            with span('discover', groups_str):
+                kind = GitlabPath.resolve(groups_str)
+            self.print(f'GitLab path {groups_str}: {kind}')
+            if kind != 'group':
+                if kind != 'project':
                     raise ValueError(f"Request failed for {groups_str} ({groups}) as group and project")
 
                 project = groups[-1]
@@ -186,7 +322,8 @@ class Importer:
         from _gitlab import Gitlab
         self.print(f'GitLab repo {id}: skip_cache={opts.skip_cache}')
         gitlab = Gitlab(id, _skip_cache=opts.skip_cache)
-        commit = gitlab.commit
+        with span('clone', fullname):
+            commit = gitlab.commit
         node = GitNode(commit)
 
         if not mod_path:
@@ -200,7 +337,8 @@ class Importer:
         full_path = mod_path
         while mod_path:
             [ name, *mod_path ] = mod_path
-            nodes = node.children
+            with span('tree', node.url):
+                nodes = node.children
             if name in nodes:
                 node = nodes[name]
             elif not mod_path:
@@ -227,14 +365,15 @@ class Importer:
         else:
             raise ValueError(node)
 
-        if node in self.node_spec_map:
-            self.print(f'Returning cached spec for {fullname} (node={node}, origin={origin})')
-            return self.node_spec_map[node]
+        with self.lock:
+            if node in self.node_spec_map:
+                self.print(f'Returning cached spec for {fullname} (node={node}, origin={origin})')
+                return self.node_spec_map[node]
 
-        self.print(f'Creating package spec {fullname} from {node} (origin={origin})')
-        spec = self.spec(fullname, node, origin=origin, pkg=node.is_dir)
-        self.node_spec_map[node] = spec
-        return spec
+            self.print(f'Creating package spec {fullname} from {node} (origin={origin})')
+            spec = self.spec(fullname, node, origin=origin, pkg=node.is_dir)
+            self.node_spec_map[node] = spec
+            return spec
 
     def spec(self, fullname, node, origin=None, pkg=True):
         spec = ModuleSpec(fullname, self, origin=str(origin), is_package=pkg)
@@ -246,10 +385,154 @@ class Importer:
                 spec.submodule_search_locations = []
         return spec
 
+    def search_path(self, path=None):
+        '''Nodes to look for non-gist/github/gitlab modules in: the `path` passed to `find_spec`, any temporarily
+        prepended `self.path` entries, the current directory, and the root of the enclosing git repo (if any)'''
+        if path:
+            self.print(f'find_spec received path: {path}')
+            path = [ PathNode(p) for p in path ]
+        else:
+            path = []
+
+        if self.path:
+            self.print(f'find_spec adding self.path: {self.path}')
+            path = path + self.path
+
+        cwd = Path.cwd()
+        path += [ PathNode(cwd) ]
+
+        # Walking up the directory tree is comparatively expensive; look it up once per working directory
+        with self.lock:
+            if cwd not in self.repo_dirs:
+                with span('discover', cwd):
+                    self.repo_dirs[cwd] = enclosing_repo(cwd)
+                    if not self.repo_dirs[cwd]:
+                        stderr.write(f'No repo found from {cwd}\n')
+
+            repo_dir = self.repo_dirs[cwd]
+        if repo_dir:
+            path += [ PathNode(repo_dir) ]
+
+        return path
+
+    def servable(self, path=None):
+        '''Set of top-level module names that `node_spec` could resolve from `search_path(path)`
+
+        Cached per working directory, `self.path`, and `path`; local search roots' `listing`s are re-checked at most every
+        `opts.listing_ttl` seconds (and after `invalidate_caches`), so that rejecting unrelated imports doesn't build and
+        `stat` every root each time.
+        '''
+        key = (getcwd(), tuple(self.path), tuple(path) if path else ())
+        now = monotonic()
+        cached = self.servables.get(key)
+        if cached and now - cached[0] < opts.listing_ttl:
+            return cached[1]
+        names = frozenset().union(*( self.listing(node) for node in self.search_path(path) ))
+        with self.lock:
+            self.servables[key] = (now, names)
+        return names
+
+    def listing(self, node):
+        '''Set of top-level module names that `node_spec` could resolve within `node`
+
+        Local directories are re-`stat`ed on each call, and re-listed (flushing `self.misses`) when their mtime changes;
+        git trees are immutable, so their listings are cached indefinitely.
+        '''
+        with self.lock:
+            return self._listing(node)
+
+    def _listing(self, node):
+        if isinstance(node, GitNode):
+            if node not in self.listings:
+                children = node.children or {}
+                self.listings[node] = (None, self.names(children))
+            return self.listings[node][1]
+
+        try:
+            mtime = stat(node.path).st_mtime_ns
+        except OSError:
+            return frozenset()
+
+        cached = self.listings.get(node)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        try:
+            names = self.names(listdir(node.path))
+        except OSError:
+            names = frozenset()
+
+        if cached:
+            self.print(f'{node} changed; invalidating negative find_spec cache')
+            self.misses.clear()
+
+        self.listings[node] = (mtime, names)
+        return names
+
+    @staticmethod
+    def parent_mtimes(fullname, nodes):
+        '''mtimes of the local directories that would contain `fullname` (and its parent packages) under each of `nodes`
+
+        A negative `find_spec` result is only valid while these are unchanged: e.g. creating `pkg/new.py` after a failed
+        `import pkg.new` changes `pkg/`'s mtime, but not the search root's.
+        '''
+        parents = fullname.split('.')[:-1]
+        mtimes = []
+        for node in nodes:
+            if isinstance(node, GitNode): continue
+            path = node.path
+            for name in parents:
+                path = join(path, name)
+                try:
+                    mtimes.append(stat(path).st_mtime_ns)
+                except OSError:
+                    mtimes.append(None)
+                    break
+        return tuple(mtimes)
+
+    @staticmethod
+    def names(children):
+        names = set()
+        for name in children:
+            names.add(name)
+            for ext in ['.py', '.ipynb']:
+                if name.endswith(ext):
+                    names.add(name[:-len(ext)])
+        return frozenset(names)
+
+    def invalidate_caches(self):
+        '''Called by `importlib.invalidate_caches()`'''
+        with self.lock:
+            self.listings = {}
+            self.misses = {}
+            self.repo_dirs = {}
+            self.servables = {}
+
     def find_spec(self, fullname, path=None, target=None, mod_path=None):
-        self.print(f'Importer.find_spec: fullname={fullname} path={path} target={target} mod_path={mod_path}')
         assert not target
 
+        if mod_path is None:
+            # Calls from the import system (as opposed to from `self.exec`), which includes every unrelated import (e.g.
+            # `import numpy`) once this `Importer` is at the front of `sys.meta_path`; reject those as cheaply as possible
+            top = fullname.partition('.')[0]
+            if top not in self.pkgs:
+                if top not in self.servable(path):
+                    return None
+                nodes = self.search_path(path)
+                key = (fullname, tuple(nodes))
+                with self.lock:
+                    if key in self.misses:
+                        if self.misses[key] == self.parent_mtimes(fullname, nodes):
+                            return None
+                        self.print(f'Parent directories of {fullname} changed; dropping negative find_spec cache entry')
+                        del self.misses[key]
+
+        with span('find_spec', fullname):
+            return self.resolve_spec(fullname, path, mod_path)
+
+    def resolve_spec(self, fullname, path=None, mod_path=None):
+        self.print(f'Importer.find_spec: fullname={fullname} path={path} mod_path={mod_path}')
+
         mod_path = mod_path or fullname.split('.')
         top = mod_path[0]
         if top in opts.gist_pkgs:
@@ -263,32 +546,20 @@ class Importer:
         elif top in opts.gitlab_pkgs:
             return self.load_gitlab_spec(fullname, top, mod_path[1:])
         else:
-            if path:
-                self.print(f'find_spec received path: {path}')
-                path = [ PathNode(p) for p in path ]
-            else:
-                path = []
-
-            if self.path:
-                self.print(f'find_spec adding self.path: {self.path}')
-                path = path + self.path
-
-            path += [ PathNode(Path.cwd()) ]
-
-            try:
-                from git import Repo
-                repo = Repo(search_parent_directories=True)
-                path += [ PathNode(repo.working_dir) ]
-            except Exception as e:
-                stderr.write(f'No repo found from {Path.cwd()}\n')
-
+            path = self.search_path(path)
             for node in path:
                 node_spec = self.node_spec(fullname, node, mod_path, throw=False)
                 if node_spec:
                     return node_spec
 
+            with self.lock:
+                self.misses[(fullname, tuple(path))] = self.parent_mtimes(fullname, path)
             self.print(f'Returning without finding spec: fullname={fullname} mod_path={mod_path} path={path}')
 
+    @property
+    def pkgs(self):
+        return set(opts.gist_pkgs + opts.github_pkgs + opts.gitlab_pkgs)
+
     def create_module(self, spec, install=True):
         """Create a built-in module"""
         if spec.name in sys.modules:
@@ -300,7 +571,7 @@ class Importer:
         mod = ModuleType(spec.name)
         mod.__file__ = spec.origin
         mod.__loader__ = self
-        mod.__dict__['get_ipython'] = get_ipython
+        mod.__dict__.update(INJECTED)
         mod.__spec__ = spec
         mod.__exec_count__ = 0
         mod.__package__ = spec.parent
@@ -317,12 +588,13 @@ class Importer:
         self.print(f'exec_module {mod}')
         spec = mod.__spec__
         node = spec._node
-        self.exec(
-            name=spec.name,
-            mod=mod,
-            node=node,
-            root_path=root_path,
-        )
+        with span('module', spec.name):
+            self.exec(
+                name=spec.name,
+                mod=mod,
+                node=node,
+                root_path=root_path,
+            )
 
     @contextmanager
     def tmp_path(self, path):
@@ -361,6 +633,65 @@ class Importer:
         if name.endswith('.py'):
             return basename
 
+    def exec_child(self, mod, mod_basename, child, root_path):
+        '''Find, create, and execute the submodule `mod_basename` of package `mod`, backed by node `child`'''
+        mod_name = mod.__name__
+        fullname = f'{mod_name}.{mod_basename}'
+        mod_path = [mod_basename]
+        file_spec = self.find_spec(fullname, path=root_path, mod_path=mod_path)
+        if not file_spec:
+            raise ValueError(f'Failed to find spec for {mod_basename} ({child})')
+
+        self.print(f'Found spec for child module {mod_basename} ({mod_name})')
+        file_mod = self.create_module(file_spec)
+        mod.__dict__[mod_basename] = file_mod
+        if child.is_dir:
+            path_ctx = self.tmp_path(child)
+        else:
+            path_ctx = nullcontext()
+        with path_ctx:
+            self.exec_module(file_mod, root_path)
+        return file_mod
+
+    @contextmanager
+    def state(self, path, urignores):
+        '''Temporarily restore a previously-captured `self.path` and `self.urignores`'''
+        prev = (self.path, self.urignores)
+        try:
+            self.path, self.urignores = path, urignores
+            yield
+        finally:
+            self.path, self.urignores = prev
+
+    def install_lazy(self, mod, lazy):
+        '''Defer executing `mod`'s submodules until they are first accessed (see `opts.lazy`)
+
+        `lazy` maps submodule basenames to `(node, root_path)` pairs; a module-level `__getattr__` (PEP 562) executes each
+        one on first access, with the `self.path`/`self.urignores` that were in effect when `mod` was executed.
+        '''
+        dct = mod.__dict__
+        self.print(f'{mod}: deferring submodules {list(lazy.keys())}')
+        path, urignores = self.path.copy(), self.urignores.copy()
+
+        def __getattr__(attr):
+            if attr not in lazy:
+                raise AttributeError(f'module {mod.__name__!r} has no attribute {attr!r}')
+            child, root_path = lazy.pop(attr)
+            self.print(f'{mod}: lazily executing submodule {attr}')
+            with self.state(path, urignores):
+                return self.exec_child(mod, attr, child, root_path)
+
+        dct['__getattr__'] = __getattr__
+
+        # Keep `from <pkg> import *` importing submodules, as it does when they are loaded eagerly
+        if '__all__' not in dct:
+            dct['__all__'] = [
+                name
+                for name in list(dct.keys()) + list(lazy.keys())
+                if not name.startswith('_')
+                and not (name in INJECTED and dct[name] is INJECTED[name])
+            ]
+
     def exec(self, name, mod, node, root_path=None):
         self.print(f'exec: name={name} mod={mod} node={node} root_path={root_path}')
         dct = mod.__dict__
@@ -378,7 +709,8 @@ class Importer:
         if node.is_dir:
             if not root_path: root_path = [node]
             mod_name = name
-            children = node.children
+            with span('tree', node.url):
+                children = node.children
 
             if '.urignore' in children:
                 urignore_ctx = self.urignore(children['.urignore'])
@@ -399,6 +731,7 @@ class Importer:
                     }
                     self.print(f'{mod}: restricting children based on __all__: {list(children.keys())}')
 
+                selected = {}
                 for name, child in children.items():
                     urignores = [
                         urignore
@@ -427,21 +760,21 @@ class Importer:
                     ]
                     if mod_basename in skip_basenames: continue
 
-                    fullname = f'{mod_name}.{mod_basename}'
-                    mod_path = [mod_basename]
-                    file_spec = self.find_spec(fullname, path=root_path, mod_path=mod_path)
-                    if file_spec:
-                        self.print(f'Found spec for child module {name} ({mod_name})')
-                        file_mod = self.create_module(file_spec)
-                        dct[mod_basename] = file_mod
-                        if child.is_dir:
-                            path_ctx = self.tmp_path(child)
-                        else:
-                            path_ctx = nullcontext()
-                        with path_ctx:
-                            self.exec_module(file_mod, root_path)
-                    else:
-                        raise ValueError(f'Failed to find spec for {name} ({child})')
+                    selected[mod_basename] = child
+
+                if opts.lazy:
+                    if selected:
+                        self.install_lazy(mod, { k: (child, root_path) for k, child in selected.items() })
+                else:
+                    if opts.pipeline:
+                        self.prefetch(selected.values())
+                    try:
+                        for mod_basename, child in selected.items():
+                            self.exec_child(mod, mod_basename, child, root_path)
+                    finally:
+                        # Drop results for children that weren't executed (e.g. already-loaded modules)
+                        for child in selected.values():
+                            self.prefetched.pop(child, None)
         else:
             self.print(f'Attempt to exec module {name} (root_path={root_path})')
             if root_path:
@@ -451,13 +784,23 @@ class Importer:
             with ctx:
                 if node.name.endswith('.py'):
                     self.print(f'exec .py file: {node}')
-                    code = node.read_text()
                     try:
-                        pyc = compile(code, node.url, 'exec')
-                        exec(pyc, dct)
+                        [ pyc ] = self.load_code(node, str(node.url))
+                        with span('exec', name):
+                            exec(pyc, dct)
                     except Exception as e:
-                        stderr.write(f'Error executing module {name} ({node}):\n{code[:1000]}\n')
+                        stderr.write(f'Error executing module {name} ({node}):\n{node.read_text()[:1000]}\n')
                         raise e
                 elif node.name.endswith('.ipynb'):
                     self.print(f'exec .ipynb file: {node}')
                     self.exec_path(node, mod)
+
+
+_worker = None
+def compile_source(text, filename, notebook, only_defs):
+    '''`ProcessPoolExecutor` entrypoint for `Importer.compile_source`; returns marshalled code objects'''
+    global _worker
+    if _worker is None:
+        _worker = Importer(worker=True)
+    from marshal import dumps
+    return dumps(_worker.compile_source(text, filename, notebook, only_defs))
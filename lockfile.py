@@ -0,0 +1,195 @@
+'''Lockfiles: pin remote imports to commit SHAs / content hashes, then resolve them with no network (or `git`) access
+
+Record a lockfile from a real run by setting `UR_LOCK_RECORD=<path>` (or calling `record(path)`): each Gist, GitHub
+repo, GitLab project, and URL that gets imported is written there, with the commit or content hash it resolved to, when
+the process exits.
+
+Then set `opts.lockfile` (or `UR_LOCK`) to that path: remote imports resolve from the lockfile and the local cache
+(`opts.cache_root`) only. Clones aren't pulled, URLs aren't revalidated, GitLab groups/projects are known from the
+lockfile, and git objects are read with the pure-Python `gitdb` (see `clones.objects`) rather than `git` subprocesses.
+Anything missing raises `LockError` right away: a source that isn't in the lockfile, a clone (or locked commit, or tree
+manifest) that isn't cached, or a cached URL whose content doesn't match its hash.
+
+Format (JSON):
+
+    {
+      "version": 1,
+      "gist": { "<id>": "<commit SHA>" },
+      "github": { "<org>/<repo>": "<commit SHA>" },
+      "gitlab": { "<group>/…/<project>": "<commit SHA>" },
+      "url": { "<url>": "sha256:<hex digest>" }
+    }
+'''
+import atexit
+from hashlib import sha256
+import json
+from os import environ as env
+from pathlib import Path
+from threading import Lock
+
+import opts
+
+
+LOCK_ENV_VAR = 'UR_LOCK'
+RECORD_ENV_VAR = 'UR_LOCK_RECORD'
+
+VERSION = 1
+KINDS = [ 'gist', 'github', 'gitlab', 'url', ]
+
+
+class LockError(ImportError):
+    '''A remote import can't be resolved from the active lockfile and the local cache'''
+
+
+class Lockfile:
+    '''`{ kind: { id: pin } }` for each kind of source in `KINDS`; pins are commit SHAs, or (for URLs) content hashes'''
+    def __init__(self, path=None, pins=None):
+        self.path = Path(path) if path else None
+        pins = pins or {}
+        self.pins = { kind: dict(pins.get(kind, {})) for kind in KINDS }
+        self.lock = Lock()
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        try:
+            data = json.loads(path.read_text())
+        except FileNotFoundError:
+            raise LockError(f'Lockfile {path} not found')
+        version = data.get('version')
+        if version != VERSION:
+            raise LockError(f'Unsupported lockfile version {version} ({path}); expected {VERSION}')
+        return cls(path, data)
+
+    def get(self, kind, id):
+        '''Pinned commit SHA / content hash of source `id`; raise `LockError` if it isn't locked'''
+        pin = self.pins[kind].get(id)
+        if pin is None:
+            raise LockError(f'{kind} {id} is not in lockfile {self.path}')
+        return pin
+
+    def add(self, kind, id, pin):
+        with self.lock:
+            self.pins[kind][id] = pin
+
+    def gitlab_kind(self, path):
+        '''"project" or "group", as implied by the locked GitLab projects' paths (in place of `GitlabPath.resolve`'s API
+        requests)'''
+        projects = self.pins['gitlab']
+        if path in projects: return 'project'
+        if any( project.startswith(f'{path}/') for project in projects ): return 'group'
+        raise LockError(f'GitLab path {path} is not in lockfile {self.path}')
+
+    def to_dict(self):
+        with self.lock:
+            return dict(version=VERSION, **{ kind: dict(sorted(self.pins[kind].items())) for kind in KINDS })
+
+    def save(self, path=None):
+        from pclass.atomic import atomic_write
+        path = Path(path or self.path)
+        atomic_write(path, data=(json.dumps(self.to_dict(), indent=2) + '\n').encode())
+        return path
+
+
+_loaded = None
+
+
+def locked():
+    '''The `Lockfile` at `opts.lockfile` (loaded on first use, and re-loaded if `opts.lockfile` changes), or `None`'''
+    global _loaded
+    path = opts.lockfile
+    if not path: return None
+    if _loaded is None or _loaded[0] != path:
+        _loaded = (path, Lockfile.load(path))
+    return _loaded[1]
+
+
+recording = None
+
+
+def record(path=None, at_exit=True):
+    '''Start recording the commit / content hash that each remote import resolves to; with `at_exit`, `save` them to
+    `path` when the process exits'''
+    global recording
+    recording = Lockfile(path)
+    if at_exit and path:
+        atexit.register(recording.save)
+    return recording
+
+
+def stop():
+    '''Stop recording; return the recorded `Lockfile` (if any), e.g. to `save`'''
+    global recording
+    prev, recording = recording, None
+    return prev
+
+
+def recorded(kind, id, pin):
+    if recording is not None:
+        recording.add(kind, id, pin)
+
+
+def uncached(what):
+    '''Raise `LockError` if a lockfile is active, for things (e.g. `what` = a tree manifest) that must already be cached
+    then'''
+    lock = locked()
+    if lock:
+        raise LockError(f'{what} is not cached (lockfile {lock.path} is active)')
+
+
+def content_hash(path):
+    h = sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return f'sha256:{h.hexdigest()}'
+
+
+def commit(source, kind):
+    '''SHA of the commit to import `source` (a `Gist`, `Github`, or `Gitlab`) at
+
+    With a lockfile active, that's the locked commit, which must already be in `source`'s cached clone; otherwise, it's
+    the `HEAD` of the clone (which is cloned first, if necessary), recorded if `record`ing.
+    '''
+    lock = locked()
+    if lock:
+        sha = lock.get(kind, source.id)
+        path = source._dir / 'clone'
+        if not path.exists():
+            raise LockError(f'{kind} {source.id} is locked at {sha}, but not cloned (in {path})')
+        from clones import objects
+        if not objects(source).has_object(bytes.fromhex(sha)):
+            raise LockError(f'{kind} {source.id}: locked commit {sha} not found in {path}')
+        return sha
+
+    sha = source.clone.commit().hexsha
+    recorded(kind, source.id, sha)
+    return sha
+
+
+def content(url):
+    '''Path to `URL` `url`'s cached content
+
+    With a lockfile active, it must already be cached, and match its locked hash; otherwise, it's downloaded (if
+    necessary), and its hash recorded if `record`ing.
+    '''
+    path = url._dir / 'content'
+    lock = locked()
+    if lock:
+        pin = lock.get('url', url.id)
+        if not path.exists():
+            raise LockError(f'URL {url.id} is locked, but not cached (in {path})')
+        if content_hash(path) != pin:
+            raise LockError(f"URL {url.id}: cached content ({path}) doesn't match locked hash {pin}")
+        return path
+
+    url.content.close()
+    if recording is not None:
+        recorded('url', url.id, content_hash(path))
+    return path
+
+
+if env.get(LOCK_ENV_VAR):
+    opts.lockfile = env[LOCK_ENV_VAR]
+if env.get(RECORD_ENV_VAR):
+    record(env[RECORD_ENV_VAR])
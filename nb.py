@@ -4,6 +4,13 @@ from pathlib import Path
 
 
 def read_nb(node):
+  return reads_nb(node.read_text())
+
+
+def reads_nb(text):
+  # `nbformat.reads` passes extra kwargs through to `json.loads`, which no longer accepts `encoding` (Python ≥3.9)
+  if isinstance(text, bytes):
+    text = text.decode(opts.encoding)
   nb_version = nbformat.current_nbformat
-  nb = nbformat.reads(node.read_text(), nb_version, encoding=opts.encoding)
+  nb = nbformat.reads(text, nb_version)
   return nb
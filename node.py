@@ -1,5 +1,4 @@
 
-import git
 from os.path import basename, dirname, isfile, isdir, exists
 from os import listdir
 
@@ -63,37 +62,83 @@ class PathNode(Node):
     def __str__(self): return f'Node({self.path})'
 
 
+def tree_manifest(repo, rev):
+    '''Flat index of every blob and tree in commit `rev`: `{path: {type, sha, size}}` (the root tree has path `''`)
+
+    Built from a single `git ls-tree` call, rather than walking GitPython `Tree` objects. Blob sizes are omitted (`None`)
+    for partial clones, where looking them up would fetch every blob.
+    '''
+    from clones import is_partial
+    sizes = [] if is_partial(repo) else ['-l']
+    manifest = { '': dict(type='tree', sha=repo.git.rev_parse(f'{rev}^{{tree}}'), size=None) }
+    for line in repo.git.ls_tree('-r', '-t', *sizes, '-z', rev).split('\0'):
+        if not line: continue
+        meta, path = line.split('\t', 1)
+        [ mode, type, sha, *size ] = meta.split()
+        if type not in ['blob', 'tree']: continue  # e.g. submodule "commit" entries
+        manifest[path] = dict(type=type, sha=sha, size=int(size[0]) if size and size[0] != '-' else None)
+    return manifest
+
+
 class GitNode(Node):
-    def __init__(self, obj, url=None):
-        if isinstance(obj, Node): return
-        from git import Blob, Tree
+    '''Node for a blob or tree within a `_github.Commit`/`_gist.Commit`, backed by the commit's (persisted) `manifest`'''
+    nodes = {}
+    indices = {}
+
+    def __new__(cls, commit, tree_path='', *args, **kwargs):
+        if isinstance(commit, Node): return commit
+        key = (commit.www_url, tree_path)
+        node = cls.nodes.get(key)
+        if node is None:
+            # `setdefault` is atomic, so concurrent lookups (e.g. from `prefetch` threads) intern the same node
+            node = cls.nodes.setdefault(key, super(GitNode, cls).__new__(cls))
+        return node
+
+    def __init__(self, commit, tree_path=''):
+        if isinstance(commit, Node) or hasattr(self, 'commit'): return
         import _github, _gist
-        if isinstance(obj, (_github.Commit, _gist.Commit)):
-            tree = obj.commit.tree
-            self.url = obj.www_url
-            obj = tree
-        elif not url:
-            raise ValueError(f'No URL passed')
-        else:
-            self.url = url
-
-        self.obj = obj
-        self.is_file = isinstance(obj, Blob)
-        self.is_dir = isinstance(obj, Tree)
-        self.name = obj.name
+        if not isinstance(commit, (_github.Commit, _gist.Commit)):
+            raise ValueError(f'Unrecognized commit: {commit}')
+
+        self.tree_path = tree_path
+        self.url = f'{commit.www_url}/{tree_path}' if tree_path else commit.www_url
+
+        entry = commit.manifest[tree_path]
+        self.hexsha = entry['sha']
+        self.size = entry['size']
+        self.is_file = entry['type'] == 'blob'
+        self.is_dir = entry['type'] == 'tree'
+        self.name = basename(tree_path)
+        self._children = None
+        # Set last: other threads interning this node skip `__init__` once it's present
+        self.commit = commit
+
+    @classmethod
+    def index(cls, commit):
+        '''Map from each tree path in `commit` to the paths of its immediate children'''
+        key = commit.www_url
+        if key not in cls.indices:
+            index = {}
+            for path in commit.manifest:
+                if not path: continue
+                index.setdefault(dirname(path), []).append(path)
+            cls.indices[key] = index
+        return cls.indices[key]
 
     @property
     def children(self):
         if self.is_file: return None
-        blobs = self.obj.blobs
-        trees = self.obj.trees
-        return {
-            obj.name: GitNode(obj, f'{self.url}/{obj.name}')
-            for obj in (blobs + trees)
-        }
+        if self._children is None:
+            self._children = {
+                basename(path): GitNode(self.commit, path)
+                for path in self.index(self.commit).get(self.tree_path, [])
+            }
+        return self._children
 
     def read(self):
         assert self.is_file
-        return self.obj.data_stream.read()
+        # Per-thread object databases; see `clones.objects`
+        from clones import objects
+        return objects(self.commit.source).stream(bytes.fromhex(self.hexsha)).read()
 
     def __str__(self): return f'Node({self.url})'
@@ -2,10 +2,24 @@
 # Kept as its own module to avoid dependency cycles, as these are referenced by the `ur` module as well as modules it depends on (e.g. `gist`)
 skip_cache = False
 cache_root = None  # defaults to ``.objs/`` in the current directory
+cache_max_bytes = None  # overall ``cache_root`` budgets, enforced (by evicting least-recently-used entries) by `ur.gc()`
+cache_max_entries = None
+revalidate = False  # re-check cached URLs with conditional GETs (keeping the cached body on "304 Not Modified")
+url_ttl = None  # seconds after which cached URLs are re-checked (in the background); `None`: never
+clone_ttl = None  # seconds after which cached Gist / GitHub / GitLab clones are pulled (in the background); `None`: never
+lockfile = None  # path to a lockfile pinning remote imports, which then resolve offline, from the local cache; see `lockfile`
 only_defs = True
 run_nbinit = True
+lazy = False  # defer executing a package's submodules until they are first accessed
+pipeline = None  # "thread" or "process": read+compile a package's submodules in a worker pool, ahead of executing them
+pipeline_workers = None  # `pipeline` pool size; defaults to the number of CPUs
+listing_ttl = 1  # seconds between re-checks of local search roots for new top-level modules (sooner after `importlib.invalidate_caches()`)
+bytecode_cache = True  # cache compiled notebook cells (keyed by content) and git-tree `.py` files (keyed by blob SHA) under ``cache_root``
+clone_strategy = 'full'  # or 'shallow', 'blobless', 'no-checkout', 'bare', or a comma-delimited combination; see `clones.STRATEGIES`
 encoding = 'utf-8'
 verbose = False
 gist_pkgs = ['gist','gists']  # top-level packages to parse as importing from GitHub Gists
 github_pkgs = ['github','gh']
 gitlab_pkgs = ['gitlab','gl']
+gitlab_api_url = 'https://gitlab.com/api/v4'
+gitlab_ttl = 24 * 60 * 60  # seconds to cache GitLab group/project resolutions for
@@ -0,0 +1,60 @@
+from contextlib import contextmanager
+from os import getpid, replace
+from pathlib import Path
+from shutil import copyfileobj, rmtree
+from tempfile import NamedTemporaryFile
+from threading import get_ident
+
+
+CHUNK_SIZE = 1 << 16
+
+
+def atomic_write(path, src=None, data=None, size=None):
+    '''Write `data` (or stream the file-like `src`) to a temporary file next to `path`, then rename it into place, so
+    that readers never observe a partial file
+
+    If `size` is passed, the write is aborted (leaving any existing file at `path` untouched) unless exactly that many
+    bytes were written.
+    '''
+    with NamedTemporaryFile(dir=path.parent, prefix=f'.{path.name}.', delete=False) as f:
+        tmp = f.name
+        try:
+            if src is not None:
+                copyfileobj(src, f, CHUNK_SIZE)
+            else:
+                f.write(data)
+            written = f.tell()
+            if size is not None and written != size:
+                raise IOError(f'Truncated write to {path}: expected {size} bytes, got {written}')
+        except BaseException:
+            f.close()
+            Path(tmp).unlink()
+            raise
+    replace(tmp, path)
+    return written
+
+
+def remove(path):
+    '''Remove a file or directory tree, if it exists'''
+    if path.is_dir() and not path.is_symlink():
+        rmtree(path)
+    elif path.exists() or path.is_symlink():
+        path.unlink()
+
+
+@contextmanager
+def atomic_path(path):
+    '''Yield a temporary path next to `path`; on success, rename whatever was written there (a file or directory) into
+    place at `path`, and on failure, remove it
+
+    `path` itself must not be a non-empty directory.
+    '''
+    tmp = path.with_name(f'.{path.name}.{getpid()}.{get_ident()}.tmp')
+    remove(tmp)
+    try:
+        yield tmp
+    except BaseException:
+        remove(tmp)
+        raise
+    if tmp.exists() or tmp.is_symlink():
+        replace(tmp, path)
@@ -0,0 +1,169 @@
+from concurrent.futures import as_completed
+from sys import stderr
+from time import perf_counter
+
+from .field import DirectField
+
+
+def fields_of(cls):
+    '''`Field`s and `DirectField`s of a `Meta` class (including inherited ones), by name'''
+    members = {}
+    for base in reversed(cls.__mro__):
+        members.update(base.__dict__.get('_fields', {}))
+    return members
+
+
+def cached_ids(cls, ids, name, field):
+    '''Subset of `ids` whose field `name` is already persisted'''
+    if isinstance(field, DirectField):
+        # `@directfield`s always live in per-instance dirs
+        class_dir = cls._storage.class_dir
+        return { id for id in ids if (class_dir / str(id) / name).exists() }
+    return cls._storage.has_many(ids, name)
+
+
+def compute(cls, id, names, skip_cache=False):
+    '''Construct instance `id` of `cls` and access each of `names` on it (which persists them)
+
+    Runs in pool workers; returns a `dict(id, field, seconds, error)` per field.
+    '''
+    kwargs = { cls._skip_cache_key: True } if skip_cache else {}
+    try:
+        obj = cls(id, **kwargs)
+    except Exception as e:
+        return [ dict(id=id, field=name, seconds=0., error=e) for name in names ]
+
+    results = []
+    for name in names:
+        start = perf_counter()
+        try:
+            getattr(obj, name)
+            error = None
+        except Exception as e:
+            error = e
+        results.append(dict(id=id, field=name, seconds=perf_counter() - start, error=error))
+    return results
+
+
+def print_progress(clsname, total):
+    step = max(1, total // 20)
+    def report(done, total):
+        if done % step == 0 or done == total:
+            stderr.write(f'{clsname}: {done}/{total} ids\n')
+    return report
+
+
+def materialize(
+    cls,
+    ids,
+    fields=None,
+    executor='process',
+    workers=None,
+    skip_cache=False,
+    progress=True,
+    throw=True,
+):
+    '''Compute and persist `fields` for many instances of a `Meta` class, in parallel
+
+    Fields that are already cached are skipped (existence checks are batched, where the class' `Storage` allows). Each
+    remaining id is constructed (as `cls(id)`) in a worker, which accesses its missing fields; workers persist values
+    themselves, so only timings are sent back.
+
+    :param cls: `Meta` class, whose constructor takes just an id
+    :param ids: ids of instances to materialize
+    :param fields: name(s) of `@field`s / `@directfield`s to materialize (default: all of them)
+    :param executor: "process" (for CPU-bound fields; `cls` must be importable by workers), "thread", or `None` (compute
+           serially, in this thread)
+    :param workers: maximum pool size
+    :param skip_cache: recompute (and overwrite) fields that are already cached
+    :param progress: print progress and per-field timings to stderr; or a callable to pass `(done, total)` id-counts to
+    :param throw: after all ids complete, re-raise the first error encountered (if any)
+    :return: `dict(ids, cached, computed, fields, errors, seconds)`: counts of ids requested, field values already
+             cached, and field values computed; per-field `dict(count, seconds, max)` compute timings; and a list of
+             `dict(id, field, seconds, error)` for failed computations
+    '''
+    start = perf_counter()
+    ids = list(ids)
+    members = fields_of(cls)
+    if fields is None:
+        names = list(members)
+    elif isinstance(fields, str):
+        names = [fields]
+    else:
+        names = list(fields)
+
+    unknown = [ name for name in names if name not in members ]
+    if unknown:
+        raise ValueError(f'{cls.__name__}: unrecognized fields {unknown}; expected one of {list(members)}')
+
+    # Missing fields for each id
+    todo = {}
+    cached = 0
+    for name in names:
+        have = set() if skip_cache else cached_ids(cls, ids, name, members[name])
+        cached += len(have)
+        for id in ids:
+            if id not in have:
+                todo.setdefault(id, []).append(name)
+
+    report = progress is True
+    if report:
+        progress = print_progress(cls.__name__, len(todo))
+
+    results = []
+    if executor is None:
+        for done, (id, missing) in enumerate(todo.items(), 1):
+            results += compute(cls, id, missing, skip_cache)
+            if progress: progress(done, len(todo))
+    else:
+        if executor == 'process':
+            from concurrent.futures import ProcessPoolExecutor as Executor
+        elif executor == 'thread':
+            from concurrent.futures import ThreadPoolExecutor as Executor
+        else:
+            raise ValueError(f'Unrecognized executor {executor}; expected "process", "thread", or None')
+
+        with Executor(max_workers=workers) as pool:
+            futures = [ pool.submit(compute, cls, id, missing, skip_cache) for id, missing in todo.items() ]
+            for done, future in enumerate(as_completed(futures), 1):
+                results += future.result()
+                if progress: progress(done, len(todo))
+
+    timings = { name: dict(count=0, seconds=0., max=0.) for name in names }
+    errors = []
+    for result in results:
+        if result['error']:
+            errors.append(result)
+            continue
+        timing = timings[result['field']]
+        timing['count'] += 1
+        timing['seconds'] += result['seconds']
+        timing['max'] = max(timing['max'], result['seconds'])
+
+    elapsed = perf_counter() - start
+    if report:
+        for name, timing in timings.items():
+            count, seconds = timing['count'], timing['seconds']
+            if count:
+                stderr.write(
+                    f'{cls.__name__}.{name}: computed {count} in {seconds:.2f}s '
+                    f'(mean {seconds / count:.3f}s, max {timing["max"]:.3f}s)\n'
+                )
+        for error in errors:
+            stderr.write(f'{cls.__name__}({error["id"]}).{error["field"]}: ERROR: {error["error"]!r}\n')
+        stderr.write(
+            f'{cls.__name__}: materialized {len(names)} fields for {len(ids)} ids in {elapsed:.2f}s '
+            f'({cached} cached, {len(results) - len(errors)} computed, {len(errors)} errors)\n'
+        )
+
+    if throw and errors:
+        raise errors[0]['error']
+
+    return dict(
+        ids=len(ids),
+        cached=cached,
+        computed=len(results) - len(errors),
+        fields=timings,
+        errors=errors,
+        seconds=elapsed,
+    )
@@ -1,16 +1,170 @@
-from functools import partial, wraps
+from collections import OrderedDict
+from functools import wraps
 from inspect import signature, _ParameterKind as Kind
+from os import utime
+from os.path import abspath
 from pathlib import Path
+from threading import Lock
+from time import perf_counter, time
 
+from .atomic import atomic_path
+from .eviction import pin
 from .field import DirectField, Field
 from .loader import Loader
+from .refresh import submit
+from . import stats as field_stats
+from .stats import FieldStats, register
+from .storage import DirStorage
 import opts
 
+class Instances:
+    '''Identity map of a `Meta` class' instances, keyed on their `cache_key` (and any other constructor arguments)
+
+    Constructing an instance with already-seen arguments returns the existing object (and any fields it has already
+    materialized). Passing `skip_cache_key` bypasses the map: a fresh instance is constructed (and recomputes its
+    fields), and any mapped one is dropped, so that later lookups construct a new instance that loads the fresh values
+    (rather than inheriting the skip-cache flag, or returning stale values). Constructions with unhashable arguments
+    also bypass the map. If `size` is set, the least-recently-constructed/returned instances beyond that many are
+    dropped.
+    '''
+    def __init__(self, size, cache_key, skip_cache_key):
+        self.size = size
+        self.cache_key = cache_key
+        self.skip_cache_key = skip_cache_key
+        self.instances = OrderedDict()
+        self.lock = Lock()
+
+    def key(self, args, kwargs):
+        '''Map key for a constructor call (`None` if it has no id)'''
+        kwargs = { k: v for k, v in kwargs.items() if k != self.skip_cache_key }
+        if self.cache_key in kwargs:
+            id = kwargs.pop(self.cache_key)
+        elif args:
+            [ id, *args ] = args
+        else:
+            return None
+        return (id, tuple(args), tuple(sorted(kwargs.items())))
+
+    def __call__(self, create, args, kwargs):
+        key = self.key(args, kwargs)
+        if key is None:
+            # Let the constructor raise
+            return create()
+        try:
+            hash(key)
+        except TypeError:
+            return create()
+
+        if kwargs.get(self.skip_cache_key, False):
+            with self.lock:
+                self.instances.pop(key, None)
+            return create()
+
+        with self.lock:
+            if key in self.instances:
+                self.instances.move_to_end(key)
+                return self.instances[key]
+
+        obj = create()
+        with self.lock:
+            if key in self.instances:
+                # Another thread constructed the same instance concurrently; keep the first
+                self.instances.move_to_end(key)
+                return self.instances[key]
+            self.instances[key] = obj
+            if self.size is not None:
+                while len(self.instances) > self.size:
+                    self.instances.popitem(last=False)
+        return obj
+
+    def __len__(self): return len(self.instances)
+
+    def clear(self):
+        with self.lock:
+            self.instances.clear()
+
+
+def bind(fn, name, cache_key):
+    '''Adapt a user-provided `load`/`save`/`download`/`parse` function to a `(self, path, **kwargs)` signature
+
+    The function is passed (by keyword) whichever of `self`, `path`, `name`, and the class' `cache_key` it accepts
+    (functions taking `**kwargs` also get `path` and `cache_key`); its signature is only inspected once, here.
+    '''
+    if fn is None: return None
+    params = signature(fn).parameters
+    has_kwargs = Kind.VAR_KEYWORD in [ param.kind for param in params.values() ]
+    pass_name = 'name' in params
+    pass_id = cache_key in params or has_kwargs
+    pass_path = 'path' in params or has_kwargs
+    pass_self = 'self' in params
+
+    def bound(self, path, **kw):
+        if pass_name: kw['name'] = name
+        if pass_id: kw[cache_key] = getattr(self, cache_key)
+        if pass_path: kw['path'] = path
+        if pass_self: kw['self'] = self
+        return fn(**kw)
+
+    return bound
+
+
+class CachedField:
+    '''Accessor for a `@field`/`@directfield` of a `Meta` class, built (with its functions `bind`ed) at class creation
+
+    A non-data descriptor: the first access from an instance loads or computes the value (`miss`), and stores it in the
+    instance's `__dict__` under the field's name (as well as at `_<name>`), where later lookups find it without reaching
+    the descriptor; memory hits cost the same as any other instance attribute.
+    '''
+    def __init__(self, name, field, stat, miss, refresh, hit, loader=None, download=None, parse=None):
+        self.name = name
+        # Slots in which the materialized value (for `__str__`, and `TrackedField`s) and its write time are stored
+        self.slot = f'_{name}'
+        self.mtime_slot = f'_{name}_mtime'
+        self.field = field
+        self.stat = stat
+        self.miss = miss
+        self.refresh = refresh
+        self.hit = hit
+        self.loader = loader
+        self.download = download
+        self.parse = parse
+        self.__doc__ = getattr(field.compute if isinstance(field, Field) else field.download, '__doc__', None)
+
+    def __get__(self, obj, cls=None):
+        if obj is None: return self
+        return self.miss(obj, self)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.name})'
+
+
+class TrackedField(CachedField):
+    '''Data-descriptor variant of `CachedField`, for fields whose memory hits run code: `ttl` checks, and counting (see
+    `pclass.stats.track`)'''
+
+    def __get__(self, obj, cls=None):
+        if obj is None: return self
+        d = obj.__dict__
+        slot = self.slot
+        if slot not in d:
+            return self.miss(obj, self)
+        self.stat.memory_hits += 1
+        if self.field.ttl is not None:
+            return self.hit(obj, self)
+        return d[slot]
+
+    def __set__(self, obj, val):
+        raise AttributeError(f"can't set attribute {self.name}")
+
+
 class Meta(type):
     '''Metaclass for classes that lazily evaluate and cache `@field`s in a directory on disk'''
 
     DEFAULT_CACHE_DIR = '.objs'
 
+    # Absolute class dir -> class, for `pclass.eviction.collect`
+    classes = {}
+
     def __new__(
         mcs, clsname, bases, dct,
         cache_root=None,
@@ -20,6 +174,10 @@ class Meta(type):
         skip_cache_key='_skip_cache',
         debug=None,
         loader=None,
+        storage=None,
+        instances=None,
+        max_bytes=None,
+        max_entries=None,
     ):
         '''Metaclass providing laziness and persistent caching for fields
 
@@ -34,6 +192,13 @@ class Meta(type):
         :param cache_dir_key: name of a field where the path to the object's cached fields on disk is stored
         :param debug: pass e.g. `print` here to enable debug-printing
         :param loader: default `Loader` to use for customizing serialization logic for `@field`s in this class
+        :param storage: `Storage` backend (or other factory taking the class' cache directory) in which to persist
+               `@field`s; defaults to `DirStorage` (one file per field, at `<cache_root>/<cache_type_name>/<id>/<name>`)
+        :param instances: reuse instances across constructions with the same id (see `Instances`): `True` for an
+               unbounded identity map, or an `int` to keep (at most) that many, least-recently-used first out
+        :param max_bytes: budget for the total size of this class' cache entries, enforced (by evicting
+               least-recently-used instances' entries) by `pclass.eviction.collect`
+        :param max_entries: budget for the number of instances with cache entries; see `max_bytes`
 
         Example:
         '''
@@ -49,6 +214,10 @@ class Meta(type):
         log(f'Meta.__new__({mcs}, {clsname}, {bases}, {dct})')
         methods = dct.copy()
         fields = []
+        # name -> `Field`/`DirectField`, for class-level operations (e.g. `materialize`)
+        members = {}
+        # name -> `FieldStats`
+        stats = {}
 
         ### Cache initialization ###
 
@@ -66,8 +235,31 @@ class Meta(type):
         class_dir.mkdir(parents=True, exist_ok=True)
         log(f'Class cache dir: {class_dir}')
 
+        store = (storage or DirStorage)(class_dir)
+        methods['_storage'] = store
+        log(f'Storage: {store}')
+
+        # Set even when disabled, so that subclasses don't share their parent's instances
+        methods['_instances'] = Instances(
+            None if instances is True else instances,
+            cache_key,
+            skip_cache_key,
+        ) if instances else None
+
+        methods['_budget'] = dict(bytes=max_bytes, entries=max_entries)
+        accessed_key = '_accessed'
+
+        def accessed(self):
+            '''Record (once per instance) that `self`'s cache entry is in use: bump its access time (for LRU eviction),
+            and pin it (against eviction) while `self` is alive'''
+            if accessed_key in self.__dict__: return
+            self.__dict__[accessed_key] = True
+            id = getattr(self, cache_key)
+            store.touch(id)
+            pin(class_dir, id, self, shared=shared_pins)
+
         ### Persisted/Cached/Lazy Field Handling ###
-        # Look for methods annotated with `@field`, and munge them to:
+        # Look for methods annotated with `@field`, and replace them with accessors (see `CachedField`) that:
         # - if present: load values (lazily, when accessed)) from the on-disk cache
         # - otherwise:
         #   - compute them (lazily, at access-time)
@@ -84,197 +276,264 @@ class Meta(type):
         # - a __str__ and __repr__ that display the "primary key" ("id") field as well as any cached fields that have
         #   been computed/accessed
 
+        ### Expiry (`ttl`) Handling ###
+
+        def expired(field, mtime):
+            '''Whether a value of `field` written at `mtime` is past its `ttl`'''
+            if mtime is None: return False
+            expires = field.expiry(mtime)
+            return expires is not None and time() >= expires
+
+        def materialized(self, acc, val, mtime):
+            '''Set a loaded/computed value on `self` (along with when it was written, for fields with a `ttl`)'''
+            d = self.__dict__
+            d[acc.slot] = val
+            # Later lookups find the value here, without reaching a (non-data) `CachedField`; `TrackedField`s, which take
+            # precedence over it, can then be swapped for `CachedField`s (see `Meta.track`) without losing it
+            d[acc.name] = val
+            if acc.field.ttl is not None:
+                d[acc.mtime_slot] = mtime
+            accessed(self)
+
+        def hit(self, acc):
+            '''Memory hit on a field with a `ttl`: revalidate the value if it's expired'''
+            if expired(acc.field, self.__dict__.get(acc.mtime_slot)):
+                return revalidate(self, acc)
+            return self.__dict__[acc.slot]
+
+        def revalidate(self, acc):
+            '''Handle a stale value of `acc.field` on `self`: block on refreshing it (for `strict` fields), or return it
+            and refresh it in a background thread (at most one at a time per instance and field)
+
+            `acc.refresh` recomputes the value if it's still stale (once any other thread/process refreshing it is
+            done), and returns `(val, mtime)`.
+            '''
+            if acc.field.strict:
+                val, mtime = acc.refresh(self, acc)
+                materialized(self, acc, val, mtime)
+                return val
+
+            acc.stat.stale_hits += 1
+            refreshing = f'{acc.slot}_refreshing'
+            if refreshing not in self.__dict__:
+                self.__dict__[refreshing] = True
+                def run():
+                    try:
+                        val, mtime = acc.refresh(self, acc)
+                        materialized(self, acc, val, mtime)
+                    finally:
+                        self.__dict__.pop(refreshing, None)
+                if debug: log(f'Refreshing {acc.name} in the background')
+                submit(run, f'{clsname}({getattr(self, cache_key)}).{acc.name}')
+            return self.__dict__[acc.slot]
+
+        ### `Field` Persistence ###
+
+        def load(self, acc):
+            '''Load field `acc.name`'s persisted value for `self`; return `(val, mtime)`, or `None` if not stored'''
+            start = perf_counter()
+            name = acc.name
+            if store.files:
+                path = getattr(self, cache_dir_key) / name
+                try:
+                    mtime = path.stat().st_mtime
+                except FileNotFoundError:
+                    return None
+                val = acc.loader.load(self, path)
+                size = path.stat().st_size if path.is_file() else 0
+            else:
+                # Storage backend holds (de)serialized bytes
+                id = getattr(self, cache_key)
+                data = store.get(id, name)
+                if data is None: return None
+                # Only fields with a `ttl` need write times
+                mtime = store.mtime(id, name) if acc.field.ttl is not None else None
+                val = acc.loader.loads(data)
+                size = len(data)
+            if debug: log(f'Loaded attr from {store}: {name}={val}')
+            acc.stat.loaded(perf_counter() - start, size)
+            return val, mtime
+
+        def compute(self, acc, force=False):
+            '''Compute and persist field `acc.name` for `self`; return `(val, mtime)`
+
+            Single-flight: one thread/process computes, others wait for it and then load (unless `force`d; stale values
+            are also recomputed).
+            '''
+            start = perf_counter()
+            name, field, loader, stat = acc.name, acc.field, acc.loader, acc.stat
+            id = getattr(self, cache_key)
+            with store.lock(id, name):
+                entry = None if force else load(self, acc)
+                if entry is not None:
+                    if not expired(field, entry[1]):
+                        return entry
+                    stat.refreshes += 1
+
+                if debug: log(f'Computing: {name}')
+                val = field.compute(self)
+                if debug: log(f'Computed: {name}={val}; saving to {store}')
+                size = 0
+                if store.files:
+                    path = getattr(self, cache_dir_key) / name
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    if loader.save:
+                        # Write to a temporary file, and rename it into place; readers never see partial values
+                        with atomic_path(path) as tmp:
+                            loader.save(self, tmp, val=val)
+                            if tmp.is_file(): size = tmp.stat().st_size
+                else:
+                    dumped = loader.dumps(val)
+                    store.put(id, name, dumped)
+                    size = len(dumped)
+                stat.computed(perf_counter() - start, size)
+                return val, time()
+
+        def field_miss(self, acc):
+            '''Load (or compute and persist) a `@field`'s value, on its first access from `self`'''
+            field = acc.field
+            skip_cache = getattr(self, skip_cache_key, False)
+            entry = None if skip_cache else load(self, acc)
+            if entry is None or (field.strict and expired(field, entry[1])):
+                entry = compute(self, acc, force=skip_cache)
+            elif expired(field, entry[1]):
+                # Stale-while-revalidate
+                materialized(self, acc, *entry)
+                return revalidate(self, acc)
+
+            val, mtime = entry
+            materialized(self, acc, val, mtime)
+            return val
+
+        ### `DirectField` Persistence ###
+
+        def download(self, acc, force=False):
+            '''Download `DirectField` `acc.name` for `self` (e.g. `git clone`), or refresh an existing download in place
+            (e.g. `git pull`, or a conditional GET) if it's stale (or `force`d); return whether anything was downloaded
+
+            Single-flight: one thread/process downloads, others wait for it.
+            '''
+            start = perf_counter()
+            name, stat = acc.name, acc.stat
+            path = getattr(self, cache_dir_key) / name
+            with store.lock(getattr(self, cache_key), name):
+                if not path.exists():
+                    if debug: log(f'Downloading: {name}')
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    # Download to a temporary path, and rename it into place once complete
+                    with atomic_path(path) as tmp:
+                        acc.download(self, tmp)
+                    if debug: log(f'Downloaded to {path}')
+                elif force or expired(acc.field, path.stat().st_mtime):
+                    if debug: log(f'Re-downloading: {name}')
+                    if not force: stat.refreshes += 1
+                    acc.download(self, path)
+                else:
+                    # Another thread/process downloaded it while we waited for the lock
+                    return False
+                # Mark the download's completion time (for `ttl`s; a directory's own mtime doesn't reflect nested
+                # changes)
+                utime(path)
+                stat.computed(perf_counter() - start, path.stat().st_size if path.is_file() else 0)
+                return True
+
+        def parse(self, acc, start=None):
+            '''Parse `DirectField` `acc.name`'s download for `self`; return `(val, mtime)`
+
+            Records a disk hit (timed from `start`) if `start` is passed.
+            '''
+            path = getattr(self, cache_dir_key) / acc.name
+            val = acc.parse(self, path)
+            if debug: log(f'Loaded attr from cache: {acc.name}={val}')
+            if start is not None:
+                acc.stat.loaded(perf_counter() - start, path.stat().st_size if path.is_file() else 0)
+            return val, path.stat().st_mtime
+
+        def fetch(self, acc, force=False):
+            '''`download` field `acc.name` for `self` (if necessary), and `parse` it; return `(val, mtime)`'''
+            start = perf_counter()
+            downloaded = download(self, acc, force)
+            return parse(self, acc, None if downloaded else start)
+
+        def directfield_miss(self, acc):
+            '''Parse a `@directfield`'s download (downloading it first, if necessary), on first access from `self`'''
+            field = acc.field
+            start = perf_counter()
+            path = getattr(self, cache_dir_key) / acc.name
+            skip_cache = getattr(self, skip_cache_key, False)
+            try:
+                mtime = path.stat().st_mtime
+            except FileNotFoundError:
+                mtime = None
+            if mtime is None or skip_cache or (field.strict and expired(field, mtime)):
+                val, mtime = fetch(self, acc, force=skip_cache)
+            else:
+                val, mtime = parse(self, acc, start)
+                if expired(field, mtime):
+                    # Stale-while-revalidate
+                    materialized(self, acc, val, mtime)
+                    return revalidate(self, acc)
+
+            materialized(self, acc, val, mtime)
+            return val
+
         for name, member in dct.items():
             log(f'Checking: {name}: {member}')
 
-            def _bind(fn, name, **_kw):
-                kw = _kw.copy()
-                params = signature(fn).parameters
-                log(f'{name} params: {params} for fn {fn}')
-                if 'name' in params:
-                    log(f'{name} adding name {name} to {fn}')
-                    kw['name'] = name
-
-                has_kwargs = Kind.VAR_KEYWORD in [ param.kind for param in params.values() ]
-
-                def wrapped(self, path, name, **_kw):
-                    if cache_key in params or has_kwargs:
-                        log(f'{name} adding {cache_key} to {fn}')
-                        kw[cache_key] = getattr(self, cache_key)
-                    if 'path' in params or has_kwargs:
-                        log(f'{name} adding path {path} to {fn}')
-                        kw['path'] = path
-                    if 'self' in params:
-                        log(f'{name} adding self {self} to {fn}')
-                        kw['self'] = self
-
-                    log(f'{name}: calling {fn} with {kw}')
-                    return fn(**_kw, **kw)
-
-                return partial(wrapped, name=name)
-
-            bind = partial(_bind, name=name)
-            log(f'{name}: bind {bind} {signature(bind).parameters}')
-
-            if isinstance(member, Field):
-                field = member
-                log(f'field: {name} -> {field}')
-                fields.append(name)
-                _name = f'_{name}'
+            if not isinstance(member, (Field, DirectField)):
+                log(f'Skipping: {name}')
+                continue
+
+            field = member
+            log(f'field: {name} -> {field}')
+            fields.append(name)
+            members[name] = field
+            stats[name] = stat = FieldStats()
+
+            # Memory hits on fields with a `ttl` (or whose memory hits are counted; see `Meta.track`) have to run code;
+            # others are plain instance-attribute lookups
+            Accessor = TrackedField if field.ttl is not None or field_stats.track_memory_hits else CachedField
 
+            if isinstance(field, Field):
                 # If the class provides a default loader, use its load/save methods on fields that didn't explicitly set
                 # their own
                 _loader = field.loader
-                _loader = Loader(_loader.load, _loader.save)
-                if loader and field.default_load: _loader.load = loader.load
-                if loader and field.default_save: _loader.save = loader.save
-
-                def wrapped_fn(self, name, _name, field, loader):
-                    '''Synthetic "getter" for a `Field` member of a class.
-
-                    Replaces the user-provided getter (`field.compute`), wrapping it in caching/persistence logic.
-
-                    :param self: class instance containing fields to cache
-                    :param name: name of the `Field` being instrumented
-                    :param _name: slot in which to store the computed value of this field (when present; typically just
-                                  the field's `name` with an underscore prefixed)
-                    :param field: `Field` instance being instrumented
-                    :param loader: Serializer between in-memory and disk-cache reprs
-                    :return: the value of this `Field` on the `self` class instance (whether loaded from cache or
-                             computed + saved to cache)
-                    '''
-                    log(f'wrapped_fn: {name} ({_name}): field {field} loader {loader}')
-                    if not hasattr(self, _name):
-                        # This field's value hasn't been loaded or computed on this instance yet
-
-                        # Path to cache this instance's fields to
-                        cache_dir = getattr(self, cache_dir_key)
-
-                        # Path to cache this specific field to (within the instance's dir)
-                        path = cache_dir / name
-
-                        # Misc kwargs passed to the serialization layer, to enable various customizations
-                        # kw = {}
-                        # kw[cache_key] = getattr(self, cache_key)
-                        # kw['name'] = name
-
-                        if path.exists() and not getattr(self, skip_cache_key, False):
-                            # Load from cache
-                            load = bind(loader.load)
-                            val = load(self, path)
-                            #val = loader.load(path, **kw)
-                            log(f'Loaded attr from cache: {_name}={val}')
-                        else:
-                            log(f'Computing: {name}')
-
-                            # Compute the field's value
-                            val = field.compute(self)
-                            log(f'Computed: {name}={val}')
-
-                            cache_dir.mkdir(parents=True, exist_ok=True)
-
-                            log(f'Saving {name} to {path}')
-                            save = loader.save
-                            if save:
-                                save = bind(save)
-                                save(self, path, val=val)
-                            # if save: loader.save(path, val, **kw)
-
-                        # set loaded/computed value on `self` instance
-                        setattr(self, _name, val)
-                    else:
-                        log(f'Lookup: {name}={getattr(self, _name)}')
-
-                    return getattr(self, _name)
-
-                # Partially apply all relevant fields (ensures closures are bound properly)
-                applied = partial(wrapped_fn, name=name, _name=_name, field=field, loader=_loader)
-
-                # A `@property` is ultimately returned, for parend-less call-site syntactic-sugar
-                prop = property(applied)
-
-                # Store the modified field getter on the class' definition
-                log(f'Setting method: {name}: {prop}')
-                methods[name] = prop
-            elif isinstance(member, DirectField):
-                field = member
-                log(f'field: {name} -> {field}')
-                fields.append(name)
-                _name = f'_{name}'
+                _loader = Loader(_loader.load, _loader.save, _loader.loads, _loader.dumps)
+                if loader and field.default_load: _loader.load, _loader.loads = loader.load, loader.loads
+                if loader and field.default_save: _loader.save, _loader.dumps = loader.save, loader.dumps
 
-                # If the class provides a default loader, use its load/save methods on fields that didn't explicitly set
-                # their own
-                # _loader = field.loader
-                # _loader = Loader(_loader.load, _loader.save)
-                # if loader and field.default_load: _loader.load = loader.load
-                # if loader and field.default_save: _loader.save = loader.save
-
-                def wrapped_fn(self, name, _name, field):
-                    '''Synthetic "getter" for a `Field` member of a class.
-
-                    Replaces the user-provided getter (`field.compute`), wrapping it in caching/persistence logic.
-
-                    :param self: class instance containing fields to cache
-                    :param name: name of the `Field` being instrumented
-                    :param _name: slot in which to store the computed value of this field (when present; typically just
-                                  the field's `name` with an underscore prefixed)
-                    :param field: `Field` instance being instrumented
-                    :return: the value of this `Field` on the `self` class instance (whether loaded from cache or
-                             computed + saved to cache)
-                    '''
-                    log(f'wrapped_fn: {name} ({_name}): field {field}')
-                    if not hasattr(self, _name):
-                        # This field's value hasn't been loaded or computed on this instance yet
-
-                        # Path to cache this instance's fields to
-                        cache_dir = getattr(self, cache_dir_key)
-
-                        # Path to cache this specific field to (within the instance's dir)
-                        path = cache_dir / name
-
-                        # Misc kwargs passed to the serialization layer, to enable various customizations
-                        # kw = {}
-                        # kw[cache_key] = getattr(self, cache_key)
-                        # kw['name'] = name
-
-                        if not path.exists() or getattr(self, skip_cache_key, False):
-                            log(f'Downloading: {name}')
-
-                            cache_dir.mkdir(parents=True, exist_ok=True)
-
-                            # Compute the field's value
-                            download = bind(field.download)
-                            download(self, path)
-                            # field.download(self, path, **kw)
-                            log(f'Downloaded to {path}')
-
-                        # Load from cache
-                        parse = bind(field.parse)
-                        val = parse(self, path)
-                        # val = field.parse(path, **kw)
-                        log(f'Loaded attr from cache: {_name}={val}')
-
-                        # set loaded/computed value on `self` instance
-                        setattr(self, _name, val)
-                    else:
-                        log(f'Lookup: {name}={getattr(self, _name)}')
-
-                    return getattr(self, _name)
-
-                # Partially apply all relevant fields (ensures closures are bound properly)
-                applied = partial(wrapped_fn, name=name, _name=_name, field=field)
-
-                # A `@property` is ultimately returned, for parend-less call-site syntactic-sugar
-                prop = property(applied)
-
-                # Store the modified field getter on the class' definition
-                log(f'Setting method: {name}: {prop}')
-                methods[name] = prop
+                if not store.files and not (_loader.loads and _loader.dumps):
+                    raise TypeError(f'{clsname}.{name}: {type(store).__name__} requires a loader with `loads`/`dumps`')
+
+                if store.files:
+                    _loader.load = bind(_loader.load, name, cache_key)
+                    _loader.save = bind(_loader.save, name, cache_key)
+
+                acc = Accessor(name, field, stat, miss=field_miss, refresh=compute, hit=hit, loader=_loader)
             else:
-                log(f'Skipping: {name}')
+                acc = Accessor(
+                    name, field, stat,
+                    miss=directfield_miss,
+                    refresh=fetch,
+                    hit=hit,
+                    download=bind(field.download, name, cache_key),
+                    parse=bind(field.parse, name, cache_key),
+                )
+
+            # Store the field accessor on the class' definition
+            log(f'Setting accessor: {name}: {acc}')
+            methods[name] = acc
 
         # List of fields that were instrumented
         log(f'Fields: {fields}')
+        methods['_fields'] = members
+        # Pin instances across processes (see `pin`) if they (or their bases) have `@directfield`s
+        shared_pins = any( isinstance(member, DirectField) for member in members.values() ) or any(
+            isinstance(base, Meta) and base._shared_pins for base in bases
+        )
+        methods['_shared_pins'] = shared_pins
+        methods['_stats'] = stats
+        methods['_skip_cache_key'] = skip_cache_key
 
         orig_init = None
         if '__init__' in methods:
@@ -327,6 +586,48 @@ class Meta(type):
             methods['__repr__'] = __str__
 
         new = super(Meta, mcs).__new__(mcs, clsname, bases, methods)
+        mcs.classes[abspath(str(class_dir))] = new
+        register(f'{new.__module__}.{new.__qualname__}', stats)
+        store.names = { name for base in new.__mro__ for name in base.__dict__.get('_fields', {}) }
         log(f'returning {new}: {methods}')
 
         return new
+
+    def materialize(cls, ids, fields=None, **kwargs):
+        '''Compute and persist `fields` (default: all) for many `ids`, in parallel; see `pclass.batch.materialize`'''
+        from .batch import materialize
+        return materialize(cls, ids, fields, **kwargs)
+
+    def stats(cls, reset=False):
+        '''Return `{ field: {counter: value} }` access statistics for this class' fields (including inherited ones);
+        see `pclass.stats.FieldStats`
+
+        Memory hits (on fields without a `ttl`) are only counted while counting is turned on; see `track`.
+        '''
+        result = {}
+        for base in reversed(cls.__mro__):
+            for name, stat in base.__dict__.get('_stats', {}).items():
+                result[name] = stat.to_dict()
+                if reset: stat.reset()
+        return result
+
+    def track(cls, enabled=True):
+        '''Turn counting of memory hits on this class' fields (including inherited ones) on or off
+
+        Swaps each field's accessor: counted memory hits go through a `TrackedField` (a method call per access); uncounted
+        ones are plain instance-attribute lookups (`CachedField`). Fields with a `ttl` are always tracked. See
+        `pclass.stats.track` for all classes at once.
+        '''
+        Accessor = TrackedField if enabled else CachedField
+        for base in cls.__mro__:
+            for name, acc in list(base.__dict__.items()):
+                if isinstance(acc, CachedField) and acc.field.ttl is None and type(acc) is not Accessor:
+                    swapped = Accessor.__new__(Accessor)
+                    swapped.__dict__.update(acc.__dict__)
+                    setattr(base, name, swapped)
+
+    def __call__(cls, *args, **kwargs):
+        instances = cls._instances
+        if instances is None:
+            return super(Meta, cls).__call__(*args, **kwargs)
+        return instances(lambda: super(Meta, cls).__call__(*args, **kwargs), args, kwargs)
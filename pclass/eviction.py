@@ -0,0 +1,214 @@
+from contextlib import contextmanager, ExitStack
+from os.path import abspath
+from pathlib import Path
+from sys import stderr
+from threading import Lock
+from time import time
+from weakref import finalize
+
+import opts
+
+from .lock import shared_lock, try_lock, unshare
+from .storage import DirStorage, SQLiteStorage
+
+
+# (class dir, id) -> number of live instances using that cache entry
+pins = {}
+# (class dir, id) -> (file holding a shared lock on the entry's pin file, its path), for entries pinned across processes
+shares = {}
+lock = Lock()
+
+# Per-class dir of pin files (skipped by `Storage.instance_dirs`, like other dot-dirs)
+PINS_DIR = '.pins'
+
+
+def key(class_dir, id):
+    return abspath(str(class_dir)), str(id)
+
+
+def pin_path(class_dir, id):
+    return Path(class_dir) / PINS_DIR / f'{id}.pin'
+
+
+def pin(class_dir, id, owner, shared=False):
+    '''Protect instance `id`'s cache entry from eviction for as long as `owner` (typically the instance) is alive
+
+    `Meta` pins each instance when it first materializes a field, so e.g. the clone behind a loaded module's `Gist`
+    (which the `Importer`'s nodes keep alive) is never evicted out from under it.
+
+    With `shared`, the entry is also protected from `collect`s in other processes, by holding a shared `flock` on its
+    pin file (`<class dir>/.pins/<id>.pin`) while pinned; `Meta` does this for classes with `@directfield`s, whose
+    on-disk downloads are read long after they're first accessed.
+    '''
+    k = key(class_dir, id)
+    with lock:
+        pins[k] = pins.get(k, 0) + 1
+        if shared and k not in shares:
+            path = pin_path(class_dir, id)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            shares[k] = (shared_lock(path), path)
+    finalize(owner, unpin, k)
+
+
+def unpin(k):
+    with lock:
+        n = pins.get(k, 0) - 1
+        if n > 0:
+            pins[k] = n
+        else:
+            pins.pop(k, None)
+            share = shares.pop(k, None)
+            if share:
+                unshare(*share)
+
+
+def pinned(class_dir, id):
+    '''Whether instance `id`, or (for entries that were identified coarsely; see `Storage.instance_dirs`) any instance
+    nested under it, is pinned'''
+    dir, id = key(class_dir, id)
+    with lock:
+        return any( d == dir and (i == id or i.startswith(f'{id}/')) for d, i in pins )
+
+
+@contextmanager
+def claim(class_dir, id):
+    '''Yield whether no other process pins instance `id` (or any instance nested under it; see `pinned`), and if so,
+    keep them from pinning it (until exiting), via exclusive non-blocking locks on the pin files'''
+    pins_dir = Path(class_dir) / PINS_DIR
+    if not pins_dir.exists():
+        # Nothing of this class has ever been pinned across processes
+        yield True
+        return
+    path = pin_path(class_dir, id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    nested = pins_dir / str(id)
+    paths = [ path ] + (sorted(nested.rglob('*.pin')) if nested.is_dir() else [])
+    with ExitStack() as stack:
+        if all( stack.enter_context(try_lock(p)) for p in paths ):
+            yield True
+        else:
+            yield False
+
+
+def fmt_bytes(n):
+    for unit in [ 'B', 'KB', 'MB', 'GB' ]:
+        if n < 1024 or unit == 'GB':
+            return f'{n:.0f}{unit}' if unit == 'B' else f'{n:.1f}{unit}'
+        n /= 1024
+
+
+def storage_for(class_dir):
+    '''The `Storage` of the `Meta` class cached in `class_dir` (if it was defined in this process; otherwise, inferred
+    from the directory's contents), and its eviction budget'''
+    from .dircache import Meta
+    cls = Meta.classes.get(abspath(str(class_dir)))
+    if cls:
+        return cls._storage, cls._budget
+    if (class_dir / SQLiteStorage.FILENAME).exists():
+        return SQLiteStorage(class_dir), {}
+    return DirStorage(class_dir), {}
+
+
+def cache_dir(cache_root=None):
+    from .dircache import Meta
+    return Path(cache_root or opts.cache_root or Meta.DEFAULT_CACHE_DIR).expanduser()
+
+
+def sizes(cache_root=None):
+    '''`{class name: dict(entries, bytes)}` for each class cached in `cache_root` (default: `opts.cache_root`, or
+    `Meta.DEFAULT_CACHE_DIR`)'''
+    root = cache_dir(cache_root)
+    sizes = {}
+    if root.exists():
+        for class_dir in sorted(root.iterdir()):
+            if not class_dir.is_dir(): continue
+            storage, _ = storage_for(class_dir)
+            entries = list(storage.entries())
+            sizes[class_dir.name] = dict(entries=len(entries), bytes=sum( size for _, _, size in entries ))
+    return sizes
+
+
+def collect(cache_root=None, max_bytes=None, max_entries=None, min_age=60, dry_run=False, report=True):
+    '''Evict least-recently-used instances' cache entries until each class, and `cache_root` as a whole, are in budget
+
+    Each class' own budget comes from `Meta`'s `max_bytes`/`max_entries` keywords; the overall budget from the
+    arguments here (defaulting to `opts.cache_max_bytes`/`opts.cache_max_entries`). An "entry" is everything cached for
+    one instance (its `@field`s and `@directfield`s, e.g. a Gist's clone).
+
+    Entries in use by live instances (in this process, or, for classes with `@directfield`s, in any process; see `pin`),
+    or accessed within the last `min_age` seconds, are never evicted.
+
+    :param cache_root: directory to collect (default: `opts.cache_root`, or `Meta.DEFAULT_CACHE_DIR`)
+    :param dry_run: only report what would be evicted
+    :param report: print a summary of what was freed
+    :return: `dict(evicted, freed, remaining)`: a list of `dict(cls, id, bytes, atime)` for evicted entries, the number
+             of bytes they held, and `dict(entries, bytes)` left in the cache
+    '''
+    root = cache_dir(cache_root)
+    if max_bytes is None: max_bytes = opts.cache_max_bytes
+    if max_entries is None: max_entries = opts.cache_max_entries
+
+    now = time()
+    evicted = []
+    compact = set()
+
+    def evictable(entry):
+        return now - entry['atime'] >= min_age and not pinned(entry['storage'].class_dir, entry['id'])
+
+    def enforce(entries, max_bytes, max_entries):
+        '''Evict from `entries` (oldest first) until within budget; return the survivors'''
+        size = sum( entry['bytes'] for entry in entries )
+        count = len(entries)
+        survivors = []
+        for entry in sorted(entries, key=lambda entry: entry['atime']):
+            over = (max_bytes is not None and size > max_bytes) or (max_entries is not None and count > max_entries)
+            if over and evictable(entry):
+                with claim(entry['storage'].class_dir, entry['id']) as claimed:
+                    if claimed and not dry_run:
+                        entry['storage'].evict(entry['id'])
+                        compact.add(entry['storage'])
+                if claimed:
+                    evicted.append(entry)
+                    size -= entry['bytes']
+                    count -= 1
+                    continue
+            survivors.append(entry)
+        return survivors
+
+    kept = []
+    if root.exists():
+        for class_dir in sorted(root.iterdir()):
+            if not class_dir.is_dir(): continue
+            storage, budget = storage_for(class_dir)
+            entries = [
+                dict(cls=class_dir.name, storage=storage, id=id, atime=atime, bytes=size)
+                for id, atime, size in storage.entries()
+            ]
+            kept += enforce(entries, budget.get('bytes'), budget.get('entries'))
+
+    kept = enforce(kept, max_bytes, max_entries)
+
+    for storage in compact:
+        storage.compact()
+
+    evicted = [
+        { k: v for k, v in entry.items() if k != 'storage' }
+        for entry in evicted
+    ]
+    freed = sum( entry['bytes'] for entry in evicted )
+    remaining = dict(entries=len(kept), bytes=sum( entry['bytes'] for entry in kept ))
+
+    if report:
+        verb = 'Would evict' if dry_run else 'Evicted'
+        by_class = {}
+        for entry in evicted:
+            count, size = by_class.get(entry['cls'], (0, 0))
+            by_class[entry['cls']] = (count + 1, size + entry['bytes'])
+        for cls, (count, size) in by_class.items():
+            stderr.write(f'{cls}: {verb.lower()} {count} entries ({fmt_bytes(size)})\n')
+        stderr.write(
+            f'{verb} {len(evicted)} entries ({fmt_bytes(freed)}) from {root}; '
+            f'{remaining["entries"]} entries ({fmt_bytes(remaining["bytes"])}) remain\n'
+        )
+
+    return dict(evicted=evicted, freed=freed, remaining=remaining)
@@ -2,7 +2,10 @@ from .loader import Loader, JSON
 
 
 def field(fn=None, loader=None, **kwargs):
-    '''Decorator for class-fields that should be computed lazily and persistent-cached'''
+    '''Decorator for class-fields that should be computed lazily and persistent-cached
+
+    Keyword args (besides `loader`, `load`, and `save`) include `ttl` and `strict`; see `Expiry`.
+    '''
     if fn:
         # this typically indicates argument-less invocation of the decorator; the field's default "getter" function is
         # passed as `fn`, and other fields are None
@@ -13,9 +16,30 @@ def field(fn=None, loader=None, **kwargs):
         return lambda fn: Field(fn, loader, **kwargs)
 
 
-class Field:
+class Expiry:
+    '''Mixin for fields whose cached values expire
+
+    :param ttl: seconds after which a cached value (in memory or on disk) is stale; or a callable returning that (called
+           on each check, e.g. to read a configuration value); `None` (the default) means values never expire
+    :param strict: when a value is stale, block on recomputing it; by default, the stale value is returned immediately,
+           and refreshed in a background thread ("stale-while-revalidate")
+    '''
+    def __init__(self, ttl=None, strict=False):
+        self.ttl = ttl
+        self.strict = strict
+
+    def expiry(self, mtime):
+        '''When a value written at `mtime` expires (`None`: never)'''
+        ttl = self.ttl
+        if callable(ttl): ttl = ttl()
+        if ttl is None: return None
+        return mtime + ttl
+
+
+class Field(Expiry):
     '''Class encapsulating info about class-fields to be cached'''
-    def __init__(self, compute, loader=None, **kwargs):
+    def __init__(self, compute, loader=None, ttl=None, strict=False, **kwargs):
+        super(Field, self).__init__(ttl, strict)
         self.compute = compute
 
         self.default_load = False
@@ -39,18 +63,30 @@ class Field:
         self.default_load = default_loader and not explicit_load
         self.default_save = default_loader and not explicit_save
 
-        self.loader = Loader(_load, _save)
+        # Byte-level (de)serializers only carry over from the `loader` whose file-level ones are in effect
+        self.loader = Loader(
+            _load,
+            _save,
+            None if explicit_load else loader.loads,
+            None if explicit_save else loader.dumps,
+        )
 
 
-def directfield(download=None, parse=None):
+def directfield(download=None, parse=None, ttl=None, strict=False):
     if not download:
-        return lambda download: DirectField(download, parse)
+        return lambda download: DirectField(download, parse, ttl, strict)
     else:
-        return DirectField(download, parse)
+        return DirectField(download, parse, ttl, strict)
+
 
+class DirectField(Expiry):
+    '''Field that's downloaded directly to a path (e.g. a `git clone`), and "parsed" from there
 
-class DirectField:
-    def __init__(self, download, parse=None):
+    With a `ttl` (see `Expiry`), stale downloads are refreshed by calling `download` again on the existing path (e.g. a
+    `git pull`, or a conditional GET).
+    '''
+    def __init__(self, download, parse=None, ttl=None, strict=False):
+        super(DirectField, self).__init__(ttl, strict)
         self.download = download
         self.parse = parse
 
@@ -1,10 +1,21 @@
+from io import BytesIO
 import json
+import marshal
+import pickle
 
 
 class Loader:
-    def __init__(self, load, save):
+    '''(De)serialization logic for `@field` values
+
+    `load`/`save` read and write a file at a given path (used by file-per-field storage, e.g. `DirStorage`); optional
+    `loads`/`dumps` convert to and from `bytes` (used by storage backends that hold values themselves, e.g.
+    `SQLiteStorage`).
+    '''
+    def __init__(self, load, save, loads=None, dumps=None):
         self.load = load
         self.save = save
+        self.loads = loads
+        self.dumps = dumps
 
 
 class JSONLoader(Loader):
@@ -18,11 +29,124 @@ class JSONLoader(Loader):
         with path.open('w') as f:
             json.dump(val, f)
 
+    @staticmethod
+    def _loads(data):
+        return json.loads(data)
+
+    @staticmethod
+    def _dumps(val):
+        return json.dumps(val).encode()
+
     def __init__(self):
-        super(JSONLoader, self).__init__(self._load, self._save)
+        super(JSONLoader, self).__init__(self._load, self._save, self._loads, self._dumps)
 
 
 JSON = JSONLoader()
 
 
+class MarshalLoader(Loader):
+    '''Persist values `marshal` supports (notably code objects); only readable by the same Python version'''
+    @staticmethod
+    def _load(path):
+        with path.open('rb') as f:
+            return marshal.load(f)
+
+    @staticmethod
+    def _save(path, val):
+        with path.open('wb') as f:
+            marshal.dump(val, f)
+
+    def __init__(self):
+        super(MarshalLoader, self).__init__(self._load, self._save, marshal.loads, marshal.dumps)
+
+
+MARSHAL = MarshalLoader()
+
+
+class PickleLoader(Loader):
+    '''Persist any picklable value (at `pickle.HIGHEST_PROTOCOL`, by default)'''
+    def __init__(self, protocol=pickle.HIGHEST_PROTOCOL):
+        self.protocol = protocol
+        super(PickleLoader, self).__init__(self._load, self._save, pickle.loads, self._dumps)
+
+    @staticmethod
+    def _load(path):
+        with path.open('rb') as f:
+            return pickle.load(f)
+
+    def _save(self, path, val):
+        with path.open('wb') as f:
+            pickle.dump(val, f, protocol=self.protocol)
+
+    def _dumps(self, val):
+        return pickle.dumps(val, protocol=self.protocol)
+
+
+PICKLE = PickleLoader()
+
+
+class MsgpackLoader(Loader):
+    '''Persist JSON-like values (plus `bytes`) as MessagePack; requires the `msgpack` package (`pip install
+    ur[msgpack]`)'''
+    @staticmethod
+    def _loads(data):
+        import msgpack
+        return msgpack.unpackb(data, raw=False)
+
+    @staticmethod
+    def _dumps(val):
+        import msgpack
+        return msgpack.packb(val, use_bin_type=True)
+
+    def _load(self, path):
+        return self._loads(path.read_bytes())
+
+    def _save(self, path, val):
+        path.write_bytes(self._dumps(val))
+
+    def __init__(self):
+        super(MsgpackLoader, self).__init__(self._load, self._save, self._loads, self._dumps)
+
+
+MSGPACK = MsgpackLoader()
+
+
+class NumpyLoader(Loader):
+    '''Persist NumPy arrays as `.npy` files; requires the `numpy` package (`pip install ur[numpy]`)
+
+    Files are loaded with `mmap_mode` (read-only memory-mapping, by default), so loads are zero-copy and pages are only
+    read as they're accessed. Values held as bytes (e.g. in `SQLiteStorage`) can't be mapped, and are loaded in full.
+    '''
+    def __init__(self, mmap_mode='r'):
+        self.mmap_mode = mmap_mode
+        super(NumpyLoader, self).__init__(self._load, self._save, self._loads, self._dumps)
+
+    def _load(self, path):
+        import numpy as np
+        return np.load(path, mmap_mode=self.mmap_mode, allow_pickle=False)
+
+    @staticmethod
+    def _save(path, val):
+        import numpy as np
+        # (`Meta` writes to a temporary path and renames it into place, so arrays memory-mapped from an earlier version
+        # of the file remain valid; passing a file object keeps `np.save` from appending ".npy" to the path)
+        with path.open('wb') as f:
+            np.save(f, val, allow_pickle=False)
+
+    @staticmethod
+    def _loads(data):
+        import numpy as np
+        return np.load(BytesIO(data), allow_pickle=False)
+
+    @staticmethod
+    def _dumps(val):
+        import numpy as np
+        buf = BytesIO()
+        np.save(buf, val, allow_pickle=False)
+        return buf.getvalue()
+
+
+NPY = NumpyLoader()
+
+
 noop = lambda path, val: None
@@ -0,0 +1,105 @@
+from contextlib import contextmanager
+from os import fstat, stat
+from threading import Lock
+
+try:
+    import fcntl
+except ImportError:
+    # e.g. Windows: only threads within a process are serialized
+    fcntl = None
+
+
+# Fallback per-path locks, when `fcntl` is unavailable
+locks = {}
+locks_lock = Lock()
+
+
+def open_locked(path, mode):
+    '''Open (creating, if necessary) and `flock` `path` with `mode`; return the open file, or `None` if `mode` is
+    non-blocking and the lock is held elsewhere
+
+    Retries if the file is removed (by a previous exclusive holder; see `file_lock`) between being opened and locked.
+    '''
+    while True:
+        f = open(path, 'a')
+        try:
+            fcntl.flock(f, mode)
+        except BlockingIOError:
+            f.close()
+            return None
+        try:
+            current = stat(path).st_ino
+        except FileNotFoundError:
+            current = None
+        if current == fstat(f.fileno()).st_ino:
+            return f
+        # The previous holder removed this file (after we opened it, but before we acquired it)
+        f.close()
+
+
+def release(f, path):
+    '''Remove lock file `path`, then release and close `f` (waiters that acquire the removed file retry on a new one)'''
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+    fcntl.flock(f, fcntl.LOCK_UN)
+    f.close()
+
+
+@contextmanager
+def file_lock(path):
+    '''Hold an exclusive lock on `path` across threads and processes
+
+    Uses `flock`, which is released automatically if the holding process dies; each acquisition opens its own file
+    description, so threads within one process exclude each other too. The lock file only exists while the lock is held
+    or awaited: the holder removes it before releasing, and waiters that then acquire the removed file retry on a new
+    one.
+    '''
+    if fcntl is None:
+        with locks_lock:
+            lock = locks.setdefault(str(path), Lock())
+        with lock:
+            yield
+        return
+
+    f = open_locked(path, fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        release(f, path)
+
+
+def shared_lock(path):
+    '''Take a shared lock on `path`, held (across threads and processes) until the returned file is passed to
+    `unshare`; `None` if `fcntl` is unavailable'''
+    if fcntl is None: return None
+    return open_locked(path, fcntl.LOCK_SH)
+
+
+def unshare(f, path):
+    '''Release a `shared_lock`; the last holder removes the lock file'''
+    if f is None: return
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        return
+    release(f, path)
+
+
+@contextmanager
+def try_lock(path):
+    '''Try to take an exclusive lock on `path`, without blocking; yield whether it was acquired (always `True` if
+    `fcntl` is unavailable), and hold it until exiting'''
+    if fcntl is None:
+        yield True
+        return
+    f = open_locked(path, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    if f is None:
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        release(f, path)
@@ -0,0 +1,27 @@
+from concurrent.futures import ThreadPoolExecutor
+from sys import stderr
+from threading import Lock
+
+
+# Background refreshes of stale fields (see `pclass.field.Expiry`) run in a small shared thread pool
+MAX_WORKERS = 4
+
+pool = None
+lock = Lock()
+
+
+def submit(fn, description):
+    '''Run `fn` in the background; errors are reported to stderr (the stale value remains in use)'''
+    global pool
+    with lock:
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='pclass-refresh')
+
+    def run():
+        try:
+            return fn()
+        except Exception as e:
+            stderr.write(f'Error refreshing {description}: {e!r}\n')
+            raise
+
+    return pool.submit(run)
@@ -0,0 +1,113 @@
+import atexit
+import json
+from os import environ as env
+from sys import stderr
+
+
+# Set to a path to write all classes' field stats there (as JSON) when the process exits ("-" for stderr)
+STATS_ENV_VAR = 'UR_STATS'
+
+# Whether `Meta` classes defined from here on count memory hits (on fields without a `ttl`); on when stats are dumped
+# (`UR_STATS`), otherwise see `track`
+track_memory_hits = bool(env.get(STATS_ENV_VAR))
+
+
+class FieldStats:
+    '''Counters for one `@field`/`@directfield` of one `Meta` class
+
+    - memory hits: accesses answered by the instance's already-materialized value (only counted for fields with a
+      `ttl`, unless counting is turned on; see `track`)
+    - disk hits: values loaded from the class' `Storage` (or, for `@directfield`s, parsed from an existing download)
+    - computes: values computed and saved (or downloaded)
+    - stale hits: expired values returned while a background refresh runs (see `pclass.field.Expiry`)
+    - refreshes: computes (or re-downloads) of expired values (also counted in `computes`)
+    - bytes read/written: sizes of values loaded/saved (downloaded directories, e.g. clones, count as 0)
+    - load/compute seconds: cumulative and max latency of loads/computes (including any wait for another thread or
+      process computing the same value)
+
+    Updates aren't synchronized across threads; counts are approximate under heavy contention.
+    '''
+    __slots__ = [
+        'memory_hits', 'disk_hits', 'computes', 'stale_hits', 'refreshes',
+        'bytes_read', 'bytes_written',
+        'load_seconds', 'load_max', 'compute_seconds', 'compute_max',
+    ]
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        for k in self.__slots__:
+            setattr(self, k, 0)
+
+    def loaded(self, seconds, size):
+        self.disk_hits += 1
+        self.bytes_read += size
+        self.load_seconds += seconds
+        if seconds > self.load_max: self.load_max = seconds
+
+    def computed(self, seconds, size):
+        self.computes += 1
+        self.bytes_written += size
+        self.compute_seconds += seconds
+        if seconds > self.compute_max: self.compute_max = seconds
+
+    def to_dict(self):
+        return { k: getattr(self, k) for k in self.__slots__ }
+
+
+# "<module>.<class>" -> { field name -> `FieldStats` }, for every `Meta` class
+classes = {}
+
+
+def register(cls_name, stats):
+    classes[cls_name] = stats
+
+
+def track(enabled=True):
+    '''Turn counting of memory hits on or off (the default, unless `UR_STATS` is set), for all `Meta` classes (existing
+    and future)
+
+    Counting costs a method call per access; uncounted memory hits (on fields without a `ttl`) are plain
+    instance-attribute lookups. See `Meta.track`.
+    '''
+    global track_memory_hits
+    track_memory_hits = enabled
+    from .dircache import Meta
+    for cls in list(Meta.classes.values()):
+        cls.track(enabled)
+
+
+def snapshot(reset=False):
+    '''Return `{ "<module>.<class>": { field: {counter: value} } }` for all `Meta` classes with any field activity'''
+    result = {}
+    for cls_name, stats in classes.items():
+        fields = {
+            name: stat.to_dict()
+            for name, stat in stats.items()
+            if stat.memory_hits or stat.disk_hits or stat.computes
+        }
+        if fields:
+            result[cls_name] = fields
+        if reset:
+            for stat in stats.values():
+                stat.reset()
+    return result
+
+
+def dump(path=None):
+    '''Write `snapshot()` as JSON to `path` (or stderr, if `path` is `None` or "-")'''
+    data = json.dumps(snapshot(), indent=2)
+    if path is None or path == '-':
+        stderr.write(data + '\n')
+    else:
+        with open(path, 'w') as f:
+            f.write(data + '\n')
+
+
+def dump_at_exit(path=None):
+    atexit.register(dump, path)
+
+
+if env.get(STATS_ENV_VAR):
+    dump_at_exit(env[STATS_ENV_VAR])
@@ -0,0 +1,348 @@
+from abc import ABC, abstractmethod
+import atexit
+from contextlib import contextmanager
+from hashlib import sha1
+from os import getpid, utime, walk
+from os.path import getsize, join
+from shutil import rmtree
+import sqlite3
+from threading import local, Lock
+from time import time
+
+from .atomic import atomic_write
+from .lock import file_lock
+
+
+def du(path):
+    '''Total size of the files under `path` (not following symlinks)'''
+    total = 0
+    for root, dirs, files in walk(path):
+        for name in files:
+            try:
+                total += getsize(join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class Storage(ABC):
+    '''Backend that persists a `Meta` class' `@field` values
+
+    Passed to `Meta` via its `storage` keyword (as a class, or any callable taking the class' cache directory,
+    `<cache_root>/<cache_type_name>`); one instance is created per class, and exposed on it as `_storage`.
+
+    Values are passed in and out as `bytes` (see `Loader.loads`/`.dumps`). `@directfield`s always live in per-instance
+    directories (`<class_dir>/<id>`), regardless of the storage backend; the base-class implementations of `touch`,
+    `entries` and `evict` handle those.
+    '''
+    # Whether each (instance, field) pair is a file that `Meta` reads and writes directly, via `Loader.load`/`.save`
+    files = False
+
+    def __init__(self, class_dir):
+        self.class_dir = class_dir
+        # Names of the class' fields (set by `Meta`); used to find instance dirs nested under ids containing "/"
+        self.names = None
+
+    @abstractmethod
+    def get(self, id, name):
+        '''Return the stored bytes for field `name` of instance `id`, or `None`'''
+
+    def has(self, id, name):
+        return self.get(id, name) is not None
+
+    @abstractmethod
+    def put(self, id, name, data): pass
+
+    @abstractmethod
+    def delete(self, id, name): pass
+
+    @abstractmethod
+    def mtime(self, id, name):
+        '''When field `name` of instance `id` was last written (`None` if it isn't stored); used for `ttl`s'''
+
+    def get_many(self, ids, name):
+        '''Return a `dict` mapping each of `ids` that has a stored value for field `name` to that value'''
+        values = {}
+        for id in ids:
+            data = self.get(id, name)
+            if data is not None:
+                values[id] = data
+        return values
+
+    def has_many(self, ids, name):
+        '''Return the subset of `ids` that have a stored value for field `name`'''
+        return { id for id in ids if self.has(id, name) }
+
+    def put_many(self, name, values):
+        '''Store field `name` for many instances; `values` maps ids to `bytes`'''
+        with self.batch():
+            for id, data in values.items():
+                self.put(id, name, data)
+
+    @contextmanager
+    def batch(self):
+        '''Group writes made inside this block (where the backend supports it)'''
+        yield self
+
+    def lock(self, id, name):
+        '''Exclusive (cross-process) lock for computing field `name` of instance `id`; see `pclass.lock.file_lock`'''
+        dir = self.class_dir / str(id)
+        dir.mkdir(parents=True, exist_ok=True)
+        return file_lock(dir / f'.{name}.lock')
+
+    def touch(self, id):
+        '''Record an access to instance `id` (for LRU eviction; see `pclass.eviction`)'''
+        try:
+            utime(self.class_dir / str(id))
+        except OSError:
+            pass
+
+    def instance_dirs(self, dir=None, prefix=''):
+        '''Yield `(id, path)` for each per-instance dir
+
+        Ids containing "/" (e.g. `Github`'s "org/repo") are nested directories; a directory is taken to be an instance's
+        if it contains one of the class' field names, or no subdirectories (or if field names are unknown).
+        '''
+        dir = dir or self.class_dir
+        if not dir.exists(): return
+        for path in dir.iterdir():
+            # Skip non-instance dirs (e.g. temporary downloads)
+            if not path.is_dir() or path.name.startswith('.'): continue
+            id = prefix + path.name
+            if (
+                self.names is None or
+                any( (path / name).exists() for name in self.names ) or
+                not any( child.is_dir() for child in path.iterdir() )
+            ):
+                yield id, path
+            else:
+                yield from self.instance_dirs(path, f'{id}/')
+
+    def entries(self):
+        '''Yield `(id, atime, size)` for each instance with anything cached; ids are `str`s'''
+        for id, path in self.instance_dirs():
+            yield id, path.stat().st_mtime, du(path)
+
+    def evict(self, id):
+        '''Remove everything cached for instance `id`'''
+        path = self.class_dir / str(id)
+        if path.exists():
+            rmtree(path)
+        # Clean up now-empty parents of nested ids
+        parent = path.parent
+        while parent != self.class_dir and parent.exists() and not any(parent.iterdir()):
+            parent.rmdir()
+            parent = parent.parent
+
+    def compact(self):
+        '''Reclaim space freed by `evict`s (where that isn't immediate)'''
+        pass
+
+
+class DirStorage(Storage):
+    '''Default layout: one file per field, at `<class_dir>/<id>/<name>`'''
+    files = True
+
+    def path(self, id, name):
+        return self.class_dir / str(id) / name
+
+    def get(self, id, name):
+        path = self.path(id, name)
+        if not path.exists(): return None
+        return path.read_bytes()
+
+    def has(self, id, name):
+        return self.path(id, name).exists()
+
+    def mtime(self, id, name):
+        try:
+            return self.path(id, name).stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def put(self, id, name, data):
+        path = self.path(id, name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Renamed into place: concurrent readers never see a partial value
+        atomic_write(path, data=data)
+
+    def delete(self, id, name):
+        path = self.path(id, name)
+        if path.exists(): path.unlink()
+
+
+class SQLiteStorage(Storage):
+    '''All `@field`s of all instances of a class in one SQLite file (`<class_dir>/fields.sqlite`), keyed on `(id, name)`
+
+    Avoids a `stat`+`open` per field access, and the filesystem pressure of one file per field; `get_many`/`put_many`
+    (and writes inside `batch()`) each use a single query / transaction.
+    '''
+    FILENAME = 'fields.sqlite'
+
+    # Buffered access times (see `touch`) are written at least this often (as well as before listing `entries`, and at
+    # exit)
+    FLUSH_SECONDS = 30
+
+    # Stay well under SQLite's (compile-time) limit on "?" placeholders per statement
+    MAX_PARAMS = 500
+
+    def __init__(self, class_dir, filename=None):
+        super(SQLiteStorage, self).__init__(class_dir)
+        self.path = class_dir / (filename or self.FILENAME)
+        self._local = local()
+        # id -> access time, not yet written to the `access` table
+        self.touched = {}
+        self.touched_lock = Lock()
+        self.flushed = None
+
+    @property
+    def conn(self):
+        '''Per-thread connection (re-opened in `fork`ed children, which mustn't reuse their parent's)'''
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != getpid():
+            self.class_dir.mkdir(parents=True, exist_ok=True)
+            # Autocommit, except inside `batch()`
+            conn = sqlite3.connect(str(self.path), timeout=60, isolation_level=None)
+            # Let `compact` return evicted pages to the filesystem (only takes effect when the DB is created)
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            # Readers don't block on (or block) a writer in another process
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS fields ('
+                'id TEXT NOT NULL, name TEXT NOT NULL, value BLOB NOT NULL, time REAL, PRIMARY KEY (id, name)'
+                ') WITHOUT ROWID'
+            )
+            # Write times (for `mtime`) were added after the table's initial layout
+            if 'time' not in [ column for _, column, *_ in conn.execute('PRAGMA table_info(fields)') ]:
+                conn.execute('ALTER TABLE fields ADD COLUMN time REAL')
+            # Last access time of each instance, for LRU eviction
+            conn.execute('CREATE TABLE IF NOT EXISTS access (id TEXT PRIMARY KEY, time REAL NOT NULL) WITHOUT ROWID')
+            self._local.conn = conn
+            self._local.pid = getpid()
+            self._local.depth = 0
+        return conn
+
+    def get(self, id, name):
+        row = self.conn.execute('SELECT value FROM fields WHERE id = ? AND name = ?', (str(id), name)).fetchone()
+        return None if row is None else row[0]
+
+    def put(self, id, name, data):
+        now = time()
+        with self.batch():
+            self.conn.execute(
+                'INSERT OR REPLACE INTO fields (id, name, value, time) VALUES (?, ?, ?, ?)',
+                (str(id), name, data, now),
+            )
+            self.conn.execute('INSERT OR REPLACE INTO access VALUES (?, ?)', (str(id), now))
+
+    def mtime(self, id, name):
+        row = self.conn.execute('SELECT time FROM fields WHERE id = ? AND name = ?', (str(id), name)).fetchone()
+        # Values written before write times were recorded count as written at the epoch
+        return None if row is None else (row[0] or 0)
+
+    def delete(self, id, name):
+        self.conn.execute('DELETE FROM fields WHERE id = ? AND name = ?', (str(id), name))
+
+    def has(self, id, name):
+        row = self.conn.execute('SELECT 1 FROM fields WHERE id = ? AND name = ?', (str(id), name)).fetchone()
+        return row is not None
+
+    def _select(self, columns, ids, name):
+        '''Yield rows of `columns` for field `name` of `ids`, in chunks of at most `MAX_PARAMS` ids per query'''
+        strs = [ str(id) for id in ids ]
+        for start in range(0, len(strs), self.MAX_PARAMS):
+            chunk = strs[start:start + self.MAX_PARAMS]
+            yield from self.conn.execute(
+                f'SELECT {columns} FROM fields WHERE name = ? AND id IN (%s)' % ','.join('?' * len(chunk)),
+                [ name, *chunk ],
+            )
+
+    def get_many(self, ids, name):
+        keys = { str(id): id for id in ids }
+        return { keys[id]: data for id, data in self._select('id, value', keys.values(), name) }
+
+    def has_many(self, ids, name):
+        keys = { str(id): id for id in ids }
+        return { keys[id] for id, in self._select('id', keys.values(), name) }
+
+    def put_many(self, name, values):
+        now = time()
+        with self.batch():
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO fields (id, name, value, time) VALUES (?, ?, ?, ?)',
+                [ (str(id), name, data, now) for id, data in values.items() ],
+            )
+            self.conn.executemany('INSERT OR REPLACE INTO access VALUES (?, ?)', [ (str(id), now) for id in values ])
+
+    @contextmanager
+    def batch(self):
+        '''Commit all writes made inside this block (on this thread) in one transaction; blocks may be nested'''
+        conn = self.conn
+        depth = self._local.depth
+        if not depth: conn.execute('BEGIN IMMEDIATE')
+        self._local.depth = depth + 1
+        try:
+            yield self
+        except BaseException:
+            self._local.depth = depth
+            if not depth: conn.execute('ROLLBACK')
+            raise
+        self._local.depth = depth
+        if not depth: conn.execute('COMMIT')
+
+    def lock(self, id, name):
+        # Keep lock files out of per-instance dirs (which `@field`s stored here otherwise don't need)
+        self.class_dir.mkdir(parents=True, exist_ok=True)
+        return file_lock(self.class_dir / f'.{sha1(f"{id}/{name}".encode()).hexdigest()}.lock')
+
+    def touch(self, id):
+        '''Buffer an access to instance `id` in memory; a write per access would cost more than the disk hit itself
+
+        Buffered accesses are written (in one transaction) every `FLUSH_SECONDS`, before `entries` are listed (e.g. by
+        `pclass.eviction.collect`), and at exit.
+        '''
+        now = time()
+        with self.touched_lock:
+            self.touched[str(id)] = now
+            if self.flushed is None:
+                self.flushed = now
+                atexit.register(self.flush)
+                return
+            due = now - self.flushed >= self.FLUSH_SECONDS
+        if due: self.flush()
+
+    def flush(self):
+        '''Write buffered access times (see `touch`)'''
+        with self.touched_lock:
+            touched, self.touched = self.touched, {}
+            self.flushed = time()
+        if not touched: return
+        with self.batch():
+            self.conn.executemany('INSERT OR REPLACE INTO access VALUES (?, ?)', touched.items())
+
+    def entries(self):
+        self.flush()
+        atimes = dict(self.conn.execute('SELECT id, time FROM access'))
+        entries = {
+            id: (atimes.get(id) or 0, size)
+            for id, size in self.conn.execute('SELECT id, SUM(LENGTH(value)) FROM fields GROUP BY id')
+        }
+        # Merge in per-instance dirs (`@directfield`s)
+        for id, atime, size in super(SQLiteStorage, self).entries():
+            if id in entries:
+                _atime, _size = entries[id]
+                entries[id] = (max(atime, _atime), size + _size)
+            else:
+                entries[id] = (atime, size)
+        for id, (atime, size) in entries.items():
+            # Accesses to instances with only `@directfield`s are recorded here too (their dirs' mtimes aren't updated)
+            yield id, max(atime, atimes.get(id) or 0), size
+
+    def evict(self, id):
+        with self.batch():
+            self.conn.execute('DELETE FROM fields WHERE id = ?', (str(id),))
+            self.conn.execute('DELETE FROM access WHERE id = ?', (str(id),))
+        super(SQLiteStorage, self).evict(id)
+
+    def compact(self):
+        self.conn.execute('PRAGMA incremental_vacuum')
@@ -0,0 +1,198 @@
+from concurrent.futures import ThreadPoolExecutor
+from sys import stderr
+from time import perf_counter
+from urllib.parse import urlparse
+
+import opts
+
+
+DEFAULT_WORKERS = 8
+
+
+def fetch(source):
+    '''Clone/pull (or download) one source, so that a later import of it hits the on-disk cache
+
+    `source` can be a module name (e.g. `gist._1288bff2f9e05394a94312010da267bb`, `github.org.repo`,
+    `gitlab.group.project`) or a URL (Gist, GitHub, or GitLab web URLs, or any other http(s) URL).
+    '''
+    url = urlparse(source)
+    if not url.scheme:
+        # Module name: resolving its spec clones/pulls the underlying Gist or repo
+        from gists import importer
+        top = source.split('.')[0]
+        if top not in opts.gist_pkgs + opts.github_pkgs + opts.gitlab_pkgs:
+            raise ValueError(f'Unrecognized module {source}: expected one of {opts.gist_pkgs + opts.github_pkgs + opts.gitlab_pkgs}')
+        spec = importer.find_spec(source)
+        if not spec:
+            raise ValueError(f'Failed to find spec for {source}')
+        return spec
+
+    repo = repo_for(source)
+    if repo:
+        return repo.clone
+    else:
+        from url import URL
+        url = URL(source, _skip_cache=opts.skip_cache or opts.revalidate)
+        url.content.close()
+        return url
+
+
+def repo_for(source):
+    '''`Gist`, `Github`, or `Gitlab` for a web URL of one (`None` for other URLs)'''
+    url = urlparse(source)
+    domain = url.netloc
+    if domain in ['gist.github.com', 'gist.githubusercontent.com']:
+        from _gist import Gist
+        return Gist(Gist.parse_url(source)['id'], _skip_cache=opts.skip_cache)
+    elif domain in ['github.com', 'raw.githubusercontent.com']:
+        from _github import Github
+        [ org, repo, *_ ] = url.path.strip('/').split('/')
+        return Github(f'{org}/{repo}', _skip_cache=opts.skip_cache)
+    elif domain == 'gitlab.com':
+        from _gitlab import Gitlab
+        m = Gitlab.parse_url(source)
+        return Gitlab('/'.join(m['groups'] + [m['project']]), _skip_cache=opts.skip_cache)
+
+
+def prefetch(sources, workers=None, throw=True, report=True):
+    '''Concurrently clone/fetch many sources (see `fetch`) with a bounded thread pool
+
+    :param sources: module names and/or URLs
+    :param workers: maximum number of concurrent fetches (default: `DEFAULT_WORKERS`)
+    :param throw: after all fetches complete, re-raise the first error encountered (if any)
+    :param report: print each source's elapsed time (and any error)
+    :return: list of `dict(source, seconds, error)`, in the order of `sources`
+    '''
+    if isinstance(sources, str): sources = [sources]
+
+    # Create the `Importer` on this thread rather than a worker: its IPython shell's history database can only be used
+    # (e.g. at exit) from the thread that created it
+    import gists
+
+    def timed(source):
+        start = perf_counter()
+        try:
+            fetch(source)
+            error = None
+        except Exception as e:
+            error = e
+        return dict(source=source, seconds=perf_counter() - start, error=error)
+
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=workers or DEFAULT_WORKERS) as pool:
+        results = list(pool.map(timed, sources))
+    elapsed = perf_counter() - start
+
+    if report:
+        width = max([ len(result['source']) for result in results ], default=0)
+        for result in results:
+            source, seconds, error = result['source'], result['seconds'], result['error']
+            if error:
+                stderr.write(f'{source:<{width}}  {seconds:.2f}s  ERROR: {error!r}\n')
+            else:
+                print(f'{source:<{width}}  {seconds:.2f}s')
+        print(f'Prefetched {len(results)} sources in {elapsed:.2f}s')
+
+    if throw:
+        errors = [ result['error'] for result in results if result['error'] ]
+        if errors:
+            raise errors[0]
+
+    return results
+
+
+def module_name(source):
+    '''Module name that imports `source` (a module name, or a Gist, GitHub, or GitLab URL); `None` for other URLs'''
+    if not urlparse(source).scheme: return source
+    repo = repo_for(source)
+    return repo.module_name if repo else None
+
+
+def compile_tree(name):
+    '''Build the tree index (`manifest`) and compiled-code caches (see `codecache`) for every `.py`/`.ipynb` file under
+    module `name`, without executing any of them
+
+    Mirrors the files a (non-lazy) import would load: `.urignore`d, hidden, and dunder directories are skipped.
+    Returns `(number of files compiled, [(node, error), …])`.
+    '''
+    from gists import importer
+    from urignore import UrIgnore
+    spec = importer.find_spec(name)
+    if not spec:
+        raise ValueError(f'Failed to find spec for {name}')
+
+    compiled, errors = 0, []
+    nodes = [ (spec._node, []) ] if spec._node else []
+    while nodes:
+        node, urignores = nodes.pop()
+        if node.is_dir:
+            children = node.children
+            if '.urignore' in children:
+                urignores = urignores + [ UrIgnore(children['.urignore']) ]
+            nodes += [
+                (child, urignores)
+                for name, child in children.items()
+                if not (child.is_dir and (name.startswith('.') or name.startswith('__')))
+                and name != 'setup.py'
+                and all( urignore.check(child) for urignore in urignores )
+            ]
+        elif node.name.endswith('.py') or node.name.endswith('.ipynb'):
+            try:
+                importer.compile_node(node, str(node.url))
+                compiled += 1
+            except Exception as e:
+                errors.append((node, e))
+    return compiled, errors
+
+
+def warm(sources, workers=None, compile=True, report=True):
+    '''Warm the on-disk caches for `sources`, so that later imports of them don't pay cold-import costs
+
+    Sources are fetched concurrently (see `prefetch`); then, for module names and Gist/GitHub/GitLab URLs, each tree is
+    indexed and its files compiled into the bytecode caches (when `opts.bytecode_cache` is set; see `compile_tree`).
+    Nothing is executed.
+
+    :return: `dict(sources, cache)`: a list of `dict(source, module, fetch, compile, files, errors)` (seconds for each
+             phase, files compiled, and any error messages), and the cache's size per class (see
+             `pclass.eviction.sizes`)
+    '''
+    from pclass.eviction import fmt_bytes, sizes
+
+    if isinstance(sources, str): sources = [sources]
+    results = [
+        dict(source=result['source'], module=None, fetch=result['seconds'], compile=None, files=0,
+             errors=[ repr(result['error']) ] if result['error'] else [])
+        for result in prefetch(sources, workers=workers, throw=False, report=False)
+    ]
+
+    if compile and opts.bytecode_cache:
+        for result in results:
+            if result['errors']: continue
+            start = perf_counter()
+            try:
+                result['module'] = module = module_name(result['source'])
+                if module:
+                    result['files'], errors = compile_tree(module)
+                    result['errors'] += [ f'{node}: {error!r}' for node, error in errors ]
+            except Exception as e:
+                result['errors'].append(repr(e))
+            result['compile'] = perf_counter() - start
+
+    cache = sizes()
+
+    if report:
+        width = max([ len(result['source']) for result in results ], default=0)
+        for result in results:
+            line = f'{result["source"]:<{width}}  fetch {result["fetch"]:.2f}s'
+            if result['compile'] is not None:
+                line += f'  compile {result["compile"]:.2f}s ({result["files"]} files)'
+            print(line)
+            for error in result['errors']:
+                stderr.write(f'{result["source"]}: ERROR: {error}\n')
+        width = max([ len(cls) for cls in cache ], default=0)
+        for cls, size in cache.items():
+            print(f'{cls:<{width}}  {size["entries"]:>5} entries  {fmt_bytes(size["bytes"]):>8}')
+        total = sum( size['bytes'] for size in cache.values() )
+        print(f'Warmed {len(results)} sources; cache: {fmt_bytes(total)}')
+
+    return dict(sources=results, cache=cache)
@@ -5,15 +5,17 @@ with open('README.md', 'r') as f:
 
 setup(
       name='ur',
-      packages=[ 'pclass', 'gists', '_gist', 'gist', '_github', 'github', ],
+      packages=[ 'pclass', 'gists', '_gist', 'gist', '_github', 'github', '_gitlab', ],
       version='0.2.0',
       description='Import remote Jupyter notebooks (or Python files)',
       long_description=long_description,
       long_description_content_type='text/markdown',
       author='Ryan Williams',
       author_email='ryan@runsascoded.com',
-      py_modules=[ 'ur', 'cells', 'importer', 'opts', 'rgxs', 'urignore', 'url_loader', ],
+      py_modules=[ 'ur', 'cells', 'importer', 'opts', 'rgxs', 'urignore', 'url_loader', 'codecache', 'prefetch', 'clones', 'tracer', 'lockfile', 'freeze', 'cli', 'nb', 'node', 'url', ],
+      entry_points={ 'console_scripts': [ 'ur = cli:main', ], },
       install_requires=[ 'jupyter', 'nbformat', 'GitPython', 'lxml', 'cssselect', ],
+      extras_require={ 'msgpack': [ 'msgpack', ], 'numpy': [ 'numpy', ], },
       keywords=[ 'gists', 'imports', 'importlib', 'jupyter', 'notebooks', ],
       license='BSD',
       url='https://gitlab.com/runsascoded/ur',
@@ -0,0 +1,83 @@
+from functools import partial
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from subprocess import check_call
+from tempfile import TemporaryDirectory
+from threading import Thread
+
+from pytest import fixture
+
+import opts
+
+# `Meta` classes pick their cache dir when they're defined (e.g. on first import of `_gitlab`); point them at a scratch
+# dir instead of `.objs/` in the repo
+_cache_root = TemporaryDirectory()
+opts.cache_root = _cache_root.name
+
+
+def _git(*args, cwd):
+  check_call([ 'git', '-c', 'user.name=ur', '-c', 'user.email=ur@example.com', *args ], cwd=cwd)
+
+
+@fixture
+def git():
+  '''`git(*args, cwd)`: run a `git` command (with a committer identity set)'''
+  return _git
+
+
+@fixture
+def local_repo(git):
+  '''`local_repo(path, files)`: create a git repo at `path`, with `files` (`{ relative path: text }`) committed'''
+  def make(path, files):
+    for name, text in files.items():
+      (path / name).parent.mkdir(parents=True, exist_ok=True)
+      (path / name).write_text(text)
+    git('init', '-q', cwd=path)
+    git('add', '.', cwd=path)
+    git('commit', '-qm', 'first', cwd=path)
+    return path
+  return make
+
+
+@fixture
+def github_remote(tmp_path, monkeypatch, local_repo, git):
+  '''Stand-in for github.com: `github_remote(org, repo, files)` commits `files` to a local repo (`<tmp_path>/src/<repo>`,
+  returned), and clones it to a bare `<tmp_path>/remote/github/<org>/<repo>.git` (its `origin`, to push to).
+
+  `https://github.com/` URLs are rewritten to the bare repos via `GIT_CONFIG_*` env vars, which subprocesses inherit.
+  '''
+  remote = tmp_path / 'remote'
+  monkeypatch.setenv('GIT_CONFIG_COUNT', '1')
+  monkeypatch.setenv('GIT_CONFIG_KEY_0', f'url.file://{remote}/github/.insteadOf')
+  monkeypatch.setenv('GIT_CONFIG_VALUE_0', 'https://github.com/')
+
+  def make(org, repo, files):
+    src = local_repo(tmp_path / 'src' / repo, files)
+    bare = remote / 'github' / org / f'{repo}.git'
+    check_call([ 'git', 'clone', '-q', '--bare', str(src), str(bare) ])
+    git('remote', 'add', 'origin', str(bare), cwd=src)
+    return src
+  return make
+
+
+@fixture
+def http_server():
+  '''`http_server(handler=None, directory=None)`: serve requests with `handler` (a `BaseHTTPRequestHandler` subclass),
+  or static files from `directory`, on a local port, in a background thread (until the test ends, or `.shutdown()`).
+  Returns the `HTTPServer`, with its base URL as `.url`.
+  '''
+  servers = []
+
+  def serve(handler=None, directory=None):
+    handler = type('Handler', (handler or SimpleHTTPRequestHandler,), dict(log_message=lambda *args: None))
+    if directory is not None:
+      handler = partial(handler, directory=str(directory))
+    server = HTTPServer(('127.0.0.1', 0), handler)
+    server.url = f'http://127.0.0.1:{server.server_port}'
+    Thread(target=server.serve_forever, daemon=True).start()
+    servers.append(server)
+    return server
+
+  yield serve
+  for server in servers:
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,53 @@
+from os.path import dirname, join
+from subprocess import run, PIPE
+import json
+import sys
+
+from cli import read_sources
+
+
+ROOT = dirname(dirname(__file__))
+
+
+def test_read_sources(tmp_path):
+  path = tmp_path / 'sources.txt'
+  path.write_text('# deps\ngithub.org.repo\n\n  https://example.com/a.py#frag  \n')
+  assert read_sources(str(path)) == [ 'github.org.repo', 'https://example.com/a.py#frag' ]
+
+
+def test_warm(tmp_path, github_remote):
+  github_remote('warmorg', 'warmrepo', {
+    # Warming compiles, but doesn't execute, modules
+    'a.py': "raise RuntimeError('executed')\n",
+    'nb.ipynb': json.dumps({
+      'cells': [ dict(cell_type='code', execution_count=None, metadata={}, outputs=[], source="def f(): return 'f'") ],
+      'metadata': { 'kernelspec': { 'display_name': 'Python 3', 'language': 'python', 'name': 'python3' } },
+      'nbformat': 4,
+      'nbformat_minor': 4,
+    }),
+    'broken.py': 'def (\n',
+    '.urignore': 'broken.py\n',
+  })
+
+  work = tmp_path / 'work'
+  work.mkdir()
+  (work / 'sources.txt').write_text('# ur deps\ngithub.warmorg.warmrepo\n')
+  cache = tmp_path / 'cache'
+
+  def warm(*args):
+    cmd = [ sys.executable, join(ROOT, 'cli.py'), '-c', str(cache), 'warm', *args ]
+    return run(cmd, cwd=work, stdout=PIPE, stderr=PIPE, text=True)
+
+  proc = warm('-f', 'sources.txt')
+  assert proc.returncode == 0, proc.stderr
+  assert 'Traceback' not in proc.stderr
+  lines = proc.stdout.split('\n')
+  assert [ line for line in lines if line.startswith('github.warmorg.warmrepo') and '(2 files)' in line ]
+  assert lines[-2].startswith('Warmed 1 sources; cache: ')
+  assert len(list((cache / 'BlobCode').iterdir())) == 1
+  assert len(list((cache / 'NotebookCode').iterdir())) == 1
+
+  # Failures are reported, and reflected in the exit code
+  proc = warm('-C', 'github.warmorg.nope')
+  assert proc.returncode == 1
+  assert 'github.warmorg.nope: ERROR' in proc.stderr
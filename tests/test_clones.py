@@ -0,0 +1,70 @@
+from pytest import fixture, mark
+from time import sleep
+
+from git import Repo
+
+from clones import clone, clone_args, is_partial
+from node import tree_manifest
+
+
+@fixture
+def origin(tmp_path, local_repo, git):
+  '''Local repo to clone from, via a `file://` URL (which, unlike a plain path, exercises the transport that remote
+  clones use)'''
+  path = local_repo(tmp_path / 'origin', { 'a.py': 'A = 1\n', 'sub/b.py': 'B = 2\n' })
+  git('config', 'uploadpack.allowFilter', 'true', cwd=path)
+  return path
+
+
+def test_clone_args():
+  assert clone_args('full') == []
+  assert clone_args('shallow,no-checkout') == ['--depth=1', '--no-checkout']
+  assert clone_args(['blobless', 'bare']) == ['--filter=blob:none', '--bare']
+
+
+@mark.parametrize('strategy', [ 'full', 'shallow', 'blobless,no-checkout', 'no-checkout', 'bare' ])
+def test_clone_strategies(origin, tmp_path, git, strategy):
+  path = tmp_path / 'clone'
+  clone(f'file://{origin}', path, strategy=strategy)
+  repo = Repo(path)
+  assert repo.bare == (strategy == 'bare')
+  assert (path / 'a.py').exists() == (strategy in ['full', 'shallow'])
+  assert is_partial(repo) == ('blobless' in strategy)
+
+  sha = repo.commit().hexsha
+  manifest = tree_manifest(repo, sha)
+  assert sorted(manifest.keys()) == ['', 'a.py', 'sub', 'sub/b.py']
+  blob = manifest['sub/b.py']
+  assert blob['type'] == 'blob'
+  assert blob['size'] == (None if 'blobless' in strategy else 6)
+  # Blobs missing from partial clones are fetched on demand
+  assert repo.odb.stream(bytes.fromhex(blob['sha'])).read() == b'B = 2\n'
+
+  # Updating an existing clone moves it to the origin's latest commit
+  (origin / 'a.py').write_text('A = 3\n')
+  git('commit', '-qam', 'second', cwd=origin)
+  clone(f'file://{origin}', path, strategy=strategy)
+  assert repo.commit().hexsha == Repo(origin).commit().hexsha
+
+
+def test_clone_ttl(github_remote, git, monkeypatch):
+  import opts
+  from _github import Github
+  src = github_remote('ttlorg', 'ttlrepo', { 'a.py': 'A = 1\n' })
+
+  github = Github('ttlorg/ttlrepo')
+  first = github.clone.commit().hexsha
+  (src / 'a.py').write_text('A = 2\n')
+  git('commit', '-qam', 'second', cwd=src)
+  git('push', '-q', 'origin', 'HEAD', cwd=src)
+  second = Repo(src).commit().hexsha
+
+  # Fresh clones are reused as-is; stale ones are returned, and pulled in the background
+  assert Github('ttlorg/ttlrepo').clone.commit().hexsha == first
+  monkeypatch.setattr(opts, 'clone_ttl', 0)
+  github = Github('ttlorg/ttlrepo')
+  assert github.clone.commit().hexsha == first
+  for _ in range(100):
+    if github._clone.commit().hexsha == second: break
+    sleep(.05)
+  assert github._clone.commit().hexsha == second
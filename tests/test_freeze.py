@@ -0,0 +1,125 @@
+from os.path import dirname
+from subprocess import run, PIPE
+import json
+import sys
+from zipfile import ZipFile
+
+from pytest import mark, raises
+
+from freeze import notebook_source
+from importer import Importer
+
+
+ROOT = dirname(dirname(__file__))
+
+
+def notebook(*cells):
+  return json.dumps({
+    'cells': [
+      dict(cell_type='code', execution_count=None, metadata={}, outputs=[], source=source)
+      for source in cells
+    ],
+    'metadata': { 'kernelspec': { 'display_name': 'Python 3', 'language': 'python', 'name': 'python3' } },
+    'nbformat': 4,
+    'nbformat_minor': 4,
+  })
+
+
+# Converting notebooks uses `ast.unparse`
+needs_unparse = mark.skipif(sys.version_info < (3, 9), reason='requires Python ≥3.9')
+
+
+def test_notebook_source_unsupported(monkeypatch):
+  import ast
+  monkeypatch.delattr(ast, 'unparse', raising=False)
+  with raises(RuntimeError, match='requires Python'):
+    notebook_source(Importer(), notebook('x = 1'), 'nb.ipynb')
+
+
+@needs_unparse
+def test_notebook_source():
+  importer = Importer()
+  text = notebook("def f(): return 'f'\nprint('top-level')", "def g():\n  x = %time 1\n  return x")
+
+  source = notebook_source(importer, text, 'nb.ipynb', only_defs=True)
+  assert 'print' not in source
+  dct = {}
+  exec(compile(source, 'nb.py', 'exec'), dct)
+  assert dct['f']() == 'f'
+  assert dct['g']() == 1
+  assert '_shell' not in dct
+
+  source = notebook_source(importer, text, 'nb.ipynb', only_defs=False)
+  assert "print('top-level')" in source
+
+
+# Freeze a GitHub repo in a fresh interpreter
+FREEZE = '''
+import sys
+sys.path.insert(0, %(root)r)
+import opts
+opts.cache_root = %(cache_root)r
+# Imported beforehand: `dep` is used by the frozen repo, `other` isn't
+import github.frzorg.dep, github.frzorg.other
+from freeze import freeze
+print(' '.join(freeze(['github.frzorg.frzrepo'], %(zip)r)))
+'''
+
+# Import the frozen repo in an isolated interpreter, with only the archive on `sys.path`
+FROZEN = '''
+import builtins, sys
+sys.path.insert(0, %(zip)r)
+# Record any compilation (e.g. zipimport falling back to the `.py` sources)
+compiled = []
+_compile = builtins.compile
+def compile(source, filename, *args, **kwargs):
+    compiled.append(filename)
+    return _compile(source, filename, *args, **kwargs)
+builtins.compile = compile
+import github.frzorg.frzrepo as repo
+print(repo.X, repo.a.fa(), repo.nb.f(), repo.sub.b.B)
+print(' '.join( name for name in ['ur', 'importer', 'git', 'IPython', 'nbformat'] if name in sys.modules ))
+# Code objects come from the archived `.pyc`s (compiled with archive-relative filenames)
+print(compiled, repo.a.fa.__code__.co_filename, repo.sub.b.__file__.endswith('.pyc'))
+'''
+
+
+@needs_unparse
+def test_freeze(tmp_path, github_remote):
+  repos = {
+    'frzrepo': {
+      '__init__.py': 'X = 1\n',
+      'a.py': "from github.frzorg.dep import d\ndef fa(): return d()\n",
+      'nb.ipynb': notebook("def f(): return 'f'\nprint('top-level')"),
+      'sub/b.py': 'B = 2\n',
+    },
+    'dep': { '__init__.py': "def d(): return 'd'\n" },
+    'other': { '__init__.py': 'O = 0\n' },
+  }
+  for name, files in repos.items():
+    github_remote('frzorg', name, files)
+
+  work = tmp_path / 'work'
+  work.mkdir()
+  zip = str(tmp_path / 'frozen.zip')
+  code = FREEZE % dict(root=ROOT, cache_root=str(tmp_path / 'cache'), zip=zip)
+  proc = run([ sys.executable, '-c', code ], cwd=work, stdout=PIPE, stderr=PIPE, text=True)
+  assert proc.returncode == 0, proc.stderr
+  frozen = proc.stdout.split('\n')[-2].split(' ')
+  assert frozen == [
+    'github', 'github.frzorg', 'github.frzorg.dep', 'github.frzorg.frzrepo',
+    'github.frzorg.frzrepo.a', 'github.frzorg.frzrepo.nb', 'github.frzorg.frzrepo.sub', 'github.frzorg.frzrepo.sub.b',
+  ]
+
+  names = ZipFile(zip).namelist()
+  assert 'github/frzorg/frzrepo/nb.py' in names
+  assert 'github/frzorg/frzrepo/nb.pyc' in names
+  assert 'github/frzorg/frzrepo/sub/__init__.pyc' in names
+  with ZipFile(zip) as zf:
+    assert 'print' not in zf.read('github/frzorg/frzrepo/nb.py').decode()
+
+  # No `ur`, IPython, GitPython, or network (the remote is gone) needed to import from the archive
+  (tmp_path / 'remote' / 'github').rename(tmp_path / 'remote' / 'moved')
+  proc = run([ sys.executable, '-I', '-c', FROZEN % dict(zip=zip) ], cwd=work, stdout=PIPE, stderr=PIPE, text=True)
+  assert proc.returncode == 0, proc.stderr
+  assert proc.stdout.split('\n') == [ '1 d f 2', '', "[] github/frzorg/frzrepo/a.py True", '' ]
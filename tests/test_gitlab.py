@@ -0,0 +1,65 @@
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import unquote
+
+from pytest import fixture, raises
+
+import opts
+
+
+GROUPS = [ 'runsascoded', 'runsascoded/dotfiles', 'flaky' ]
+PROJECTS = [ 'runsascoded/dotfiles/jupyter' ]
+# Statuses to respond with (in order) before answering normally
+FAILURES = []
+
+
+@fixture
+def api(monkeypatch, http_server):
+  '''Local stand-in for the GitLab API's `/groups/:id` and `/projects/:id` endpoints; returns the list of requested
+  paths'''
+  requests = []
+
+  class Handler(BaseHTTPRequestHandler):
+    def do_HEAD(self):
+      requests.append(self.path)
+      _, _, kind, id = self.path.split('/', 3)
+      id = unquote(id)
+      ok = (kind == 'groups' and id in GROUPS) or (kind == 'projects' and id in PROJECTS)
+      self.send_response(FAILURES.pop(0) if FAILURES else 200 if ok else 404)
+      self.end_headers()
+
+  monkeypatch.setattr(opts, 'gitlab_api_url', f'{http_server(Handler).url}/v4')
+  return requests
+
+
+def test_resolve(api, monkeypatch):
+  from _gitlab import GitlabPath
+
+  assert GitlabPath.resolve('runsascoded') == 'group'
+  assert GitlabPath.resolve('runsascoded/dotfiles') == 'group'
+  assert GitlabPath.resolve('runsascoded/dotfiles/jupyter') == 'project'
+  assert GitlabPath.resolve('runsascoded/nope') is None
+  assert len(api) == 1 + 1 + 2 + 2
+
+  # Warm: no requests
+  assert GitlabPath.resolve('runsascoded/dotfiles/jupyter') == 'project'
+  assert len(api) == 6
+
+  # Expired: re-resolved
+  monkeypatch.setattr(opts, 'gitlab_ttl', -1)
+  assert GitlabPath.resolve('runsascoded') == 'group'
+  assert len(api) == 7
+
+
+def test_transient_errors(api):
+  from requests import HTTPError
+  from _gitlab import GitlabPath
+
+  # Errors other than a 404 raise, rather than caching the path as neither a group nor a project…
+  FAILURES.append(503)
+  with raises(HTTPError):
+    GitlabPath.resolve('flaky')
+  assert len(api) == 1
+
+  # …so the next lookup re-requests it
+  assert GitlabPath.resolve('flaky') == 'group'
+  assert len(api) == 2
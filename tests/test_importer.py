@@ -0,0 +1,235 @@
+from pytest import fixture, mark
+import sys
+
+from importer import Importer
+
+
+@fixture
+def modules():
+  '''Remove any modules an `Importer` loaded during a test from `sys.modules`'''
+  before = set(sys.modules)
+  yield
+  for name in set(sys.modules) - before:
+    if isinstance(getattr(sys.modules[name], '__loader__', None), Importer):
+      del sys.modules[name]
+
+
+def test_find_spec_rejects_unrelated(tmp_path, monkeypatch):
+  import opts
+  monkeypatch.chdir(tmp_path)
+  # Re-check search roots for new top-level names on every lookup (see `test_servable_names`)
+  monkeypatch.setattr(opts, 'listing_ttl', 0)
+  importer = Importer()
+
+  # Names that aren't in any search root are rejected without walking any nodes
+  assert importer.find_spec('json') is None
+  assert importer.find_spec('json.decoder', path=['/nonexistent']) is None
+
+  # Misses inside a known top-level name are remembered…
+  (tmp_path / 'foo').mkdir()
+  assert importer.find_spec('foo.bar') is None
+  [ (fullname, _) ] = importer.misses
+  assert fullname == 'foo.bar'
+
+  # …until a search root changes
+  (tmp_path / 'baz.py').write_text('x = 1\n')
+  spec = importer.find_spec('baz')
+  assert spec.name == 'baz'
+  assert not importer.misses
+
+  # …or the directory that would contain the module does (which leaves the search root's mtime untouched)
+  assert importer.find_spec('foo.bar') is None
+  assert importer.misses
+  (tmp_path / 'foo' / 'bar.py').write_text('y = 2\n')
+  assert importer.find_spec('foo.bar').name == 'foo.bar'
+  assert not importer.misses
+
+  assert importer.find_spec('foo.qux') is None
+  importer.invalidate_caches()
+  assert not importer.misses
+
+
+def test_servable_names(tmp_path, monkeypatch):
+  import opts
+  monkeypatch.chdir(tmp_path)
+  monkeypatch.setattr(opts, 'listing_ttl', 60)
+  importer = Importer()
+  (tmp_path / 'old.py').write_text('')
+
+  assert importer.find_spec('json') is None
+  assert importer.find_spec('old').name == 'old'
+
+  # Unrelated imports are rejected from the cached set of top-level names, without re-listing (or `stat`ing) roots
+  importer.search_path = None
+  assert importer.find_spec('json') is None
+  del importer.search_path
+
+  # New top-level modules are found once the cache is invalidated, or expires
+  (tmp_path / 'new.py').write_text('')
+  assert importer.find_spec('new') is None
+  importer.invalidate_caches()
+  assert importer.find_spec('new').name == 'new'
+  (tmp_path / 'newer.py').write_text('')
+  monkeypatch.setattr(opts, 'listing_ttl', 0)
+  assert importer.find_spec('newer').name == 'newer'
+
+
+def test_notebook_code_key():
+  from codecache import NotebookCode
+  text = '{"cells": []}'
+  key = NotebookCode.key(text, only_defs=True)
+  assert key == NotebookCode.key(text, only_defs=True)
+  assert key != NotebookCode.key(text, only_defs=False)
+  assert key != NotebookCode.key(text + ' ', only_defs=True)
+
+
+def test_lazy_submodules(tmp_path, monkeypatch, modules):
+  import opts
+  monkeypatch.chdir(tmp_path)
+  monkeypatch.setattr(opts, 'lazy', True)
+
+  pkg = tmp_path / 'lazypkg'
+  pkg.mkdir()
+  (pkg / 'a.py').write_text('A = 1\n')
+  (pkg / 'b.py').write_text('B = 2\n')
+
+  importer = Importer()
+  spec = importer.find_spec('lazypkg')
+  mod = importer.create_module(spec)
+  importer.exec_module(mod)
+
+  assert 'lazypkg.a' not in sys.modules
+  assert 'get_ipython' not in mod.__all__
+  assert mod.a.A == 1
+  assert 'lazypkg.a' in sys.modules
+  assert 'lazypkg.b' not in sys.modules
+  assert mod.b.B == 2
+
+
+def exec_package(name, root, n):
+  '''Create and import a package `name` (under `root`) of `n` modules and a notebook, which record the order they're
+  executed in'''
+  import builtins
+  import nbformat
+  from nbformat.v4 import new_code_cell, new_notebook
+  pkg = root / name
+  (pkg / 'sub').mkdir(parents=True)
+  for i in range(n):
+    (pkg / f'm{i}.py').write_text(f'ORDER.append(__name__)\nX = {i}\n')
+  (pkg / 'sub' / 'z.py').write_text('ORDER.append(__name__)\n')
+  nb = new_notebook(
+    cells=[ new_code_cell(f'ORDER.append(__name__)\ndef f(): return "f"\nPKG = {name!r}') ],
+    metadata={ 'kernelspec': { 'display_name': 'Python 3', 'language': 'python', 'name': 'python3' } },
+  )
+  (pkg / 'nb.ipynb').write_text(nbformat.writes(nb))
+
+  builtins.ORDER = order = []
+  try:
+    importer = Importer()
+    spec = importer.find_spec(name)
+    mod = importer.create_module(spec)
+    importer.exec_module(mod)
+  finally:
+    del builtins.ORDER
+  return importer, mod, [ name.split('.', 1)[1] for name in order ]
+
+
+@mark.parametrize('pipeline', [ 'thread', 'process' ])
+def test_pipeline(tmp_path, monkeypatch, modules, pipeline):
+  import opts
+  monkeypatch.chdir(tmp_path)
+  monkeypatch.setattr(opts, 'only_defs', False)
+
+  _, _, expected = exec_package('serialpkg', tmp_path, 5)
+  assert sorted(expected) == sorted([ f'm{i}' for i in range(5) ] + [ 'nb', 'sub.z' ])
+
+  monkeypatch.setattr(opts, 'pipeline', pipeline)
+  importer, mod, order = exec_package('pipelinedpkg', tmp_path, 5)
+  try:
+    # Results were consumed, and modules executed in the same order as without the pipeline
+    assert not importer.prefetched
+    assert order == expected
+    assert [ getattr(mod, f'm{i}').X for i in range(5) ] == list(range(5))
+    pkg = tmp_path / 'pipelinedpkg'
+    assert [ getattr(mod, f'm{i}').__file__ for i in range(5) ] == [ str(pkg / f'm{i}.py') for i in range(5) ]
+    assert mod.nb.f() == 'f'
+    assert mod.nb.f.__code__.co_filename == str(pkg / 'nb.ipynb')
+    assert set(importer.pools) == ({ 'thread', 'process' } if pipeline == 'process' else { 'thread' })
+  finally:
+    importer.close()
+  assert not importer.pools
+
+
+def test_trace(tmp_path, monkeypatch, modules):
+  from io import StringIO
+  import pstats
+  import tracer
+  monkeypatch.chdir(tmp_path)
+
+  pkg = tmp_path / 'tracepkg'
+  pkg.mkdir()
+  (pkg / '__init__.py').write_text('')
+  (pkg / 'a.py').write_text('A = 1\n')
+
+  importer = Importer()
+  profiles = tmp_path / 'profiles'
+  tracer.enable(profile_dir=profiles, report=False)
+  try:
+    spec = importer.find_spec('tracepkg')
+    mod = importer.create_module(spec)
+    importer.exec_module(mod)
+  finally:
+    trace = tracer.disable()
+
+  assert mod.a.A == 1
+  # Discovering the enclosing git repo (of which there is none) happens before `find_spec` proper
+  [ discover, find_spec, module ] = trace.roots
+  assert discover.phase == 'discover'
+  assert (find_spec.phase, find_spec.name) == ('find_spec', 'tracepkg')
+  assert (module.phase, module.name) == ('module', 'tracepkg')
+  # The submodule's spans nest inside the package's
+  assert 'tracepkg.a' in [ span.name for span in module.walk() if span.phase == 'module' ]
+
+  totals = trace.totals()
+  assert set(totals) == { 'tracepkg', str(tmp_path) }
+  phases = totals['tracepkg']
+  assert { 'find_spec', 'module', 'tree', 'read', 'compile', 'exec' } <= set(phases)
+  # Self times add up to the roots' totals
+  assert abs(sum(phases.values()) - find_spec.seconds - module.seconds) < 1e-6
+
+  out = StringIO()
+  trace.report(out)
+  assert out.getvalue().startswith('ur import trace: 2 roots')
+
+  paths = trace.dump_profiles()
+  assert profiles / 'tracepkg.prof' in paths
+  pstats.Stats(str(profiles / 'tracepkg.prof'))
+
+
+def test_notebook_code_cache(tmp_path, monkeypatch, modules):
+  import nbformat
+  from nbformat.v4 import new_code_cell, new_notebook
+  monkeypatch.chdir(tmp_path)
+
+  nb = new_notebook(
+    cells=[ new_code_cell("def f(): return 'f'") ],
+    metadata={ 'kernelspec': { 'display_name': 'Python 3', 'language': 'python', 'name': 'python3' } },
+  )
+  (tmp_path / 'cachednb.ipynb').write_text(nbformat.writes(nb))
+
+  calls = []
+  compile_nb = Importer.compile_nb
+  def counting(self, *args, **kwargs):
+    calls.append(args)
+    return compile_nb(self, *args, **kwargs)
+  monkeypatch.setattr(Importer, 'compile_nb', counting)
+
+  # The second import (by a fresh `Importer`) gets its code from the persisted `NotebookCode` cache
+  for _ in range(2):
+    importer = Importer()
+    spec = importer.find_spec('cachednb')
+    mod = importer.create_module(spec, install=False)
+    importer.exec_module(mod)
+    assert mod.f() == 'f'
+    assert mod.f.__code__.co_filename == str(tmp_path / 'cachednb.ipynb')
+  assert len(calls) == 1
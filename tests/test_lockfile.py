@@ -0,0 +1,101 @@
+import json
+from os import environ
+from os.path import dirname
+from subprocess import run, PIPE
+import sys
+
+from pytest import raises
+
+from lockfile import LockError, Lockfile, VERSION
+
+
+ROOT = dirname(dirname(__file__))
+
+
+def test_lockfile(tmp_path):
+  path = tmp_path / 'ur.lock'
+  lock = Lockfile(path)
+  lock.add('github', 'org/repo', 'a' * 40)
+  lock.add('gitlab', 'group/sub/project', 'b' * 40)
+  lock.save()
+
+  lock = Lockfile.load(path)
+  assert lock.get('github', 'org/repo') == 'a' * 40
+  with raises(LockError):
+    lock.get('github', 'org/other')
+  assert lock.gitlab_kind('group') == 'group'
+  assert lock.gitlab_kind('group/sub') == 'group'
+  assert lock.gitlab_kind('group/sub/project') == 'project'
+  with raises(LockError):
+    lock.gitlab_kind('group/nope')
+
+  path.write_text(json.dumps(dict(version=VERSION + 1)))
+  with raises(LockError):
+    Lockfile.load(path)
+
+
+# Run in a fresh interpreter; with `offline`, any subprocess (e.g. `git`) fails
+CHILD = '''
+import sys
+if %(offline)r:
+  import subprocess
+  class Popen:
+    def __init__(self, *args, **kwargs): raise RuntimeError(f'Subprocess: {args}')
+  subprocess.Popen = Popen
+sys.path.insert(0, %(root)r)
+import opts
+opts.cache_root = %(cache_root)r
+import ur
+import github.lockorg.lockrepo as repo
+url = ur(%(url)r)
+print(repo.a.A, url.U)
+'''
+
+
+def test_record_and_lock(tmp_path, github_remote, http_server, git):
+  src = github_remote('lockorg', 'lockrepo', { 'a.py': 'A = 1\n' })
+
+  www = tmp_path / 'www'
+  www.mkdir()
+  (www / 'u.py').write_text('U = 10\n')
+  server = http_server(directory=www)
+  url = f'{server.url}/u.py'
+
+  lock = tmp_path / 'ur.lock'
+  work = tmp_path / 'work'
+  work.mkdir()
+  env = dict(environ)
+  env.pop('UR_LOCK', None)
+
+  def child(offline, **kw):
+    code = CHILD % dict(offline=offline, root=ROOT, cache_root=str(tmp_path / 'cache'), url=url)
+    return run([ sys.executable, '-c', code ], cwd=work, env={ **env, **kw }, stdout=PIPE, stderr=PIPE, text=True)
+
+  # Record
+  proc = child(False, UR_LOCK_RECORD=str(lock))
+  assert proc.returncode == 0, proc.stderr
+  assert proc.stdout.split('\n')[-2] == '1 10'
+  sha = src.joinpath('.git', 'refs', 'heads').iterdir().__next__().read_text().strip()
+  pins = json.loads(lock.read_text())
+  assert pins['github'] == { 'lockorg/lockrepo': sha }
+  assert list(pins['url'].keys()) == [ url ]
+
+  # Upstream changes, and the network goes away; locked imports are still served (at the locked commit) from the cache,
+  # with no subprocesses
+  (src / 'a.py').write_text('A = 2\n')
+  git('commit', '-qam', 'second', cwd=src)
+  git('push', '-q', 'origin', 'HEAD', cwd=src)
+  server.shutdown()
+  server.server_close()
+  (tmp_path / 'remote' / 'github').rename(tmp_path / 'remote' / 'moved')
+
+  proc = child(True, UR_LOCK=str(lock))
+  assert proc.returncode == 0, proc.stderr
+  assert proc.stdout.split('\n')[-2] == '1 10'
+
+  # Sources missing from the lockfile fail fast
+  pins['url'] = {}
+  lock.write_text(json.dumps(pins))
+  proc = child(True, UR_LOCK=str(lock))
+  assert proc.returncode != 0
+  assert 'LockError' in proc.stderr and 'not in lockfile' in proc.stderr
@@ -0,0 +1,92 @@
+from pytest import fixture
+
+from node import GitNode
+
+
+@fixture
+def commit(github_remote):
+  '''`_github.Commit` of a local repo, cloned via a `file://` URL that stands in for github.com'''
+  github_remote('nodeorg', 'noderepo', { 'a.py': 'A = 1\n', 'sub/b.py': 'B = 2\n', 'sub/deeper/c.py': 'C = 3\n' })
+
+  from _github import Github
+  return Github('nodeorg/noderepo').commit
+
+
+def test_manifest(commit, monkeypatch):
+  import _github
+  from _github import Commit
+
+  manifest = commit.manifest
+  assert sorted(manifest) == [ '', 'a.py', 'sub', 'sub/b.py', 'sub/deeper', 'sub/deeper/c.py' ]
+  assert manifest['sub/deeper']['type'] == 'tree'
+  assert manifest['sub/b.py']['type'] == 'blob'
+  assert manifest['sub/b.py']['size'] == 6
+
+  # A fresh instance loads the persisted manifest, rather than re-listing the tree
+  def fail(*args): raise AssertionError('tree_manifest called')
+  monkeypatch.setattr(_github, 'tree_manifest', fail)
+  Commit._instances.clear()
+  assert Commit(commit.id, commit.github).manifest == manifest
+
+
+def test_git_node(commit):
+  root = GitNode(commit)
+  assert root.is_dir and not root.is_file
+  assert sorted(root.children) == [ 'a.py', 'sub' ]
+
+  sub = root.children['sub']
+  assert sub.is_dir
+  assert sorted(sub.children) == [ 'b.py', 'deeper' ]
+  deeper = sub.children['deeper']
+  assert deeper.is_dir
+  [ c ] = deeper.children.values()
+  assert (c.name, c.tree_path, c.is_file, c.children) == ('c.py', 'sub/deeper/c.py', True, None)
+  assert c.read() == b'C = 3\n'
+  assert c.hexsha == commit.manifest['sub/deeper/c.py']['sha']
+
+  # Nodes are interned per (commit, path)
+  assert GitNode(commit, 'sub/deeper/c.py') is c
+  assert c.url == f'{commit.www_url}/sub/deeper/c.py'
+
+
+def test_blob_code(commit, monkeypatch):
+  from codecache import BlobCode
+  from importer import Importer
+
+  importer = Importer()
+  node = GitNode(commit, 'sub/b.py')
+  code = BlobCode.get(node, importer, 'b.py')
+  dct = {}
+  exec(code, dct)
+  assert dct['B'] == 2
+
+  # Warm hits (from a new instance, as in a fresh process) skip reading and compiling the blob
+  def fail(*args, **kwargs): raise AssertionError('recompiled')
+  monkeypatch.setattr(importer, 'compile_source', fail)
+  monkeypatch.setattr(GitNode, 'read', fail)
+  code = BlobCode.get(node, importer, 'other.py')
+  assert code.co_filename == 'other.py'
+  dct = {}
+  exec(code, dct)
+  assert dct['B'] == 2
+
+
+def test_concurrent_reads(commit):
+  from concurrent.futures import ThreadPoolExecutor
+  from threading import Barrier
+  from clones import objects
+
+  contents = { 'a.py': b'A = 1\n', 'sub/b.py': b'B = 2\n', 'sub/deeper/c.py': b'C = 3\n' }
+  nodes = [ GitNode(commit, path) for path in list(contents) * 4 ]
+  barrier = Barrier(4)
+
+  def read(node):
+    # Each worker thread reads through its own object database, rather than queueing on a shared one
+    barrier.wait()
+    return node.read(), objects(commit.source)
+
+  with ThreadPoolExecutor(4) as pool:
+    results = list(pool.map(read, nodes[:4]))
+    assert len({ id(odb) for _, odb in results }) == 4
+    assert [ data for data, _ in results ] == [ contents[node.tree_path] for node in nodes[:4] ]
+    assert [ data for data, _ in pool.map(read, nodes[4:]) ] == [ contents[node.tree_path] for node in nodes[4:] ]
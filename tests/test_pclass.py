@@ -1,8 +1,55 @@
-from pclass.dircache import Meta
-from pclass.field import field
+from pclass.dircache import CachedField, Meta
+from pclass.field import directfield, field
+from pclass.loader import MSGPACK, NPY, PICKLE, noop
+from pclass.storage import DirStorage, SQLiteStorage
 
+import json
 from pathlib import Path
-from tempfile import TemporaryDirectory
+from tempfile import gettempdir, TemporaryDirectory
+from time import sleep
+from uuid import uuid4
+
+import pytest
+
+
+class Power(metaclass=Meta, storage=SQLiteStorage):
+  '''Module-level (so that pool processes can unpickle it) class for `materialize` tests'''
+  @field
+  def square(self): return self.id ** 2
+
+  @field
+  def inverse(self): return 1 / self.id
+
+
+class Slow(metaclass=Meta):
+  '''Module-level class for multi-process tests; computations are logged to a temporary file named after the `id`'''
+  @property
+  def log_path(self): return Path(gettempdir()) / f'{self.id}.log'
+
+  def log(self, msg):
+    with self.log_path.open('a') as f:
+      f.write(f'{msg}\n')
+
+  @field
+  def value(self):
+    self.log('compute')
+    sleep(.3)
+    return 'v'
+
+  @directfield
+  def tree(self, path):
+    self.log('download')
+    path.mkdir()
+    sleep(.3)
+    (path / 'file').write_text('contents')
+
+  @tree.load
+  def load_tree(self, path): return (path / 'file').read_text()
+
+
+def access(id, name):
+  return getattr(Slow(id), name)
+
 
 def test_foo():
   with TemporaryDirectory() as cache_root:
@@ -62,3 +109,424 @@ def test_foo():
     assert foo3.s == '44'
     # Verify that `s` *was* recomputed:
     assert Foo.count == 2
+
+
+def test_sqlite_storage():
+  with TemporaryDirectory() as cache_root:
+
+    class Bar(metaclass=Meta, cache_root=cache_root, storage=SQLiteStorage):
+      count = 0
+      @field
+      def s(self):
+        Bar.count += 1
+        return { 'id': self.id, 's': str(self.id) * 2 }
+
+    bar = Bar(4)
+    assert bar.s == { 'id': 4, 's': '44' }
+    assert bar.s == { 'id': 4, 's': '44' }
+    assert Bar.count == 1
+
+    # All fields live in one DB file; no per-instance dirs
+    dir = Path(cache_root) / 'Bar'
+    assert [ p.name for p in dir.iterdir() if not p.name.startswith('fields.sqlite-') ] == [ 'fields.sqlite' ]
+
+    assert Bar(4).s == { 'id': 4, 's': '44' }
+    assert Bar.count == 1
+
+    assert Bar(4, _skip_cache=True).s == { 'id': 4, 's': '44' }
+    assert Bar.count == 2
+
+    # Batched writes + reads
+    storage = Bar._storage
+    storage.put_many('s', { id: json.dumps({ 'id': id, 's': 'x' }).encode() for id in range(10, 1010) })
+    assert Bar(500).s == { 'id': 500, 's': 'x' }
+    assert Bar.count == 2
+    values = storage.get_many(range(1000, 1020), 's')
+    assert sorted(values) == list(range(1000, 1010))
+    assert json.loads(values[1009]) == { 'id': 1009, 's': 'x' }
+
+    # Field values written inside a `batch()` are committed together
+    with storage.batch():
+      for id in range(5):
+        Bar(f'b{id}').s
+    assert Bar.count == 7
+    assert len(storage.get_many([ f'b{id}' for id in range(5) ], 's')) == 5
+
+
+def test_incomplete_storage():
+  from pclass.storage import Storage
+
+  class GetOnly(Storage):
+    def get(self, id, name): return None
+
+  # Missing `put`/`delete`/`mtime`: fails up front, rather than on first use
+  with pytest.raises(TypeError):
+    GetOnly('/tmp')
+
+
+def test_dir_storage_atomic_put(tmp_path):
+  storage = DirStorage(tmp_path)
+  storage.put(1, 'x', b'old')
+  with storage.path(1, 'x').open('rb') as f:
+    storage.put_many('x', { 1: b'new', 2: b'two' })
+    # Replaced (renamed over), rather than rewritten in place: readers of the old file see all of it
+    assert f.read() == b'old'
+  assert storage.get_many([ 1, 2 ], 'x') == { 1: b'new', 2: b'two' }
+  assert [ p.name for p in (tmp_path / '1').iterdir() ] == [ 'x' ]
+
+
+def test_sqlite_storage_requires_bytes_loader():
+  with TemporaryDirectory() as cache_root:
+    with pytest.raises(TypeError):
+      class Baz(metaclass=Meta, cache_root=cache_root, storage=SQLiteStorage):
+        @field(save=noop)
+        def s(self): return ''
+
+
+@pytest.mark.parametrize('storage', [ DirStorage, SQLiteStorage ])
+def test_loaders(storage):
+  with TemporaryDirectory() as cache_root:
+
+    class Obj(metaclass=Meta, cache_root=cache_root, storage=storage, loader=PICKLE):
+      computes = 0
+
+      @field
+      def pickled(self):
+        Obj.computes += 1
+        return { 'id': self.id, 'set': { 1, 2 }, 'bytes': b'abc' }
+
+    # The second instance loads the value from disk
+    for _ in range(2):
+      obj = Obj('a')
+      assert obj.pickled == { 'id': 'a', 'set': { 1, 2 }, 'bytes': b'abc' }
+    assert Obj.computes == 1
+
+
+@pytest.mark.parametrize('storage', [ DirStorage, SQLiteStorage ])
+def test_msgpack_loader(storage):
+  pytest.importorskip('msgpack')
+  with TemporaryDirectory() as cache_root:
+
+    class Obj(metaclass=Meta, cache_root=cache_root, storage=storage):
+      computes = 0
+
+      @field(loader=MSGPACK)
+      def packed(self):
+        Obj.computes += 1
+        return { 'id': self.id, 'list': [ 1, 2.5, 'three' ], 'bytes': b'abc' }
+
+    for _ in range(2):
+      obj = Obj('a')
+      assert obj.packed == { 'id': 'a', 'list': [ 1, 2.5, 'three' ], 'bytes': b'abc' }
+    assert Obj.computes == 1
+
+
+@pytest.mark.parametrize('storage', [ DirStorage, SQLiteStorage ])
+def test_npy_loader(storage):
+  np = pytest.importorskip('numpy')
+  with TemporaryDirectory() as cache_root:
+
+    class Arr(metaclass=Meta, cache_root=cache_root, storage=storage):
+      computes = 0
+
+      @field(loader=NPY)
+      def arr(self):
+        Arr.computes += 1
+        return np.arange(self.id, dtype='float64').reshape(-1, 10)
+
+    computed = Arr(100).arr
+    loaded = Arr(100).arr
+    assert Arr.computes == 1
+    assert loaded.shape == (10, 10)
+    assert (loaded == computed).all()
+    if storage is DirStorage:
+      # Loaded files are memory-mapped
+      assert isinstance(loaded, np.memmap)
+      assert not loaded.flags.writeable
+
+
+def test_instances():
+  with TemporaryDirectory() as cache_root:
+
+    class Foo(metaclass=Meta, cache_root=cache_root, instances=2):
+      count = 0
+      @field
+      def s(self):
+        Foo.count += 1
+        return str(self.id) * 2
+
+    foo = Foo(4)
+    assert foo.s == '44'
+    assert Foo(4) is foo
+    assert Foo(id=4) is foo
+    assert Foo.count == 1
+
+    # `_skip_cache` constructs (and recomputes) a fresh instance, bypassing the map, and drops the old one…
+    fresh = Foo(4, _skip_cache=True)
+    assert fresh is not foo
+    assert fresh.s == '44'
+    assert Foo.count == 2
+    # …so that later lookups get a new, non-skip-cache instance, which loads the recomputed value
+    four = Foo(4)
+    assert four is not fresh and four is not foo
+    assert not four._skip_cache
+    assert four.s == '44'
+    assert Foo.count == 2
+    assert Foo(4) is four
+
+    # Least-recently-used instances are dropped beyond `instances=2`
+    five = Foo(5)
+    assert Foo(4) is four
+    Foo(6)
+    assert len(Foo._instances) == 2
+    assert Foo(4) is four
+    assert Foo(5) is not five
+
+    # Other constructor arguments are part of the key
+    class Pair(metaclass=Meta, cache_root=cache_root, instances=4):
+      def __init__(self, other):
+        self.other = other
+
+    a = Pair(1, 'a')
+    assert Pair(1, 'a') is a
+    assert Pair(1, 'b') is not a
+    assert Pair(1, 'b').other == 'b'
+    assert Pair(1, other='a') is Pair(1, other='a')
+    # Unhashable arguments bypass the map
+    assert Pair(1, [ 'a' ]) is not Pair(1, [ 'a' ])
+
+    # Subclasses don't share their parent's instances (or inherit the setting)
+    class Bar(Foo, metaclass=Meta, cache_root=cache_root):
+      pass
+
+    assert Bar._instances is None
+    assert Bar(4) is not Bar(4)
+    assert not isinstance(Foo(4), Bar)
+
+
+@pytest.mark.parametrize('executor', [ 'process', 'thread', None ])
+def test_materialize(executor):
+  base = { 'process': 0, 'thread': 100, None: 200 }[executor]
+  ids = range(base, base + 20)
+
+  Power(base + 1).square
+  result = Power.materialize(ids, 'square', executor=executor, workers=2, progress=False)
+  assert result['cached'] == 1
+  assert result['computed'] == 19
+  assert result['fields']['square']['count'] == 19
+  assert json.loads(Power._storage.get(base + 3, 'square')) == (base + 3) ** 2
+
+  # Already-cached values are skipped; errors (1 / 0) are collected, or raised
+  progress = []
+  result = Power.materialize(ids, executor=executor, progress=lambda *args: progress.append(args), throw=False)
+  assert result['cached'] == 20
+  assert result['computed'] == (19 if base == 0 else 20)
+  assert progress[-1] == (20, 20)
+  if base == 0:
+    [ error ] = result['errors']
+    assert (error['id'], error['field']) == (0, 'inverse')
+    assert isinstance(error['error'], ZeroDivisionError)
+    with pytest.raises(ZeroDivisionError):
+      Power.materialize([ 0 ], executor=executor, progress=False)
+  else:
+    assert not result['errors']
+  assert Power.materialize(ids, [ 'square' ], executor=executor, progress=False)['computed'] == 0
+
+
+@pytest.mark.parametrize('executor', [ 'process', 'thread' ])
+def test_single_flight(executor):
+  from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+  Executor = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+  slow = Slow(f'single-flight-{executor}-{uuid4().hex}')
+  try:
+    with Executor(4) as pool:
+      values = list(pool.map(access, [ slow.id ] * 8, [ 'value', 'tree' ] * 4))
+    assert values == [ 'v', 'contents' ] * 4
+    # Each field was computed once; other workers waited, then loaded it
+    assert sorted(slow.log_path.read_text().split()) == [ 'compute', 'download' ]
+    # No lock or temporary files are left behind
+    assert sorted(p.name for p in slow._dir.iterdir()) == [ 'tree', 'value' ]
+  finally:
+    slow.log_path.unlink()
+
+
+@pytest.fixture
+def tracking():
+  '''Count memory hits (see `pclass.stats.track`) during a test'''
+  from pclass import stats
+  enabled = stats.track_memory_hits
+  stats.track()
+  yield
+  stats.track(enabled)
+
+
+def test_stats(tracking):
+  with TemporaryDirectory() as cache_root:
+
+    class Stat(metaclass=Meta, cache_root=cache_root):
+      @field
+      def s(self): return str(self.id) * 2
+
+      @directfield
+      def file(self, path): path.write_text('abc')
+
+      @file.load
+      def load_file(self, path): return path.read_text()
+
+    obj = Stat(1)
+    assert obj.s == '11'
+    assert obj.s == '11'
+    assert obj.file == 'abc'
+    assert Stat(1).s == '11'
+    assert Stat(1).file == 'abc'
+
+    stats = Stat.stats()
+    s = stats['s']
+    assert (s['memory_hits'], s['disk_hits'], s['computes']) == (1, 1, 1)
+    assert s['bytes_written'] == s['bytes_read'] == len('"11"')
+    assert s['compute_max'] <= s['compute_seconds']
+    file = stats['file']
+    assert (file['memory_hits'], file['disk_hits'], file['computes']) == (0, 1, 1)
+    assert file['bytes_written'] == file['bytes_read'] == 3
+
+    Stat.stats(reset=True)
+    assert Stat.stats()['s']['computes'] == 0
+
+
+def test_stats_dump(tmp_path):
+  from os import environ
+  import subprocess, sys
+  out = tmp_path / 'stats.json'
+  script = '\n'.join([
+    'import opts',
+    f'opts.cache_root = {str(tmp_path / "cache")!r}',
+    'from pclass.dircache import Meta',
+    'from pclass.field import field',
+    'class Dumped(metaclass=Meta):',
+    '  @field',
+    '  def s(self): return "x"',
+    'Dumped(1).s',
+  ])
+  cwd = Path(__file__).parent.parent
+  subprocess.run([ sys.executable, '-c', script ], cwd=cwd, env={ **environ, 'UR_STATS': str(out) }, check=True)
+  assert json.loads(out.read_text())['__main__.Dumped']['s']['computes'] == 1
+
+
+@pytest.mark.parametrize('storage', [ DirStorage, SQLiteStorage ])
+def test_ttl(storage):
+  with TemporaryDirectory() as cache_root:
+    ttl = { 'seconds': 60 }
+    computes = { 'strict': 0, 'lazy': 0, 'file': 0 }
+
+    class Ttl(metaclass=Meta, cache_root=cache_root, storage=storage):
+      @field(ttl=lambda: ttl['seconds'], strict=True)
+      def strict(self):
+        computes['strict'] += 1
+        return computes['strict']
+
+      @field(ttl=lambda: ttl['seconds'])
+      def lazy(self):
+        computes['lazy'] += 1
+        return computes['lazy']
+
+      @directfield(ttl=lambda: ttl['seconds'], strict=True)
+      def file(self, path):
+        computes['file'] += 1
+        path.write_text(str(computes['file']))
+
+      @file.load
+      def load_file(self, path): return int(path.read_text())
+
+    obj = Ttl(1)
+    assert (obj.strict, obj.lazy, obj.file) == (1, 1, 1)
+    # Fresh, in memory and on disk
+    assert (obj.strict, obj.lazy, obj.file) == (1, 1, 1)
+    assert (Ttl(1).strict, Ttl(1).lazy, Ttl(1).file) == (1, 1, 1)
+
+    # Everything is stale
+    ttl['seconds'] = -1
+
+    # `strict` fields block on recomputing, whether materialized in memory or not
+    assert obj.strict == 2
+    assert Ttl(1).strict == 3
+    assert obj.file == 2
+    assert Ttl(1).file == 3
+
+    # Stale-while-revalidate: the old value is returned, and refreshed in the background
+    assert obj.lazy == 1
+    for _ in range(100):
+      if obj._lazy == 2: break
+      sleep(.05)
+    assert obj._lazy == 2
+    assert computes['lazy'] == 2
+
+    # The refreshed value was persisted
+    ttl['seconds'] = 60
+    assert Ttl(1).lazy == 2
+    assert computes == { 'strict': 3, 'lazy': 2, 'file': 3 }
+
+    stats = Ttl.stats()
+    assert (stats['strict']['refreshes'], stats['lazy']['refreshes'], stats['file']['refreshes']) == (2, 1, 2)
+    assert (stats['lazy']['stale_hits'], stats['strict']['stale_hits']) == (1, 0)
+
+
+def test_accessors():
+  with TemporaryDirectory() as cache_root:
+
+    class Acc(metaclass=Meta, cache_root=cache_root):
+      @field
+      def s(self):
+        """Doubled id"""
+        return str(self.id) * 2
+
+      @field(ttl=60)
+      def t(self): return str(self.id) * 3
+
+    assert Acc.s.__doc__ == 'Doubled id'
+    obj = Acc(1)
+    assert 's' not in obj.__dict__
+    assert obj.s == '11'
+    # Materialized into the instance `__dict__`; later lookups don't reach the descriptor (or count memory hits)
+    assert type(Acc.__dict__['s']) is CachedField
+    assert obj.__dict__['s'] == obj._s == '11'
+    assert str(obj) == 'Acc(id=1, s=11)'
+    assert obj.s == '11'
+    assert Acc.stats()['s']['memory_hits'] == 0
+
+    # Counting can be turned on (and back off) for already-materialized values
+    Acc.track()
+    assert obj.s == '11'
+    assert Acc(2).s == '22'
+    assert Acc.stats()['s']['memory_hits'] == 1
+    Acc.track(False)
+    assert obj.s == '11'
+    assert Acc.stats()['s']['memory_hits'] == 1
+
+    # Fields with a `ttl` check it (and count memory hits) on every access
+    assert obj.t == '111'
+    assert obj.t == '111'
+    assert Acc.stats()['t']['memory_hits'] == 1
+    with pytest.raises(AttributeError):
+      obj.t = 'x'
+
+
+def test_track_all(tracking):
+  with TemporaryDirectory() as cache_root:
+
+    class Early(metaclass=Meta, cache_root=cache_root):
+      @field
+      def s(self): return 'early'
+
+    # `stats.track` applies to all classes, including already-defined ones
+    from pclass import stats
+    stats.track(False)
+    assert type(Early.__dict__['s']) is CachedField
+
+    class Later(metaclass=Meta, cache_root=cache_root):
+      @field
+      def s(self): return 'later'
+
+    assert type(Later.__dict__['s']) is CachedField
+    stats.track()
+    assert type(Early.__dict__['s']) is not CachedField
+    assert type(Later.__dict__['s']) is not CachedField
@@ -0,0 +1,33 @@
+from prefetch import prefetch
+
+
+def test_prefetch(tmp_path, monkeypatch, github_remote, http_server):
+  # Out of this repo, whose `_github`/`pclass` dirs the `Importer` would otherwise import as local packages
+  monkeypatch.chdir(tmp_path)
+  repos = [ 'pfrepo1', 'pfrepo2' ]
+  for name in repos:
+    github_remote('pforg', name, { 'a.py': f'A = {name!r}\n' })
+
+  www = tmp_path / 'www'
+  www.mkdir()
+  (www / 'u.py').write_text('U = 10\n')
+  server = http_server(directory=www)
+  url = f'{server.url}/u.py'
+
+  # A module name, a GitHub web URL, and a plain URL, fetched concurrently
+  sources = [ 'github.pforg.pfrepo1', 'https://github.com/pforg/pfrepo2', url ]
+  results = prefetch(sources, workers=3, report=False)
+  assert [ result['source'] for result in results ] == sources
+  assert [ result['error'] for result in results ] == [ None ] * 3
+
+  # Everything is now served from the cache
+  from _github import Github
+  from url import URL
+  for name in repos:
+    github = Github(f'pforg/{name}')
+    assert (github._dir / 'clone').exists()
+  assert URL(url).content.read() == b'U = 10\n'
+
+  from gists import importer
+  spec = importer.find_spec('github.pforg.pfrepo1.a')
+  assert spec.name == 'github.pforg.pfrepo1.a'
@@ -0,0 +1,79 @@
+from http.server import BaseHTTPRequestHandler
+
+from pytest import fixture, raises
+
+
+@fixture
+def server(http_server):
+  '''Local HTTP server with an `ETag`-validated `/etag` resource, and a `/truncated` one that sends fewer bytes than its
+  `Content-Length`; returns `(base URL, headers of each request received, mutable state of /etag)`'''
+  requests = []
+  state = dict(body=b'v1', etag='"1"')
+
+  class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+      requests.append(dict(self.headers))
+      if self.path == '/etag':
+        if self.headers.get('If-None-Match') == state['etag']:
+          self.send_response(304)
+          self.end_headers()
+          return
+        self.send_response(200)
+        self.send_header('ETag', state['etag'])
+        self.send_header('Content-Length', str(len(state['body'])))
+        self.end_headers()
+        self.wfile.write(state['body'])
+      elif self.path == '/truncated':
+        self.send_response(200)
+        self.send_header('Content-Length', '100')
+        self.end_headers()
+        self.wfile.write(b'short')
+        self.close_connection = True
+
+  return http_server(Handler).url, requests, state
+
+
+def test_conditional_download(server, monkeypatch):
+  import opts
+  from url import URL
+  base, requests, state = server
+  url = f'{base}/etag'
+
+  assert URL(url).text == 'v1'
+  assert URL(url).headers == { 'ETag': '"1"' }
+  assert len(requests) == 1
+
+  # Cached: no request
+  assert URL(url).text == 'v1'
+  assert len(requests) == 1
+
+  # Skipping the cache re-downloads unconditionally
+  assert URL(url, _skip_cache=True).text == 'v1'
+  assert len(requests) == 2
+  assert 'If-None-Match' not in requests[-1]
+  monkeypatch.setattr(opts, 'skip_cache', True)
+  assert URL(url, _skip_cache=True).text == 'v1'
+  assert 'If-None-Match' not in requests[-1]
+  monkeypatch.setattr(opts, 'skip_cache', False)
+
+  # Revalidated: 304, cached body reused
+  monkeypatch.setattr(opts, 'revalidate', True)
+  assert URL(url, _skip_cache=True).text == 'v1'
+  assert len(requests) == 4
+  assert requests[-1]['If-None-Match'] == '"1"'
+
+  # Changed upstream: re-downloaded
+  state.update(body=b'v2', etag='"2"')
+  assert URL(url, _skip_cache=True).text == 'v2'
+  assert URL(url).headers == { 'ETag': '"2"' }
+
+
+def test_truncated_download(server):
+  from url import URL
+  base, _, _ = server
+  url = URL(f'{base}/truncated')
+  with raises(Exception):
+    url.content
+  # Nothing (partial or otherwise) was left behind in the cache
+  assert not (url._dir / 'content').exists()
+  assert [ p.name for p in url._dir.iterdir() ] == []
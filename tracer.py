@@ -0,0 +1,199 @@
+'''Opt-in timing (and profiling) of imports: where does import time go?
+
+Set `UR_TRACE` (to anything) to record a nested span for each phase of each module's import, and print a report when the
+process exits; set `UR_TRACE_PROFILES` to a directory to also write a cProfile `.prof` file per import root there (read
+them with e.g. `profiles.py`). `enable()`/`disable()` do the same programmatically.
+
+Phases:
+- find_spec / module: an `Importer.find_spec` / `exec_module` call (spans of other phases nest inside these)
+- discover: locating repos (the local enclosing git repo; GitLab group/project resolution)
+- clone: cloning a Gist/repo (or loading an existing clone) and resolving its commit
+- fetch: downloading a URL
+- tree: listing a directory or git tree
+- read: reading a file or blob
+- parse: parsing notebook JSON
+- transform: IPython input transforms (magics etc.) and `only_defs` filtering of notebook cells
+- compile: compiling source (or loading it from the bytecode cache)
+- exec: executing a module's code
+
+Only times spent directly in each span ("self" time, excluding nested spans) are reported, so phases sum to the total.
+'''
+import atexit
+from contextlib import contextmanager, nullcontext
+from os import environ as env
+from pathlib import Path
+from re import sub
+from sys import stderr
+from threading import local, main_thread, current_thread
+from time import perf_counter
+
+import opts
+
+
+TRACE_ENV_VAR = 'UR_TRACE'
+PROFILES_ENV_VAR = 'UR_TRACE_PROFILES'
+
+PHASES = [
+    'find_spec', 'module', 'discover', 'clone', 'fetch', 'tree', 'read', 'parse', 'transform', 'compile', 'exec',
+]
+
+
+def root_of(name):
+    '''Import root that module `name` belongs to: the Gist, GitHub repo, or GitLab namespace it comes from (e.g.
+    "gist.abc123", "github.org.repo"), or its top-level package; URLs and paths are their own roots'''
+    if '/' in name: return name
+    pieces = name.split('.')
+    top = pieces[0]
+    if top in opts.gist_pkgs or top in opts.gitlab_pkgs:
+        n = 2
+    elif top in opts.github_pkgs:
+        n = 3
+    else:
+        n = 1
+    return '.'.join(pieces[:n])
+
+
+class Span:
+    __slots__ = [ 'phase', 'name', 'seconds', 'children', ]
+
+    def __init__(self, phase, name):
+        self.phase = phase
+        self.name = name
+        self.seconds = 0.
+        self.children = []
+
+    @property
+    def self_seconds(self):
+        return self.seconds - sum( child.seconds for child in self.children )
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+
+class Tracer:
+    '''Records a tree of `Span`s per thread; outermost spans are "roots"
+
+    :param profile_dir: if set, run a `cProfile.Profile` (one per import root; see `root_of`) while root spans on the
+           main thread are open, and `dump_profiles` each to `<profile_dir>/<root>.prof`
+    '''
+    def __init__(self, profile_dir=None):
+        self.roots = []
+        self.profile_dir = Path(profile_dir) if profile_dir else None
+        self.profiles = {}
+        self.local = local()
+
+    @contextmanager
+    def span(self, phase, name):
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        span = Span(phase, str(name))
+        profile = None
+        if stack:
+            stack[-1].children.append(span)
+        else:
+            self.roots.append(span)
+            if self.profile_dir and current_thread() is main_thread():
+                profile = self.profile(root_of(span.name))
+        stack.append(span)
+        if profile:
+            try:
+                profile.enable()
+            except ValueError:
+                # Another profiler is active
+                profile = None
+        start = perf_counter()
+        try:
+            yield span
+        finally:
+            span.seconds = perf_counter() - start
+            if profile: profile.disable()
+            stack.pop()
+
+    def profile(self, root):
+        if root not in self.profiles:
+            from cProfile import Profile
+            self.profiles[root] = Profile()
+        return self.profiles[root]
+
+    def dump_profiles(self):
+        '''Write each import root's profile to `<profile_dir>/<root>.prof`; return the paths written'''
+        paths = []
+        if not self.profile_dir: return paths
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        for root, profile in self.profiles.items():
+            path = self.profile_dir / f'{sub(r"[^A-Za-z0-9_.-]+", "_", root)}.prof'
+            profile.dump_stats(str(path))
+            paths.append(path)
+        return paths
+
+    def totals(self):
+        '''`{ root: { phase: self-seconds } }`, for each import root'''
+        totals = {}
+        for root in self.roots:
+            phases = totals.setdefault(root_of(root.name), {})
+            for span in root.walk():
+                phases[span.phase] = phases.get(span.phase, 0.) + span.self_seconds
+        return totals
+
+    def report(self, out=None, limit=20):
+        '''Print per-root, per-phase times (slowest roots first), and the `limit` slowest spans'''
+        out = out or stderr
+        totals = self.totals()
+        if not totals: return
+        phases = [ phase for phase in PHASES if any( phase in root for root in totals.values() ) ]
+        width = max(len('root'), *( len(root) for root in totals ))
+
+        out.write(f'ur import trace: {len(totals)} roots, {sum( span.seconds for span in self.roots ):.3f}s\n')
+        out.write(f'{"root":<{width}} {"total":>8}' + ''.join( f' {phase:>9}' for phase in phases ) + '\n')
+        for root, times in sorted(totals.items(), key=lambda item: -sum(item[1].values())):
+            out.write(
+                f'{root:<{width}} {sum(times.values()):>7.3f}s' +
+                ''.join( f' {times.get(phase, 0.):>8.3f}s' for phase in phases ) +
+                '\n'
+            )
+
+        spans = sorted(
+            ( span for root in self.roots for span in root.walk() ),
+            key=lambda span: -span.self_seconds,
+        )[:limit]
+        out.write('Slowest spans (self time):\n')
+        for span in spans:
+            out.write(f'{span.self_seconds:>9.3f}s  {span.phase:<9}  {span.name}\n')
+
+
+tracer = None
+
+
+def span(phase, name):
+    '''Time a phase of importing `name` (a module name, node, or URL), if tracing is enabled'''
+    if tracer is None: return nullcontext()
+    return tracer.span(phase, name)
+
+
+def enable(profile_dir=None, report=True):
+    '''Start tracing imports (see `Tracer`); with `report`, print the report (and dump any profiles) at exit'''
+    global tracer
+    tracer = Tracer(profile_dir)
+    if report:
+        atexit.register(finish, tracer)
+    return tracer
+
+
+def disable():
+    '''Stop tracing; return the `Tracer` (if any), e.g. to `report` on'''
+    global tracer
+    prev, tracer = tracer, None
+    return prev
+
+
+def finish(tracer):
+    tracer.report()
+    for path in tracer.dump_profiles():
+        stderr.write(f'Wrote {path}\n')
+
+
+if env.get(TRACE_ENV_VAR) or env.get(PROFILES_ENV_VAR):
+    enable(env.get(PROFILES_ENV_VAR))
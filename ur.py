@@ -47,3 +47,23 @@ def main(*args, **kwargs):
     '''This gets called by `UrModule.__call__` above'''
     ret = _loader.main(*args, **kwargs)
     return ret
+
+
+def prefetch(*args, **kwargs):
+    '''Concurrently clone/fetch Gists, repos, and URLs ahead of importing them; see `prefetch.prefetch`'''
+    from prefetch import prefetch
+    return prefetch(*args, **kwargs)
+
+
+def gc(*args, **kwargs):
+    '''Evict least-recently-used entries from the cache root, down to the configured budgets; see
+    `pclass.eviction.collect`'''
+    from pclass.eviction import collect
+    return collect(*args, **kwargs)
+
+
+def freeze(*args, **kwargs):
+    '''Import the given module names, and write them (along with the modules `ur` loaded for them) to a zip archive that
+    Python's stock `zipimport` can serve; see `freeze.freeze`'''
+    from freeze import freeze
+    return freeze(*args, **kwargs)
@@ -2,17 +2,65 @@ from functools import cached_property
 from io import BytesIO
 import json
 from pathlib import Path
+from pclass.atomic import atomic_write
 from pclass.dircache import Meta
 from pclass.field import directfield
-from urllib.request import urlretrieve
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import opts
 
 
 class URL(metaclass=Meta):
-  @directfield
+  # Response headers persisted alongside `content`, and replayed as conditional-request headers on re-download
+  VALIDATORS = {
+    'ETag': 'If-None-Match',
+    'Last-Modified': 'If-Modified-Since',
+  }
+
+  @property
+  def headers_path(self): return self._dir / 'headers'
+
+  @property
+  def headers(self):
+    path = self.headers_path
+    if not path.exists(): return {}
+    with path.open('r') as f:
+      return json.load(f)
+
+  # Stale downloads are re-checked with a conditional GET, in the background
+  @directfield(ttl=lambda: opts.url_ttl)
   def content(self, path):
+    '''Stream the URL's body to `path` (atomically)
+
+    If a previous download (and its `ETag`/`Last-Modified` headers) is already cached, a conditional GET is sent, and
+    the cached body is kept on `304 Not Modified`; `skip_cache` (the `opts` setting, or an instance's `_skip_cache`,
+    absent `opts.revalidate`) forces an unconditional re-download instead.
+    '''
     url = self.id
-    print(f'Fetching URL: {url} to {path}')
-    urlretrieve(url, path)
+    headers = {}
+    refetch = opts.skip_cache or (self._skip_cache and not opts.revalidate)
+    if path.exists() and not refetch:
+      cached = self.headers
+      headers = {
+        request_header: cached[header]
+        for header, request_header in self.VALIDATORS.items()
+        if header in cached
+      }
+
+    print(f'Fetching URL: {url} to {path}%s' % (' (conditional)' if headers else ''))
+    try:
+      with urlopen(Request(url, headers=headers)) as resp:
+        size = resp.headers.get('Content-Length')
+        atomic_write(path, src=resp, size=None if size is None else int(size))
+        validators = { header: resp.headers[header] for header in self.VALIDATORS if header in resp.headers }
+    except HTTPError as e:
+      if e.code == 304 and headers:
+        print(f'Not modified: {url}')
+        return
+      raise
+
+    atomic_write(self.headers_path, data=json.dumps(validators).encode())
 
   @content.load
   def load_content(self, path):
@@ -31,4 +79,4 @@ class URL(metaclass=Meta):
       return f.read().decode()
 
   def __str__(self):
-    return f'URL(id={self.id})'
\ No newline at end of file
+    return f'URL(id={self.id})'
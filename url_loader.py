@@ -19,6 +19,7 @@ from gists import importer
 
 import opts
 from rgxs import maybe
+from tracer import span
 
 
 def merge(l, r, *keys):
@@ -55,7 +56,9 @@ class URLLoader:
         self.print(f'Forwarding URL {url} to path {path}')
         spec = importer.spec(str(url), node, origin=path, pkg=False)
         mod = importer.create_module(spec, install=False)
-        mod = importer.exec_path(node, mod)
+        # Trace URL imports under the URL itself (as their `fetch` is), local files under their path
+        with span('module', getattr(url, 'id', path)):
+            mod = importer.exec_path(node, mod)
         return mod
 
     def main(
@@ -140,11 +143,12 @@ class URLLoader:
             elif domain == 'gitlab.com':
                 raise NotImplementedError
             elif match(r'https?', url.scheme):
+                from lockfile import content, locked
                 from url import URL
-                url = URL(path)
-                # Force materialization of the URL's content to the on-disk cache
-                url.content
-                path = url._dir / 'content'
+                url = URL(path, _skip_cache=not locked() and (opts.skip_cache or opts.revalidate))
+                # Force materialization of the URL's content to the on-disk cache (or, with a lockfile active, check it)
+                with span('fetch', path):
+                    path = content(url)
                 mod = self.url_mod(url, path)
         else:
             mod = self.url_mod(url, path)